@@ -0,0 +1,315 @@
+"""
+End-to-End Benchmark Script
+File: benchmark.py
+
+This script measures the project's pipeline on a generated catalog of a chosen size.
+
+Features:
+- Generates a seeded catalog with generate_catalog.py and loads it into a fresh benchmark database.
+- Times every stage: CSV generation, CSV validation, CSV load, each sql_features script, a bulk price refresh of
+  every book, every statement in sql_queries/ (streamed to the last row), a few full-text title
+  searches, and the data preparation of every db03_queries chart, in SQL and from a column export
+  (utils_columnar.py) of the tables, whose export is timed too.
+- Records seconds, rows, rows per second and peak RSS per stage, and appends the run to a JSON history.
+  On Linux the peak is reset before each stage (/proc/self/clear_refs), so it is that stage's own peak;
+  elsewhere it is the process's peak so far, and the report labels it "cumulative peak".
+- Compares each stage with the last run of the same size and flags stages that got slower
+  than the regression threshold.
+- Measures the startup time of cli.py (--help and the import of every stage) against a fixed
+  budget, and checks that pandas and matplotlib are not imported until the query stage uses them.
+"""
+
+# Imports from Python Standard Library
+import argparse
+import datetime
+import json
+import pathlib
+import platform
+import shutil
+import sqlite3
+import subprocess
+import sys
+import time
+from typing import Callable
+
+# Imports from local modules
+from generate_catalog import count_argument, generate_catalog, generate_price_refresh
+from utils_bulk import bulk_update
+from utils_columnar import export_columns, open_columns
+from utils_db import connect
+from utils_loader import load_csv_files
+from utils_logger import logger
+from utils_migrate import apply_migrations
+from utils_results import preview_query
+from utils_search import search_books
+from utils_sql_registry import get_statements
+from utils_validate import validate_csv_files
+
+ROOT_DIR = pathlib.Path(__file__).parent.resolve()
+BENCHMARK_FOLDER = ROOT_DIR.joinpath("benchmarks")
+HISTORY_FILE = BENCHMARK_FOLDER.joinpath("history.json")
+SQL_FEATURES_FOLDER = ROOT_DIR.joinpath("sql_features")
+SQL_QUERIES_FOLDER = ROOT_DIR.joinpath("sql_queries")
+CLI_PATH = ROOT_DIR.joinpath("cli.py")
+
+# Seconds allowed for cli.py to start (best of several runs) before a startup stage is flagged
+STARTUP_BUDGET_SECONDS: float = 0.5
+STARTUP_COMMANDS = [["--help"], ["setup", "--help"], ["features", "--help"], ["query", "--help"]]
+HEAVY_MODULES = ["pandas", "matplotlib", "numpy"]
+
+# Title searches timed on the generated catalog: a rare phrase, a prefix and a common word
+BENCHMARK_SEARCHES = ["crimson orchard", "silent riv", "hollow"]
+
+# A stage is a regression when it is this much slower than the last comparable run...
+DEFAULT_REGRESSION_THRESHOLD: float = 0.20
+# ...and at least this many seconds slower, so timer noise on tiny stages is ignored.
+MIN_REGRESSION_SECONDS: float = 0.05
+
+
+def peak_rss_mb() -> float | None:
+    """Return the peak resident set size of this process in MiB, or None where it cannot be read."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def reset_peak_rss() -> bool:
+    """Resets the peak resident set size of this process to its current size. Returns False where this is not supported (Linux only)."""
+    try:
+        with open("/proc/self/clear_refs", "w") as file:
+            file.write("5")
+    except OSError:
+        return False
+    return True
+
+
+def time_stage(stages: dict, name: str, function: Callable[[], int | None]) -> None:
+    """
+    Runs one stage, storing its seconds, rows, throughput and peak RSS under name. The peak is the
+    stage's own where it can be reset first, else the process's peak so far (peak_rss_scope says which).
+    """
+    scope = "stage" if reset_peak_rss() else "cumulative"
+    start = time.perf_counter()
+    try:
+        rows = function()
+    except Exception as e:
+        logger.error(f"Benchmark stage {name} failed: {e}")
+        stages[name] = {"error": str(e)}
+        return
+    seconds = time.perf_counter() - start
+    stages[name] = {
+        "seconds": round(seconds, 6),
+        "rows": rows,
+        "rows_per_second": round(rows / seconds, 1) if rows and seconds > 0 else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "peak_rss_scope": scope,
+    }
+    logger.bind(stage=name, **stages[name]).info(f"{name}: {seconds:.3f}s" + (f", {rows} rows" if rows is not None else ""))
+
+
+def measure_startup(repeats: int = 3) -> tuple[dict, list[str]]:
+    """
+    Times cli.py startup commands in fresh interpreters (best of repeats) and checks which
+    heavy modules importing cli.py loads.
+
+    Returns:
+        tuple: The startup stages, and a description of every budget or lazy-import violation.
+    """
+    stages: dict = {}
+    violations = []
+    for command in STARTUP_COMMANDS:
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, str(CLI_PATH), *command], cwd=ROOT_DIR, check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            timings.append(time.perf_counter() - start)
+        name = f"startup:cli.py {' '.join(command)}"
+        stages[name] = {"seconds": round(min(timings), 6), "rows": None, "rows_per_second": None, "peak_rss_mb": None}
+        if min(timings) > STARTUP_BUDGET_SECONDS:
+            violations.append(f"{name}: {min(timings):.3f}s is over the {STARTUP_BUDGET_SECONDS:.2f}s startup budget")
+
+    check = f"import sys, cli; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    loaded = subprocess.run([sys.executable, "-c", check], cwd=ROOT_DIR, check=True, capture_output=True, text=True).stdout.strip()
+    if loaded:
+        violations.append(f"importing cli.py loads {loaded}; these must only be imported when used")
+    return stages, violations
+
+
+def run_benchmark(work_dir: pathlib.Path, book_count: int, author_count: int | None, seed: int) -> dict:
+    """
+    Runs every stage on a freshly generated catalog and database in work_dir.
+
+    Returns:
+        dict: The run record with its parameters and per-stage measurements.
+    """
+    if work_dir.exists():
+        shutil.rmtree(work_dir)
+    work_dir.mkdir(parents=True)
+    db_path = work_dir.joinpath("db.sqlite")
+    stages: dict = {}
+    csv_paths: list = []
+
+    def generate() -> int:
+        csv_paths.extend(generate_catalog(work_dir, book_count, author_count, seed))
+        return book_count
+
+    time_stage(stages, "generate_csv", generate)
+    if not csv_paths:
+        return {"stages": stages}
+
+    connection = connect(db_path)
+    try:
+        apply_migrations(connection)
+        sources = [("authors", csv_paths[0]), ("books", csv_paths[1])]
+        # Validated once on its own stage, so load_csv times only the load and the foreign key check.
+        time_stage(stages, "validate_csv", lambda: sum(result.rows for result in validate_csv_files(sources, connection).values()))
+        time_stage(stages, "load_csv", lambda: sum(load_csv_files(connection, sources, validate=False).values()))
+
+        # The generated CSV already has prices, so data_addition.sql is not run.
+        for path in sorted(SQL_FEATURES_FOLDER.glob("*.sql")):
+            def run_feature(path: pathlib.Path = path) -> int:
+                with connection:
+                    before = connection.total_changes
+                    connection.executescript(path.read_text(encoding="utf-8"))
+                    return connection.total_changes - before
+            time_stage(stages, f"feature:{path.stem}", run_feature)
+
+        # A new price for every book, applied as one staged UPDATE ... FROM.
+        prices_csv = generate_price_refresh(work_dir, book_count, seed)
+        time_stage(stages, "bulk:prices", lambda: bulk_update(connection, prices_csv).affected)
+
+        for path in sorted(SQL_QUERIES_FOLDER.glob("query_*.sql")):
+            for statement in get_statements(path):
+                time_stage(stages, f"query:{statement.name}",
+                           lambda sql=statement.sql: preview_query(connection, sql, preview_rows=0).row_count)
+
+        for text in BENCHMARK_SEARCHES:
+            time_stage(stages, f"search:{text}", lambda text=text: len(search_books(connection, text)))
+
+        # Imported here so the query stages are not charged for loading matplotlib.
+        from db03_queries import CHARTS
+        for name, data_function, _ in CHARTS:
+            def prepare_chart(data_function: Callable = data_function) -> int:
+                df = data_function(connection)
+                return 0 if df is None else len(df)
+            time_stage(stages, f"chart:{name}", prepare_chart)
+
+        export_folder = work_dir.joinpath("columns")
+        time_stage(stages, "columnar_export", lambda: sum(result.rows for result in export_columns(connection, export_folder).values()))
+        export = open_columns(export_folder)
+        for name, data_function, _ in CHARTS:
+            def prepare_columnar_chart(data_function: Callable = data_function) -> int:
+                df = data_function(connection, export=export)
+                return 0 if df is None else len(df)
+            time_stage(stages, f"chart_columnar:{name}", prepare_columnar_chart)
+    finally:
+        connection.close()
+
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "books": book_count,
+        "authors": author_count or max(1, book_count // 10),
+        "seed": seed,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "stages": stages,
+    }
+
+
+def load_history(path: pathlib.Path) -> list[dict]:
+    """Return the recorded runs, or an empty list if there is no history yet."""
+    if not path.is_file():
+        return []
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except json.JSONDecodeError as e:
+        logger.warning(f"Ignoring unreadable benchmark history {path}: {e}")
+        return []
+
+
+def find_regressions(run: dict, history: list[dict], threshold: float = DEFAULT_REGRESSION_THRESHOLD) -> list[str]:
+    """Compares a run with the last recorded run of the same size and seed and describes every slower stage."""
+    previous = next((old for old in reversed(history)
+                     if (old.get("books"), old.get("authors"), old.get("seed")) == (run["books"], run["authors"], run["seed"])), None)
+    if previous is None:
+        return []
+    regressions = []
+    for name, stage in run["stages"].items():
+        old_seconds = previous["stages"].get(name, {}).get("seconds")
+        seconds = stage.get("seconds")
+        if old_seconds is None or seconds is None:
+            continue
+        if seconds > old_seconds * (1 + threshold) and seconds - old_seconds >= MIN_REGRESSION_SECONDS:
+            regressions.append(f"{name}: {old_seconds:.3f}s -> {seconds:.3f}s (+{(seconds / old_seconds - 1) * 100:.0f}%)")
+    return regressions
+
+
+def print_report(run: dict, regressions: list[str]) -> None:
+    """Prints the stage measurements of a run and any regressions."""
+    print(f"\n===== Benchmark: {run['books']} books, {run['authors']} authors, seed {run['seed']} =====")
+    for name, stage in run["stages"].items():
+        if "error" in stage:
+            print(f"{name:<70} ERROR {stage['error']}")
+            continue
+        throughput = f"{stage['rows_per_second']:>14,.0f} rows/s" if stage["rows_per_second"] else ""
+        rss = f"{stage['peak_rss_mb']:8.1f} MiB" if stage["peak_rss_mb"] is not None else ""
+        # Runs recorded before peak_rss_scope existed measured the cumulative peak.
+        if rss and stage.get("peak_rss_scope", "cumulative") == "cumulative":
+            rss += " (cumulative peak)"
+        print(f"{name:<70} {stage['seconds']:9.3f}s {throughput:>21} {rss}")
+    print("\n===== Regressions =====")
+    for line in regressions or ["(none)"]:
+        print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark loading, features, queries and chart data on a generated catalog.")
+    parser.add_argument("--books", type=count_argument, default=100_000, help="Number of books (e.g. 1e6).")
+    parser.add_argument("--authors", type=count_argument, default=None,
+                        help="Number of authors (default: one per ten books).")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for the catalog.")
+    parser.add_argument("--work-dir", type=pathlib.Path, default=BENCHMARK_FOLDER.joinpath("work"),
+                        help="Scratch folder for the generated CSVs and database (recreated on every run).")
+    parser.add_argument("--history", type=pathlib.Path, default=HISTORY_FILE,
+                        help="JSON file the run is appended to.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+                        help="Relative slowdown that counts as a regression (default: 0.20).")
+    parser.add_argument("--fail-on-regression", action="store_true",
+                        help="Exit with status 1 when any stage regressed or startup is over budget.")
+    parser.add_argument("--startup-only", action="store_true",
+                        help="Only measure cli.py startup against the budget; skip the catalog stages.")
+    args = parser.parse_args()
+
+    startup_stages, startup_violations = measure_startup()
+    if args.startup_only:
+        for name, stage in startup_stages.items():
+            print(f"{name:<40} {stage['seconds']:9.3f}s")
+        for line in startup_violations or [f"(all within the {STARTUP_BUDGET_SECONDS:.2f}s startup budget)"]:
+            print(line)
+        if args.fail_on_regression and startup_violations:
+            sys.exit(1)
+        return
+
+    run = run_benchmark(args.work_dir, args.books, args.authors, args.seed)
+    if "books" not in run:
+        logger.error("Catalog generation failed; nothing to record.")
+        sys.exit(1)
+    run["stages"] = {**startup_stages, **run["stages"]}
+
+    history = load_history(args.history)
+    regressions = find_regressions(run, history, args.threshold) + startup_violations
+    print_report(run, regressions)
+    args.history.parent.mkdir(parents=True, exist_ok=True)
+    args.history.write_text(json.dumps(history + [run], indent=2), encoding="utf-8")
+    logger.info(f"Appended benchmark run to {args.history}")
+    if args.fail_on_regression and regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
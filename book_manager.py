@@ -1,9 +1,14 @@
 # Import from Python Standard Library first
+import argparse
 import sqlite3
 import pathlib
+import time
 
-# Import from external packages
-import pandas as pd
+# Import from local modules
+# (pandas is imported by utils_dtypes on first use, in insert_data_from_csv)
+from utils_db import DB_PATH, connect, open_connection
+from utils_dtypes import read_csv
+from utils_search import check_search_index, rebuild_search_index, search, vacuum_database
 
 # Define paths using joinpath
 db_file_path = pathlib.Path("project.db")
@@ -24,7 +29,7 @@ def verify_and_create_folders(paths):
 def create_database(db_path):
     """Create a new SQLite database file if it doesn't exist."""
     try:
-        conn = sqlite3.connect(db_path)
+        conn = connect(db_path)
         conn.close()
         print("Database created successfully.")
     except sqlite3.Error as e:
@@ -33,7 +38,7 @@ def create_database(db_path):
 def create_tables(db_path, sql_file_path):
     """Read and execute SQL statements to create tables."""
     try:
-        with sqlite3.connect(db_path) as conn:
+        with open_connection(db_path) as conn:
             with open(sql_file_path, "r") as file:
                 sql_script = file.read()
             conn.executescript(sql_script)
@@ -42,11 +47,11 @@ def create_tables(db_path, sql_file_path):
         print(f"Error creating tables: {e}")
 
 def insert_data_from_csv(db_path, author_data_path, book_data_path):
-    import pandas as pd
     try:
-        authors_df = pd.read_csv(author_data_path)
-        books_df = pd.read_csv(book_data_path)
-        with sqlite3.connect(db_path) as conn:
+        # storage=True keeps prices as float64, so they are written back exactly.
+        authors_df = read_csv(author_data_path, storage=True)
+        books_df = read_csv(book_data_path, storage=True)
+        with open_connection(db_path) as conn:
             # Use if_exists="replace" to overwrite any old data.
             authors_df.to_sql("authors", conn, if_exists="replace", index=False)
             books_df.to_sql("books", conn, if_exists="replace", index=False)
@@ -54,7 +59,59 @@ def insert_data_from_csv(db_path, author_data_path, book_data_path):
     except Exception as e:
         print(f"Error inserting data: {e}")
 
-def main():
+def print_search_results(db_path, text, limit=10, prefix=True):
+    """Print the books and authors that best match text, with the matched words in [brackets]."""
+    try:
+        conn = connect(db_path, read_only=True)
+    except sqlite3.Error as e:
+        print(f"Error opening the database: {e}")
+        return
+    try:
+        start = time.perf_counter()
+        results = search(conn, text, limit=limit, prefix=prefix)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+    except sqlite3.Error as e:
+        print(f"Error searching: {e}")
+        return
+    finally:
+        conn.close()
+
+    for kind, hits in results.items():
+        print(f"\n{kind.capitalize()} matching {text!r}:")
+        if not hits:
+            print("  (no matches)")
+        for hit in hits:
+            print(f"  {hit.id:<14} {hit.snippet:<60} score {hit.score:.2f}")
+    print(f"\nSearched in {elapsed_ms:.1f} ms.")
+
+def rebuild_search(db_path):
+    """Re-index every book title and author name, e.g. after VACUUM."""
+    try:
+        with open_connection(db_path) as conn:
+            rebuild_search_index(conn)
+        print("Search index rebuilt successfully.")
+    except sqlite3.Error as e:
+        print(f"Error rebuilding the search index: {e}")
+
+def check_search(db_path):
+    """Rebuild only the search indexes that no longer match their tables."""
+    try:
+        with open_connection(db_path) as conn:
+            rebuilt = check_search_index(conn)
+        print(f"Rebuilt: {', '.join(rebuilt)}." if rebuilt else "Search indexes are consistent.")
+    except sqlite3.Error as e:
+        print(f"Error checking the search index: {e}")
+
+def vacuum(db_path):
+    """Compact the database, then re-index the search indexes VACUUM may have left pointing at old rowids."""
+    try:
+        with open_connection(db_path) as conn:
+            vacuum_database(conn)
+        print("Database vacuumed and search index rebuilt successfully.")
+    except sqlite3.Error as e:
+        print(f"Error vacuuming the database: {e}")
+
+def setup():
     paths_to_verify = [sql_file_path, author_data_path, book_data_path]
     verify_and_create_folders(paths_to_verify)   
 
@@ -62,5 +119,33 @@ def main():
     create_tables(db_file_path, sql_file_path)
     insert_data_from_csv(db_file_path, author_data_path, book_data_path)
 
+def main():
+    parser = argparse.ArgumentParser(description="Create the project database, or search its books and authors.")
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND")
+    subparsers.add_parser("setup", help="Create project.db and load the CSV data (the default).")
+    search_parser = subparsers.add_parser("search", help="Full-text search over book titles and author names.")
+    search_parser.add_argument("text", help='Words to search for; the last one may be a prefix, e.g. "harry pot".')
+    search_parser.add_argument("--limit", type=int, default=10, help="Maximum matches per kind (default: 10).")
+    search_parser.add_argument("--exact", action="store_true", help="Match whole words only, without prefixes.")
+    search_parser.add_argument("--db", type=pathlib.Path, default=DB_PATH, help=f"Database to search (default: {DB_PATH}).")
+    rebuild_parser = subparsers.add_parser("rebuild-search", help="Re-index every book title and author name.")
+    rebuild_parser.add_argument("--db", type=pathlib.Path, default=DB_PATH, help=f"Database to re-index (default: {DB_PATH}).")
+    check_parser = subparsers.add_parser("check-search", help="Re-index only if the search index no longer matches the tables.")
+    check_parser.add_argument("--db", type=pathlib.Path, default=DB_PATH, help=f"Database to check (default: {DB_PATH}).")
+    vacuum_parser = subparsers.add_parser("vacuum", help="VACUUM the database, then re-index search.")
+    vacuum_parser.add_argument("--db", type=pathlib.Path, default=DB_PATH, help=f"Database to compact (default: {DB_PATH}).")
+    args = parser.parse_args()
+
+    if args.command == "search":
+        print_search_results(args.db, args.text, limit=args.limit, prefix=not args.exact)
+    elif args.command == "rebuild-search":
+        rebuild_search(args.db)
+    elif args.command == "check-search":
+        check_search(args.db)
+    elif args.command == "vacuum":
+        vacuum(args.db)
+    else:
+        setup()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,110 @@
+"""
+Command Line Interface Script
+File: cli.py
+
+This script runs the project's stages from one entry point, in one process, on one connection.
+
+Features:
+- Subcommands: setup (db01_setup.py), features (db02_features.py), query (db03_queries.py)
+  and all (the three stages in order).
+- Starts fast: pandas and matplotlib are only imported when the query stage needs them,
+  and the log file is only opened when the first message is logged.
+- Shares one SQL profiler across the stages and prints a single report at the end.
+- Skips stages whose input files and options are unchanged since their last run, as long as no
+  other stage has overwritten their data since, and reuses the results of unchanged report
+  statements (see utils_pipeline.py); --force runs everything.
+
+Examples:
+    python cli.py --help
+    python cli.py setup --sync
+    python cli.py all --batch reports/
+    python cli.py --force all --batch reports/
+"""
+
+# Imports from Python Standard Library
+import argparse
+import pathlib
+import sys
+import time
+
+# Imports from local modules
+import db01_setup
+import db02_features
+import db03_queries
+from utils_db import DB_PATH, connect
+from utils_logger import logger
+from utils_pipeline import Pipeline
+from utils_profile import StatementProfiler, add_profile_arguments
+
+# Pipeline stages: name -> (run function, function returning the stage's inputs, stage it reads from)
+STAGES = {
+    "setup": (db01_setup.run_setup, db01_setup.stage_inputs, None),
+    "features": (db02_features.run_features, db02_features.stage_inputs, "setup"),
+    "query": (db03_queries.load_report_data, db03_queries.stage_inputs, "features"),
+}
+
+# Stages run by each subcommand, in order. The query stage is followed by the report itself.
+COMMANDS = {
+    "setup": ["setup"],
+    "features": ["features"],
+    "query": ["query"],
+    "all": ["setup", "features", "query"],
+}
+
+def build_parser() -> argparse.ArgumentParser:
+    """Return the argument parser with one subcommand per stage plus "all"."""
+    parser = argparse.ArgumentParser(prog="cli.py", description="Set up, update and report on the book database.")
+    parser.add_argument("--db", type=pathlib.Path, default=DB_PATH, help=f"SQLite database (default: {DB_PATH}).")
+    parser.add_argument("--force", action="store_true",
+                        help="Run every stage and report statement, even those whose inputs are unchanged.")
+    add_profile_arguments(parser)
+    subparsers = parser.add_subparsers(dest="command", required=True, metavar="COMMAND")
+
+    db01_setup.add_arguments(subparsers.add_parser("setup", help="Create or migrate the schema and load the CSV data."))
+    db02_features.add_arguments(subparsers.add_parser("features", help="Rebuild the sample data and run the update/delete scripts."))
+    db03_queries.add_arguments(subparsers.add_parser("query", help="Run the report queries and charts."))
+
+    # setup and query share options such as --sync; the later definition wins with the same meaning.
+    all_parser = subparsers.add_parser("all", help="Run setup, features and query in order.", conflict_handler="resolve")
+    db01_setup.add_arguments(all_parser)
+    db02_features.add_arguments(all_parser)
+    db03_queries.add_arguments(all_parser)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> None:
+    start = time.perf_counter()
+    args = build_parser().parse_args(argv)
+    profiler = StatementProfiler(slow_ms=args.slow_ms)
+
+    try:
+        connection = connect(args.db)
+        logger.info(f"Connected to database: {args.db}")
+    except Exception as e:
+        logger.error(f"Error connecting to database: {e}")
+        sys.exit(1)
+
+    try:
+        pipeline = Pipeline(connection, force=args.force)
+        stages = [(name, STAGES[name][1](args), [STAGES[name][2]] if STAGES[name][2] else []) for name in COMMANDS[args.command]]
+        pipeline.plan(stages)
+        for name, inputs, upstream in stages:
+            run_stage = STAGES[name][0]
+            stage_start = time.perf_counter()
+            pipeline.run_stage(name, inputs, lambda: run_stage(connection, args, profiler), upstream=upstream)
+            logger.info(f"Stage {name} finished in {time.perf_counter() - stage_start:.3f}s")
+            if name == "query":
+                # Statement results stay valid until the query stage (the data they read) runs again.
+                store = pipeline.result_store(["query"], context=[f"preview_rows={args.preview_rows}"])
+                db03_queries.report_queries(connection, args, profiler, cache=store)
+                store.flush(connection)
+        logger.info(f"Pipeline ran {pipeline.ran or 'no stages'}; skipped {pipeline.skipped or 'none'}")
+    finally:
+        if args.profile_top > 0 and profiler.records:
+            profiler.print_report(args.profile_top)
+        connection.close()
+        logger.info(f"Database connection closed; {args.command} took {time.perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
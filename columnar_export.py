@@ -0,0 +1,99 @@
+"""
+Column Export Script
+File: columnar_export.py
+
+This script exports the catalog tables to memory-mapped column files and runs the chart
+computations on them (see utils_columnar.py).
+
+Features:
+- export: writes books and authors to columns/ next to the database, or brings an earlier export up
+  to date, rewriting only the tables that changed and appending rows that were only added.
+- info: lists the exported tables with their rows, export time and size.
+- charts: computes the db03_queries.py chart data from the export, without querying SQLite, and
+  prints it with the time each chart took; --compare also times the SQL version of each chart.
+
+Examples:
+    python columnar_export.py export
+    python columnar_export.py --db data/partitioned/db.sqlite export --full
+    python columnar_export.py charts --compare
+"""
+
+# Imports from Python Standard Library
+import argparse
+import pathlib
+import sys
+import time
+
+# Imports from local modules
+import db03_queries
+from utils_columnar import columns_folder, describe_export, export_columns, open_columns
+from utils_db import DB_PATH, connect
+from utils_logger import logger
+
+
+def export(args: argparse.Namespace) -> None:
+    """Exports the tables, or refreshes the tables of an earlier export that changed."""
+    connection = connect(args.db)
+    try:
+        results = export_columns(connection, args.output or columns_folder(args.db), full=args.full)
+    finally:
+        connection.close()
+    for result in results.values():
+        print(f"{result.table}: {result.mode}, {result.added:,} rows written, {result.rows:,} rows ({result.seconds:.3f}s)")
+
+
+def info(args: argparse.Namespace) -> None:
+    """Prints the tables of the export."""
+    folder = args.output or columns_folder(args.db)
+    lines = describe_export(folder)
+    if not lines:
+        print(f"No column export in {folder}; run: python columnar_export.py export")
+        return
+    print("\n".join(lines))
+
+
+def charts(args: argparse.Namespace) -> None:
+    """Computes the chart data from the export and prints it, optionally timing the SQL version too."""
+    export = open_columns(args.output or columns_folder(args.db))
+    connection = connect(args.db, read_only=True) if args.compare else None
+    try:
+        for name, data_function, _ in db03_queries.CHARTS:
+            start = time.perf_counter()
+            df = data_function(None, export=export)
+            elapsed = time.perf_counter() - start
+            timing = f"{elapsed * 1000:.1f} ms"
+            if connection is not None:
+                start = time.perf_counter()
+                data_function(connection)
+                timing += f" (SQL: {(time.perf_counter() - start) * 1000:.1f} ms)"
+            print(f"\n{name}: {timing}")
+            print("(no data)" if df is None else df.to_string(index=False, max_rows=20))
+    finally:
+        if connection is not None:
+            connection.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export the catalog tables to memory-mapped columns and chart from them.")
+    parser.add_argument("--db", type=pathlib.Path, default=DB_PATH, help=f"Database to export (default: {DB_PATH}).")
+    parser.add_argument("--output", type=pathlib.Path, default=None,
+                        help="Folder of the export (default: columns/ next to the database).")
+    subparsers = parser.add_subparsers(dest="command", required=True, metavar="COMMAND")
+    export_parser = subparsers.add_parser("export", help="Export the tables, or refresh the ones that changed.")
+    export_parser.add_argument("--full", action="store_true", help="Export every table again, even if it has not changed.")
+    subparsers.add_parser("info", help="List the exported tables.")
+    charts_parser = subparsers.add_parser("charts", help="Compute the report chart data from the export.")
+    charts_parser.add_argument("--compare", action="store_true", help="Also time each chart computed in SQL.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        {"export": export, "info": info, "charts": charts}[args.command](args)
+    except Exception as e:
+        logger.error(f"columnar_export.py {args.command} failed: {e}")
+        sys.exit(1)
+    logger.info(f"columnar_export.py {args.command} took {time.perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
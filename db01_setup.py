@@ -1,17 +1,33 @@
-import sqlite3
+import argparse
 import os
 import pathlib
-import pandas as pd
 import sys
+from utils_db import connect
 from utils_logger import logger  # Import the logger
+from utils_loader import DEFAULT_CHUNK_SIZE, load_csv_files
+from utils_migrate import apply_migrations, list_migrations
+from utils_pipeline import invalidate_pipeline
+from utils_profile import StatementProfiler, add_profile_arguments, profile_scope
+from utils_sync import sync_csv_files
 
-def execute_sql_file(connection, file_path: pathlib.Path) -> None:
+# Define path variables
+ROOT_DIR = pathlib.Path(__file__).parent.resolve()
+SQL_CREATE_FOLDER = ROOT_DIR.joinpath("sql_create")
+DATA_FOLDER = ROOT_DIR.joinpath("data")
+DB_PATH = DATA_FOLDER.joinpath('db.sqlite')
+
+# Define CSV file paths (ensure these CSVs have the correct headers)
+AUTHOR_CSV = DATA_FOLDER.joinpath("authors.csv")
+BOOK_CSV = DATA_FOLDER.joinpath("books.csv")
+
+def execute_sql_file(connection, file_path: pathlib.Path, profiler: StatementProfiler | None = None) -> None:
     """
     Executes a SQL file using the provided SQLite connection.
 
     Args:
         connection (sqlite3.Connection): SQLite connection object.
         file_path (pathlib.Path): Path to the SQL file to be executed.
+        profiler (StatementProfiler): Optional profiler timing each statement of the file.
     """
     # Check if the SQL file exists before proceeding
     if not file_path.is_file():
@@ -22,7 +38,7 @@ def execute_sql_file(connection, file_path: pathlib.Path) -> None:
         with open(file_path, 'r') as file:
             # Read the SQL file into a string
             sql_script: str = file.read()
-        with connection:
+        with connection, profile_scope(profiler, connection, file_path.name):
             # Execute the SQL script using the connection
             connection.executescript(sql_script)
         logger.info(f"Executed: {file_path}")
@@ -30,65 +46,101 @@ def execute_sql_file(connection, file_path: pathlib.Path) -> None:
         logger.error(f"Failed to execute {file_path}: {e}")
         raise
 
-def insert_data_from_csv(db_path: pathlib.Path, author_csv: pathlib.Path, book_csv: pathlib.Path) -> None:
+def insert_data_from_csv(connection, author_csv: pathlib.Path, book_csv: pathlib.Path, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                         validate: bool = False) -> None:
     """
-    Reads CSV files using pandas and inserts data into the database.
+    Streams the CSV files into the database in chunks of chunk_size rows.
     This replaces any existing data in the 'authors' and 'books' tables.
+    With validate, rows that fail utils_validate's checks are skipped and written to reject files.
     """
     try:
-        # Read CSV files using pandas
-        authors_df = pd.read_csv(author_csv)
-        books_df = pd.read_csv(book_csv)
-        # Write data to the database, replacing any existing data
-        with sqlite3.connect(db_path) as conn:
-            authors_df.to_sql("authors", conn, if_exists="replace", index=False)
-            books_df.to_sql("books", conn, if_exists="replace", index=False)
+        load_csv_files(connection, [("authors", author_csv), ("books", book_csv)], chunk_size=chunk_size, validate=validate)
         logger.info("CSV data inserted successfully.")
     except Exception as e:
         logger.error(f"Error inserting CSV data: {e}")
         raise
 
-def main() -> None:
+def sync_data_from_csv(connection, author_csv: pathlib.Path, book_csv: pathlib.Path, chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+    """
+    Applies only the rows that changed in the CSV files to the 'authors' and 'books' tables,
+    instead of replacing the tables.
+    """
+    try:
+        sync_csv_files(connection, [("authors", author_csv, "author_id"), ("books", book_csv, "book_id")], chunk_size=chunk_size)
+        logger.info("CSV data synced successfully.")
+    except Exception as e:
+        logger.error(f"Error syncing CSV data: {e}")
+        raise
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adds the setup options to a parser (shared by this script and cli.py setup)."""
+    parser.add_argument("--sync", action="store_true",
+                        help="Apply only the CSV rows that changed instead of reloading the tables.")
+    parser.add_argument("--reset", action="store_true",
+                        help="Drop the tables and re-create the schema from sql_migrations before loading.")
+    parser.add_argument("--validate", action="store_true",
+                        help="Check the CSV rows first and skip the rejected ones (reads each file three times "
+                             "and keeps its keys in memory).")
+
+def stage_inputs(args: argparse.Namespace) -> list:
+    """Returns the files and options the setup stage's result depends on (see utils_pipeline.py)."""
+    return [AUTHOR_CSV, BOOK_CSV, *[path for _, _, path in list_migrations()], f"reset={args.reset}", f"sync={args.sync}",
+            f"validate={args.validate}"]
+
+def run_setup(connection, args: argparse.Namespace, profiler: StatementProfiler | None = None) -> None:
+    """
+    Creates or migrates the schema and loads (or, with --sync, syncs) the CSV data.
+
+    Args:
+        connection (sqlite3.Connection): Read-write connection to the database.
+        args (argparse.Namespace): Options from add_arguments.
+        profiler (StatementProfiler): Optional profiler recording the SQL scripts.
+    """
     # Log the start of the database setup
     logger.info("Starting database setup...")
-    
-    # Define path variables
-    ROOT_DIR = pathlib.Path(__file__).parent.resolve()
-    SQL_CREATE_FOLDER = ROOT_DIR.joinpath("sql_create")
-    DATA_FOLDER = ROOT_DIR.joinpath("data")
-    DB_PATH = DATA_FOLDER.joinpath('db.sqlite')
-    
-    # Define CSV file paths (ensure these CSVs have the correct headers)
-    AUTHOR_CSV = DATA_FOLDER.joinpath("authors.csv")
-    BOOK_CSV = DATA_FOLDER.joinpath("books.csv")
-    
+
+    # Drop the tables only when a clean rebuild is requested
+    if args.reset:
+        execute_sql_file(connection, SQL_CREATE_FOLDER.joinpath('01_drop_tables.sql'), profiler)
+
+    # Apply any pending migrations to create or update the keyed schema
+    apply_migrations(connection)
+    # If you have a SQL script that inserts test data, comment it out if you want to use CSV data.
+    # execute_sql_file(connection, SQL_CREATE_FOLDER.joinpath('03_insert_tables.sql'))
+
+    # Insert data from CSV files into the declared tables on the same connection
+    if args.sync:
+        sync_data_from_csv(connection, AUTHOR_CSV, BOOK_CSV)
+    else:
+        insert_data_from_csv(connection, AUTHOR_CSV, BOOK_CSV, validate=args.validate)
+
+    logger.info("Database setup and CSV data import completed successfully.")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Create the database and load the CSV data.")
+    add_arguments(parser)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    profiler = StatementProfiler(slow_ms=args.slow_ms)
+
     # Ensure the data folder exists
     DATA_FOLDER.mkdir(exist_ok=True)
     
+    connection = None
     try:
-        # Connect to SQLite database (it will be created if it doesn't exist)
-        connection = sqlite3.connect(DB_PATH)
+        # Connect to SQLite database (it will be created if it doesn't exist, in WAL mode)
+        connection = connect(DB_PATH)
         logger.info(f"Connected to database: {DB_PATH}")
-        
-        # Execute SQL files to set up the database schema
-        execute_sql_file(connection, SQL_CREATE_FOLDER.joinpath('01_drop_tables.sql'))
-        execute_sql_file(connection, SQL_CREATE_FOLDER.joinpath('02_create_tables.sql'))
-        # If you have a SQL script that inserts test data, comment it out if you want to use CSV data.
-        # execute_sql_file(connection, SQL_CREATE_FOLDER.joinpath('03_insert_tables.sql'))
-        
-        connection.close()  # Close connection before CSV import
-        
-        # Insert data from CSV files to populate the database with your CSV headers
-        insert_data_from_csv(DB_PATH, AUTHOR_CSV, BOOK_CSV)
-        
-        logger.info("Database setup and CSV data import completed successfully.")
+        run_setup(connection, args, profiler)
+        # The data was changed outside cli.py's pipeline, so its recorded stages no longer describe the database.
+        invalidate_pipeline(connection)
+        if args.profile_top > 0 and profiler.records:
+            profiler.print_report(args.profile_top)
     except Exception as e:
         logger.error(f"Error during database setup: {e}")
     finally:
-        try:
+        if connection is not None:
             connection.close()
-        except Exception:
-            pass
         logger.info("Database connection closed.")
 
 if __name__ == '__main__':
@@ -1,15 +1,28 @@
-import sqlite3
+import argparse
 import pathlib
 import sys
+from utils_bulk import bulk_delete, bulk_update
+from utils_db import connect
+from utils_loader import read_csv_header
 from utils_logger import logger  # Import the logger
+from utils_migrate import apply_migrations, list_migrations
+from utils_pipeline import invalidate_pipeline
+from utils_profile import StatementProfiler, add_profile_arguments, profile_scope
 
-def execute_sql_file(connection, file_path: pathlib.Path) -> None:
+ROOT_DIR = pathlib.Path(__file__).parent.resolve()
+DATA_FOLDER = ROOT_DIR.joinpath("data")
+DB_PATH = DATA_FOLDER.joinpath("db.sqlite")
+SQL_CREATE_FOLDER = ROOT_DIR.joinpath("sql_create")
+SQL_FEATURES_FOLDER = ROOT_DIR.joinpath("sql_features")
+
+def execute_sql_file(connection, file_path: pathlib.Path, profiler: StatementProfiler | None = None) -> None:
     """
     Executes a SQL file using the provided SQLite connection.
 
     Args:
         connection (sqlite3.Connection): SQLite connection object.
         file_path (pathlib.Path): Path to the SQL file to be executed.
+        profiler (StatementProfiler): Optional profiler timing each statement of the file.
     """
     if not file_path.is_file():
         logger.error(f"SQL file does not exist: {file_path}")
@@ -18,45 +31,99 @@ def execute_sql_file(connection, file_path: pathlib.Path) -> None:
     try:
         with open(file_path, 'r') as file:
             sql_script = file.read()
-        with connection:
+        with connection, profile_scope(profiler, connection, file_path.name):
             connection.executescript(sql_script)
         logger.info(f"Executed SQL file: {file_path}")
     except Exception as e:
         logger.error(f"Error executing SQL file {file_path}: {e}")
         raise
 
-def main() -> None:
-    ROOT_DIR = pathlib.Path(__file__).parent.resolve()
-    DATA_FOLDER = ROOT_DIR.joinpath("data")
-    DB_PATH = DATA_FOLDER.joinpath("db.sqlite")
-    SQL_CREATE_FOLDER = ROOT_DIR.joinpath("sql_create")
-    SQL_FEATURES_FOLDER = ROOT_DIR.joinpath("sql_features")
-    
-    # Ensure the data folder exists
-    DATA_FOLDER.mkdir(exist_ok=True)
-    
-    try:
-        connection = sqlite3.connect(DB_PATH)
-        logger.info(f"Connected to database: {DB_PATH}")
-    except Exception as e:
-        logger.error(f"Error connecting to database: {e}")
-        return
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adds the feature options to a parser (shared by this script and cli.py features)."""
+    parser.add_argument("--prices", type=pathlib.Path, action="append", default=[], metavar="CSV",
+                        help="Set book prices from a book_id,book_price CSV file (may be repeated).")
+    parser.add_argument("--updates", type=pathlib.Path, action="append", default=[], metavar="CSV",
+                        help="Set the columns of a CSV file whose first column is book_id or author_id (may be repeated).")
+    parser.add_argument("--deletes", type=pathlib.Path, action="append", default=[], metavar="CSV",
+                        help="Delete the books or authors listed in the first column of a CSV file (may be repeated).")
+
+def apply_bulk_files(connection, args: argparse.Namespace, profiler: StatementProfiler | None = None) -> list:
+    """
+    Applies the --prices, --updates and --deletes CSV files, in that order, as set-based statements
+    (see utils_bulk.py). Returns a BulkResult per file.
+    """
+    for csv_path in args.prices:
+        header = read_csv_header(csv_path)
+        if header != ["book_id", "book_price"]:
+            logger.error(f"A prices file must have the columns book_id,book_price; {csv_path} has {','.join(header)}")
+            raise ValueError(f"Unexpected columns in prices file {csv_path}")
+    results = [bulk_update(connection, csv_path, profiler=profiler) for csv_path in [*args.prices, *args.updates]]
+    results += [bulk_delete(connection, csv_path, profiler=profiler) for csv_path in args.deletes]
+    return results
+
+def stage_inputs(args: argparse.Namespace) -> list:
+    """Returns the files the features stage's result depends on (see utils_pipeline.py)."""
+    return [
+        SQL_CREATE_FOLDER.joinpath('01_drop_tables.sql'),
+        *[path for _, _, path in list_migrations()],
+        SQL_CREATE_FOLDER.joinpath('03_insert_tables.sql'),
+        SQL_FEATURES_FOLDER.joinpath("update_records.sql"),
+        SQL_FEATURES_FOLDER.joinpath("delete_records.sql"),
+        *args.prices,
+        *args.updates,
+        *args.deletes,
+    ]
+
+def run_features(connection, args: argparse.Namespace, profiler: StatementProfiler | None = None) -> None:
+    """
+    Rebuilds the sample data, runs the update and delete feature scripts and applies the bulk CSV files.
 
+    Args:
+        connection (sqlite3.Connection): Read-write connection to the database.
+        args (argparse.Namespace): Options from add_arguments.
+        profiler (StatementProfiler): Optional profiler recording the SQL scripts.
+    """
     # Drop and re-create the tables with the correct schema (matching CSV headers)
-    execute_sql_file(connection, SQL_CREATE_FOLDER.joinpath('01_drop_tables.sql'))
-    execute_sql_file(connection, SQL_CREATE_FOLDER.joinpath('02_create_tables.sql'))
+    execute_sql_file(connection, SQL_CREATE_FOLDER.joinpath('01_drop_tables.sql'), profiler)
+    apply_migrations(connection)
     
     # Insert records into the tables using the SQL script (should match the CSV headers)
-    execute_sql_file(connection, SQL_CREATE_FOLDER.joinpath('03_insert_tables.sql'))
+    execute_sql_file(connection, SQL_CREATE_FOLDER.joinpath('03_insert_tables.sql'), profiler)
     
     # Now run the feature scripts (update and delete operations)
     update_sql_file = SQL_FEATURES_FOLDER.joinpath("update_records.sql")
-    execute_sql_file(connection, update_sql_file)
+    execute_sql_file(connection, update_sql_file, profiler)
 
     delete_sql_file = SQL_FEATURES_FOLDER.joinpath("delete_records.sql")
-    execute_sql_file(connection, delete_sql_file)
+    execute_sql_file(connection, delete_sql_file, profiler)
+
+    # Bulk prices, updates and deletes from CSV files, each staged and applied in one transaction
+    apply_bulk_files(connection, args, profiler)
     
     logger.info("Feature engineering operations completed successfully.")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rebuild the sample data and run the update/delete feature scripts.")
+    add_arguments(parser)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    profiler = StatementProfiler(slow_ms=args.slow_ms)
+
+    # Ensure the data folder exists
+    DATA_FOLDER.mkdir(exist_ok=True)
+    
+    try:
+        connection = connect(DB_PATH)
+        logger.info(f"Connected to database: {DB_PATH}")
+    except Exception as e:
+        logger.error(f"Error connecting to database: {e}")
+        return
+
+    run_features(connection, args, profiler)
+    # The data was changed outside cli.py's pipeline, so its recorded stages no longer describe the database.
+    invalidate_pipeline(connection)
+    if args.profile_top > 0:
+        profiler.print_report(args.profile_top)
     connection.close()
     logger.info("Database connection closed.")
 
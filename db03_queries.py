@@ -1,34 +1,75 @@
-import sqlite3
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import json
+import os
 import pathlib
+import shutil
 import sys
-import pandas as pd
-import matplotlib.pyplot as plt
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from utils_columnar import ColumnarTable, average_year, books_per_author, columns_folder, decade_counts, export_columns, open_columns, top_prices
+from utils_db import connect, database_path
+from utils_dtypes import frame_from_rows, read_sql_query
 from utils_logger import logger  # Import your custom logger
+from utils_loader import DEFAULT_CHUNK_SIZE, load_csv_files
+from utils_migrate import apply_migrations, list_migrations
+from utils_partition import fan_out_aggregate, partition_layout
+from utils_pipeline import PipelineResultStore, invalidate_pipeline
+from utils_result_cache import DEFAULT_MAX_BYTES, ResultCache, normalize_sql
+from utils_results import DEFAULT_PREVIEW_ROWS, QueryPreview, describe_preview, preview_query
+from utils_lazy import lazy_import
+from utils_profile import StatementProfiler, add_profile_arguments, profile_scope
+from utils_runner import DEFAULT_WORKERS, run_concurrently
+from utils_snapshot import DEFAULT_SNAPSHOT_MAX_BYTES, DatabaseSnapshot
+from utils_sql_registry import NamedStatement, get_statement, get_statements
+from utils_sync import sync_csv_files
+
+# pandas and matplotlib are imported on first use, so importing this module (e.g. for cli.py --help) stays fast.
+pd = lazy_import("pandas")
+# Set a global font size for other matplotlib elements once pyplot is imported.
+plt = lazy_import("matplotlib.pyplot", on_import=lambda pyplot: pyplot.rcParams.update({'font.size': 11}))
+
+ROOT_DIR = pathlib.Path(__file__).parent.resolve()
+DATA_FOLDER = ROOT_DIR.joinpath("data")
+DB_PATH = DATA_FOLDER.joinpath("db.sqlite")
+SQL_QUERIES_FOLDER = ROOT_DIR.joinpath("sql_queries")
 
-# Set a global font size for other matplotlib elements.
-plt.rcParams.update({'font.size': 11})
+# Number of individual books shown in the price pie chart; the rest share an "Other" slice.
+PRICE_PIE_TOP_N = 8
 
-def insert_data_from_csv(db_path: pathlib.Path, authors_csv: pathlib.Path, books_csv: pathlib.Path) -> None:
+def insert_data_from_csv(connection, authors_csv: pathlib.Path, books_csv: pathlib.Path, chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
     """
-    Reads the CSV files and imports the data into the database.
+    Streams the CSV files into the database in chunks of chunk_size rows.
     This will replace the 'authors' and 'books' tables with data from the CSV files.
+    The load runs on the caller's connection rather than opening a second one that would compete for the write lock.
     """
     try:
-        authors_df = pd.read_csv(authors_csv)
-        books_df = pd.read_csv(books_csv)
-        with sqlite3.connect(db_path) as conn:
-            authors_df.to_sql("authors", conn, if_exists="replace", index=False)
-            books_df.to_sql("books", conn, if_exists="replace", index=False)
+        load_csv_files(connection, [("authors", authors_csv), ("books", books_csv)], chunk_size=chunk_size)
         logger.info("CSV data inserted successfully.")
     except Exception as e:
         logger.error(f"Error inserting CSV data: {e}")
         raise
 
-def execute_script_file(connection, file_path: pathlib.Path) -> None:
+def sync_data_from_csv(connection, authors_csv: pathlib.Path, books_csv: pathlib.Path, chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+    """
+    Applies only the rows that changed in the CSV files to the 'authors' and 'books' tables,
+    instead of replacing the tables.
+    """
+    try:
+        sync_csv_files(connection, [("authors", authors_csv, "author_id"), ("books", books_csv, "book_id")], chunk_size=chunk_size)
+        logger.info("CSV data synced successfully.")
+    except Exception as e:
+        logger.error(f"Error syncing CSV data: {e}")
+        raise
+
+def execute_script_file(connection, file_path: pathlib.Path, profiler: StatementProfiler | None = None) -> None:
     """
     Executes a SQL script file (which may contain multiple statements)
-    using connection.executescript. If a duplicate column error occurs
-    (for example, for book_price), log a warning and continue.
+    using connection.executescript. If a profiler is given, each statement is timed.
     """
     if not file_path.is_file():
         logger.error(f"SQL script file does not exist: {file_path}")
@@ -36,46 +77,121 @@ def execute_script_file(connection, file_path: pathlib.Path) -> None:
     try:
         with open(file_path, 'r') as file:
             sql_script = file.read()
-        with connection:
+        with connection, profile_scope(profiler, connection, file_path.name):
             connection.executescript(sql_script)
         logger.info(f"Executed SQL script file: {file_path}")
-    except sqlite3.OperationalError as e:
-        if "duplicate column name: book_price" in str(e):
-            logger.warning(f"Column 'book_price' already exists in {file_path}. Skipping ALTER TABLE command.")
-        else:
-            logger.error(f"Error executing SQL script file {file_path}: {e}")
-            raise
     except Exception as e:
         logger.error(f"Error executing SQL script file {file_path}: {e}")
         raise
 
-def execute_multiple_queries(connection, file_path: pathlib.Path) -> list:
+def preview_frame(preview: QueryPreview) -> pd.DataFrame:
+    """Returns the preview rows of a query as a DataFrame (with compact dtypes) for printing and rendering."""
+    return frame_from_rows(preview.rows, preview.columns)
+
+def spooled_result_path(spool_dir: pathlib.Path, sql: str) -> pathlib.Path:
+    """Returns the file in spool_dir that execute_statement streams the full result of sql to."""
+    return spool_dir.joinpath(hashlib.sha256(normalize_sql(sql).encode("utf-8")).hexdigest()[:32] + ".csv")
+
+def execute_statement(connection, statement: NamedStatement, cache: ResultCache | None = None,
+                      preview_rows: int = DEFAULT_PREVIEW_ROWS, profiler: StatementProfiler | None = None,
+                      spool_dir: pathlib.Path | None = None) -> tuple | None:
     """
-    Executes multiple SELECT statements from a SQL file by splitting the file
-    on semicolons (assuming semicolons are not present in literals) and returns a list
-    of tuples: (statement, DataFrame).
+    Executes one registry statement and returns (statement, QueryPreview), or None if it fails.
+    Only the first rows are kept in memory; the rest are streamed to count and summarize them.
+    If a ResultCache is given, the preview is reused until the data in the database changes.
+    If a StatementProfiler is given, every execution (not cache hits) is profiled.
+    If a spool_dir is given, every row is also written to a CSV file there (see spooled_result_path)
+    in the same pass, so a batch report does not have to run the statement again for its CSV output.
     """
+    def run(sql: str, conn) -> QueryPreview:
+        with profile_scope(profiler, conn, statement.name) as scope:
+            if spool_dir is None:
+                preview = preview_query(conn, sql, preview_rows=preview_rows)
+            else:
+                # Written under a name of its own and renamed, as a duplicate statement may run at the same time.
+                path = spooled_result_path(spool_dir, sql)
+                partial = path.with_name(f"{path.stem}.{threading.get_ident()}.part")
+                preview = write_result_csv(conn, sql, partial, preview_rows=preview_rows)
+                os.replace(partial, path)
+            scope.rows = preview.row_count
+        return preview
+
+    try:
+        preview = cache.fetch(connection, statement.sql, run) if cache is not None else run(statement.sql, connection)
+        logger.bind(statement=statement.name, rows=preview.row_count, first_row_seconds=preview.first_row_seconds,
+                    seconds=preview.elapsed_seconds).info(f"Executed statement {statement.name}: {preview.row_count} rows, "
+                    f"first row after {preview.first_row_seconds * 1000:.1f} ms")
+        return statement.sql, preview
+    except Exception as e:
+        logger.error(f"Error executing statement {statement.name}:\n{statement.sql}\nError: {e}")
+        return None
+
+def read_query_file(file_path: pathlib.Path) -> list:
+    """Returns the parsed statements of a SQL query file, or an empty list if it cannot be read."""
     if not file_path.is_file():
         logger.error(f"SQL query file does not exist: {file_path}")
         return []
     try:
-        with open(file_path, 'r') as file:
-            content = file.read()
-        # Split on semicolons and remove empty statements.
-        statements = [stmt.strip() for stmt in content.split(';') if stmt.strip()]
-        results = []
-        for stmt in statements:
-            try:
-                df = pd.read_sql_query(stmt, connection)
-                results.append((stmt, df))
-                logger.info(f"Executed statement (first 50 chars): {stmt[:50]}...")
-            except Exception as e:
-                logger.error(f"Error executing statement:\n{stmt}\nError: {e}")
-        return results
+        return get_statements(file_path)
     except Exception as e:
         logger.error(f"Error reading SQL query file {file_path}: {e}")
         return []
 
+def execute_multiple_queries(connection, file_path: pathlib.Path, cache: ResultCache | None = None,
+                             preview_rows: int = DEFAULT_PREVIEW_ROWS, profiler: StatementProfiler | None = None) -> list:
+    """
+    Executes the statements of a SQL file and returns a list of tuples: (statement, QueryPreview).
+    The file is parsed once by the statement registry and only re-parsed when it changes.
+    If a ResultCache is given, results are reused until the data in the database changes.
+    """
+    if cache is not None:
+        cache.pin(connection)
+    results = [execute_statement(connection, statement, cache, preview_rows, profiler) for statement in read_query_file(file_path)]
+    return [result for result in results if result is not None]
+
+def execute_query_files(db_path: pathlib.Path | str, file_paths: list, workers: int = DEFAULT_WORKERS,
+                        cache: ResultCache | None = None, preview_rows: int = DEFAULT_PREVIEW_ROWS,
+                        profiler: StatementProfiler | None = None, spool_dir: pathlib.Path | None = None) -> dict:
+    """
+    Executes the statements of several SQL files at the same time on a pool of read-only connections.
+    Every statement is a separate job, so the report takes about as long as its slowest statement.
+
+    Args:
+        db_path (pathlib.Path | str): Path to the SQLite database file, or a "file:" URI (e.g. a snapshot).
+        file_paths (list): SQL query files to execute.
+        workers (int): Maximum number of statements running at the same time.
+        cache (ResultCache): Optional cache of query results, pinned by the caller (see ResultCache.pin).
+        preview_rows (int): Number of leading rows kept for every statement.
+        profiler (StatementProfiler): Optional profiler recording every statement.
+        spool_dir (pathlib.Path): Folder every executed statement also writes its full result to.
+
+    Returns:
+        dict: For every file name, its list of (statement, QueryPreview) tuples in file order.
+    """
+    jobs = [(file_path.name, statement) for file_path in file_paths for statement in read_query_file(file_path)]
+    results = run_concurrently(db_path, jobs, lambda connection, job: execute_statement(connection, job[1], cache, preview_rows,
+                                                                                          profiler, spool_dir), workers)
+    grouped = {file_path.name: [] for file_path in file_paths}
+    for (file_name, _), result in zip(jobs, results):
+        if result is not None:
+            grouped[file_name].append(result)
+    return grouped
+
+def execute_named_query(connection, name: str) -> pd.DataFrame:
+    """
+    Executes one statement from sql_queries/ by its registry name
+    (for example "query_sorting.sort_books_alphabetically_by_title") and returns the result.
+    """
+    statement = get_statement(name)
+    df = read_sql_query(statement.sql, connection)
+    logger.info(f"Executed statement {statement.name}")
+    return df
+
+def result_title(qf: str, stmt: str, preview: QueryPreview) -> str:
+    """Returns the figure title for a query result, noting when only the first rows are shown."""
+    shown = f" (first {len(preview.rows)} of {preview.row_count} rows)" if len(preview.rows) < preview.row_count else ""
+    return f"Results for {qf}{shown}\nQuery: {stmt[:50]}..."
+
 def maximize_figure():
     """
     Attempts to maximize the current matplotlib figure window.
@@ -94,202 +210,659 @@ def maximize_figure():
     except Exception as e:
         logger.warning("Error maximizing figure: " + str(e))
 
+def show_figure(fig) -> None:
+    """
+    Maximizes the figure window, shows it and waits for a key press (Spacebar/Enter)
+    in the figure window before closing it.
+    """
+    maximize_figure()
+    plt.show(block=False)
+    print("Press Spacebar or Enter in the figure window to continue...")
+    plt.waitforbuttonpress()
+    plt.close(fig)
+
+def draw_dataframe_text(fig, df: pd.DataFrame, title: str) -> None:
+    """
+    Draws the DataFrame as preformatted text on the figure using a monospace font.
+    """
+    table_str = df.to_string(index=False)
+    num_lines = table_str.count('\n') + 1
+    fig.set_size_inches(12, num_lines * 0.6 + 2)
+    ax = fig.add_subplot()
+    ax.axis('off')
+    ax.text(0.5, 0.5, table_str, fontsize=17, ha='center', va='center', fontfamily='monospace')
+    ax.set_title(title, fontsize=21)
+    fig.tight_layout()
+
 def display_dataframe_text(df: pd.DataFrame, title: str) -> None:
     """
     Displays the DataFrame as preformatted text in a matplotlib figure using a monospace font.
     Maximizes the figure window and waits for a key press (Spacebar/Enter) in the figure window.
     """
     try:
-        table_str = df.to_string(index=False)
-        num_lines = table_str.count('\n') + 1
-        fig, ax = plt.subplots(figsize=(12, num_lines * 0.6 + 2), dpi=100)
-        maximize_figure()
-        ax.axis('off')
-        ax.text(0.5, 0.5, table_str, fontsize=17, ha='center', va='center', fontfamily='monospace')
-        plt.title(title, fontsize=21)
-        plt.tight_layout()
-        plt.show(block=False)
-        print("Press Spacebar or Enter in the figure window to continue...")
-        plt.waitforbuttonpress()
-        plt.close(fig)
+        fig = plt.figure(dpi=100)
+        draw_dataframe_text(fig, df, title)
+        show_figure(fig)
     except Exception as e:
         logger.error(f"Error displaying DataFrame text: {e}")
 
-def visualize_publication_year_histogram(connection) -> None:
+def publication_year_data(connection, export: dict[str, ColumnarTable] | None = None) -> pd.DataFrame | None:
+    """
+    Returns the number of books per decade between 1950 and 2020, counted in SQL so only one
+    row per decade leaves SQLite, or None if there are no books in that range.
+    Like the histogram bins, the last decade also includes 2020.
+    On a partitioned catalog only the partitions holding those years are counted, in parallel.
+    With a column export (see utils_columnar.py) the years are counted from its arrays instead.
+    """
+    query = """
+    SELECT 
+        (MIN(year_published, 2019) / 10) * 10 AS decade,
+        COUNT(*) AS total_books
+    FROM books
+    WHERE year_published BETWEEN 1950 AND 2020
+    GROUP BY decade
+    ORDER BY decade;
+    """
+    if export is not None:
+        columns, rows = decade_counts(export["books"], 1950, 2020)
+        df = frame_from_rows(rows, columns)
+    elif partition_layout(connection):
+        # Counted in every partition that holds years in the range at once, then summed per decade.
+        columns, rows = fan_out_aggregate(connection, query, merge={"total_books": "sum"}, year_range=(1950, 2020))
+        df = frame_from_rows(rows, columns)
+    else:
+        df = read_sql_query(query, connection)
+    if df.empty:
+        logger.error("No year_published data available for histogram.")
+        return None
+    return df
+
+def draw_publication_year_histogram(fig, df: pd.DataFrame) -> None:
+    """
+    Draws a histogram of the number of books by publication year,
+    using bins from 1950 to 2020 in 10-year intervals.
+    """
+    bins = list(range(1950, 2030, 10))
+    fig.set_size_inches(8, 6)
+    ax = fig.add_subplot()
+    # Each decade's count is already aggregated, so weight one value per bin by it.
+    ax.hist(df['decade'], bins=bins, weights=df['total_books'], edgecolor='black', color='skyblue')
+    ax.set_xlabel('Publication Year', fontsize=13)
+    ax.set_ylabel('Number of Books', fontsize=13)
+    ax.set_title('Distribution of Books by Publication Year (1950-2020)', fontsize=15)
+    ax.set_xticks(bins)
+    ax.tick_params(axis='both', labelsize=11)
+    fig.tight_layout()
+
+def visualize_publication_year_histogram(connection, export: dict[str, ColumnarTable] | None = None) -> None:
     """
     Creates a histogram of the number of books by publication year,
     using bins from 1950 to 2020 in 10-year intervals.
     """
     try:
-        query = "SELECT year_published FROM books WHERE year_published BETWEEN 1950 AND 2020"
-        df = pd.read_sql_query(query, connection)
-        if df.empty:
-            logger.error("No year_published data available for histogram.")
+        df = publication_year_data(connection, export=export)
+        if df is None:
             return
-        bins = list(range(1950, 2030, 10))
-        fig, ax = plt.subplots(figsize=(8, 6), dpi=100)
-        maximize_figure()
-        ax.hist(df['year_published'], bins=bins, edgecolor='black', color='skyblue')
-        ax.set_xlabel('Publication Year', fontsize=13)
-        ax.set_ylabel('Number of Books', fontsize=13)
-        ax.set_title('Distribution of Books by Publication Year (1950-2020)', fontsize=15)
-        ax.set_xticks(bins)
-        ax.tick_params(axis='both', labelsize=11)
-        plt.tight_layout()
-        plt.show(block=False)
-        print("Press Spacebar or Enter in the figure window to continue...")
-        plt.waitforbuttonpress()
-        plt.close()
+        fig = plt.figure(dpi=100)
+        draw_publication_year_histogram(fig, df)
+        show_figure(fig)
     except Exception as e:
         logger.error(f"Error during publication year histogram visualization: {e}")
 
-def visualize_book_price_pie(connection) -> None:
+def book_price_data(connection, top_n: int = PRICE_PIE_TOP_N,
+                    export: dict[str, ColumnarTable] | None = None) -> pd.DataFrame | None:
+    """
+    Returns the top_n most expensive books plus one "Other" row holding the summed price of
+    all remaining books, aggregated in SQL so at most top_n + 1 rows leave SQLite.
+    With a column export the same rows are computed from its arrays.
+    Returns None if no book has a price.
+    """
+    query = """
+    WITH top_books AS (
+        SELECT book_id, title, book_price
+        FROM books
+        WHERE book_price IS NOT NULL
+        ORDER BY book_price DESC, book_id
+        LIMIT :top_n
+    )
+    SELECT title AS label, book_price AS total_price, 1 AS book_count
+    FROM top_books
+    UNION ALL
+    SELECT 'Other', SUM(book_price), COUNT(*)
+    FROM books
+    WHERE book_price IS NOT NULL AND book_id NOT IN (SELECT book_id FROM top_books);
+    """
+    if export is not None:
+        columns, rows = top_prices(export["books"], top_n)
+        df = frame_from_rows(rows, columns)
+    else:
+        df = read_sql_query(query, connection, params={"top_n": top_n})
+    df = df[df['book_count'] > 0]
+    if df.empty:
+        logger.error("No book_price data available for pie chart.")
+        return None
+    return df
+
+def draw_book_price_pie(fig, df: pd.DataFrame) -> None:
+    """
+    Draws a pie chart where each slice represents a book's price (or the summed price of the
+    "Other" books) as a percentage of the total book prices. Each slice is labeled with its price.
+    """
+    labels = [
+        f"{label} ({count} books)\n{price:.2f}" if label == 'Other' and count > 1 else f"{label}\n{price:.2f}"
+        for label, price, count in zip(df['label'], df['total_price'], df['book_count'])
+    ]
+    fig.set_size_inches(8, 6)
+    ax = fig.add_subplot()
+    ax.pie(df['total_price'], labels=labels, autopct='%1.1f%%', startangle=140, textprops={'fontsize': 11})
+    ax.set_title('Book Price Distribution', fontsize=19)
+    fig.tight_layout()
+
+def visualize_book_price_pie(connection, export: dict[str, ColumnarTable] | None = None) -> None:
     """
-    Creates a pie chart where each slice represents a book's price as a percentage of
-    the total book prices. The label for each slice is the book's price.
+    Creates a pie chart of the most expensive books' prices, plus an "Other" slice,
+    as a percentage of the total book prices.
     """
     try:
-        query = "SELECT book_price FROM books WHERE book_price IS NOT NULL"
-        df = pd.read_sql_query(query, connection)
-        if df.empty:
-            logger.error("No book_price data available for pie chart.")
+        df = book_price_data(connection, export=export)
+        if df is None:
             return
-        labels = df['book_price'].astype(str)
-        fig, ax = plt.subplots(figsize=(8, 6), dpi=100)
-        maximize_figure()
-        ax.pie(df['book_price'], labels=labels, autopct='%1.1f%%', startangle=140, textprops={'fontsize': 15})
-        ax.set_title('Book Price Distribution', fontsize=19)
-        plt.tight_layout()
-        plt.show(block=False)
-        print("Press Spacebar or Enter in the figure window to continue...")
-        plt.waitforbuttonpress()
-        plt.close()
+        fig = plt.figure(dpi=100)
+        draw_book_price_pie(fig, df)
+        show_figure(fig)
     except Exception as e:
         logger.error(f"Error during book price pie chart visualization: {e}")
 
-def visualize_total_books_per_author(connection) -> None:
+def total_books_per_author_data(connection, export: dict[str, ColumnarTable] | None = None) -> pd.DataFrame | None:
+    """
+    Returns the total number of books per author name, read from the trigger-maintained
+    author_stats rollups with a LEFT JOIN to include all authors, or None if there are no authors.
+    With a column export the books are counted per author from its arrays instead.
+    """
+    query = """
+    SELECT 
+        a.first, 
+        a.surname,
+        COALESCE(SUM(s.book_count), 0) AS total_books
+    FROM authors a
+    LEFT JOIN author_stats s ON a.author_id = s.author_id
+    GROUP BY a.first, a.surname
+    ORDER BY a.surname;
+    """
+    if export is not None:
+        columns, rows = books_per_author(export["books"], export["authors"])
+        df = frame_from_rows(rows, columns)
+    else:
+        df = read_sql_query(query, connection)
+    if df.empty:
+        logger.error("No data available for Total Books per Author visualization.")
+        return None
+    return df
+
+def draw_total_books_per_author(fig, df: pd.DataFrame) -> None:
+    """
+    Draws a bar chart showing the total number of books per author.
+    Displays the author's first and surname (concatenated) as the x-axis labels.
+    """
+    # first and surname are categoricals (see utils_dtypes.py), which cannot be concatenated as text.
+    full_name = df['first'].astype(str) + ' ' + df['surname'].astype(str)
+    fig.set_size_inches(10, 6)
+    ax = fig.add_subplot()
+    ax.bar(full_name, df['total_books'], color='skyblue')
+    ax.set_xlabel('Author (First and Surname)', fontsize=13)
+    ax.set_ylabel('Total Books', fontsize=13)
+    ax.set_title('Total Books per Author', fontsize=15)
+    plt.setp(ax.get_xticklabels(), rotation=45, ha='right', fontsize=11)
+    ax.tick_params(axis='y', labelsize=11)
+    fig.tight_layout()
+
+def visualize_total_books_per_author(connection, export: dict[str, ColumnarTable] | None = None) -> None:
     """
     Creates a bar chart showing the total number of books per author.
-    Uses a LEFT JOIN to include all authors.
+    Reads the trigger-maintained author_stats rollups with a LEFT JOIN to include all authors.
     Displays the author's first and surname (concatenated) as the x-axis labels.
     """
     try:
-        query = """
-        SELECT 
-            a.first, 
-            a.surname,
-            COUNT(b.book_id) AS total_books
-        FROM authors a
-        LEFT JOIN books b ON a.author_id = b.author_id
-        GROUP BY a.first, a.surname
-        ORDER BY a.surname;
-        """
-        df = pd.read_sql_query(query, connection)
-        if df.empty:
-            logger.error("No data available for Total Books per Author visualization.")
+        df = total_books_per_author_data(connection, export=export)
+        if df is None:
             return
-        df['full_name'] = df['first'] + ' ' + df['surname']
-        fig, ax = plt.subplots(figsize=(10, 6), dpi=100)
-        maximize_figure()
-        ax.bar(df['full_name'], df['total_books'], color='skyblue')
-        ax.set_xlabel('Author (First and Surname)', fontsize=13)
-        ax.set_ylabel('Total Books', fontsize=13)
-        ax.set_title('Total Books per Author', fontsize=15)
-        plt.xticks(rotation=45, ha='right', fontsize=11)
-        plt.yticks(fontsize=11)
-        plt.tight_layout()
-        plt.show(block=False)
-        print("Press Spacebar or Enter in the figure window to continue...")
-        plt.waitforbuttonpress()
-        plt.close()
+        fig = plt.figure(dpi=100)
+        draw_total_books_per_author(fig, df)
+        show_figure(fig)
     except Exception as e:
         logger.error(f"Error during visualization (Total Books per Author): {e}")
 
-def visualize_average_publication_year(connection) -> None:
+def average_publication_year_data(connection, export: dict[str, ColumnarTable] | None = None) -> pd.DataFrame | None:
+    """
+    Returns the average publication year of all books, or None if there is no data.
+    On a partitioned catalog it is computed from per-partition sums and counts,
+    and with a column export from its year array.
+    """
+    query = "SELECT AVG(year_published) AS average_year_published FROM books"
+    if export is not None:
+        columns, rows = average_year(export["books"])
+        df = frame_from_rows(rows, columns)
+    elif partition_layout(connection):
+        # An average cannot be merged, but the sums and counts it is made of can.
+        _, rows = fan_out_aggregate(
+            connection, "SELECT SUM(year_published) AS year_sum, COUNT(year_published) AS year_count FROM books",
+            merge={"year_sum": "sum", "year_count": "sum"})
+        year_sum, year_count = rows[0] if rows else (None, 0)
+        df = frame_from_rows([(year_sum / year_count if year_count else None,)], ["average_year_published"])
+    else:
+        df = read_sql_query(query, connection)
+    if df.empty or df['average_year_published'].isnull().all():
+        logger.error("No data available for Average Publication Year visualization.")
+        return None
+    return df
+
+def draw_average_publication_year(fig, df: pd.DataFrame) -> None:
+    """
+    Draws the average publication year as text.
+    """
+    avg_year = df.iloc[0]['average_year_published']
+    fig.set_size_inches(4, 4)
+    ax = fig.add_subplot()
+    ax.text(0.5, 0.5, f"Avg Publication Year: {avg_year:.0f}",
+            fontsize=19, ha='center', va='center')
+    ax.axis('off')
+    ax.set_title('Average Publication Year', fontsize=19)
+
+def visualize_average_publication_year(connection, export: dict[str, ColumnarTable] | None = None) -> None:
     """
     Creates a simple visualization for the average publication year.
     It queries the average year from the books table and displays it as text.
     """
     try:
-        query = "SELECT AVG(year_published) AS average_year_published FROM books"
-        df = pd.read_sql_query(query, connection)
-        if df.empty or df['average_year_published'].isnull().all():
-            logger.error("No data available for Average Publication Year visualization.")
+        df = average_publication_year_data(connection, export=export)
+        if df is None:
             return
-        avg_year = df.iloc[0]['average_year_published']
-        fig, ax = plt.subplots(figsize=(4, 4), dpi=100)
-        maximize_figure()
-        ax.text(0.5, 0.5, f"Avg Publication Year: {avg_year:.0f}",
-                fontsize=19, ha='center', va='center')
-        ax.axis('off')
-        plt.title('Average Publication Year', fontsize=19)
-        plt.show(block=False)
-        print("Press Spacebar or Enter in the figure window to continue...")
-        plt.waitforbuttonpress()
-        plt.close()
+        fig = plt.figure(dpi=100)
+        draw_average_publication_year(fig, df)
+        show_figure(fig)
     except Exception as e:
         logger.error(f"Error during Average Publication Year visualization: {e}")
 
-def main() -> None:
-    ROOT_DIR = pathlib.Path(__file__).parent.resolve()
-    DATA_FOLDER = ROOT_DIR.joinpath("data")
-    DB_PATH = DATA_FOLDER.joinpath("db.sqlite")
-    SQL_QUERIES_FOLDER = ROOT_DIR.joinpath("sql_queries")
-    
+# Charts drawn after the query results: (output file name, data function, draw function)
+CHARTS = [
+    ("publication_year_histogram", publication_year_data, draw_publication_year_histogram),
+    ("book_price_pie", book_price_data, draw_book_price_pie),
+    ("total_books_per_author", total_books_per_author_data, draw_total_books_per_author),
+    ("average_publication_year", average_publication_year_data, draw_average_publication_year),
+]
+
+# File in a --batch output folder recording which data version each output was written for
+REPORT_MANIFEST = ".report_manifest.json"
+
+# Folder in a --batch output folder where statements write their full results while they run
+RESULT_SPOOL_FOLDER = ".results"
+
+# Figure reused for every job rendered by a batch worker process
+_worker_figure = None
+
+def _init_render_worker() -> None:
+    """Selects the non-interactive Agg backend in a render worker process."""
+    plt.switch_backend("Agg")
+
+def _render_job(job: tuple) -> list:
+    """
+    Draws one batch job on the worker's reused figure and saves it in every requested format.
+    A job is (output path without suffix, draw function, draw arguments, formats).
+    Returns the paths written.
+    """
+    global _worker_figure
+    output_stem, draw_function, draw_args, formats = job
     try:
-        connection = sqlite3.connect(DB_PATH)
-        logger.info(f"Connected to database: {DB_PATH}")
+        if _worker_figure is None:
+            _worker_figure = plt.figure(dpi=100)
+        _worker_figure.clf()
+        draw_function(_worker_figure, *draw_args)
+        paths = []
+        for fmt in formats:
+            path = output_stem.with_suffix(f".{fmt}")
+            _worker_figure.savefig(path, format=fmt)
+            paths.append(path)
+        return paths
     except Exception as e:
-        logger.error(f"Error connecting to database: {e}")
+        logger.error(f"Error rendering {output_stem}: {e}")
+        return []
+
+def write_result_csv(connection, sql: str, path: pathlib.Path, preview_rows: int = 0) -> QueryPreview:
+    """Streams every row of a statement to a CSV file in batches and returns its QueryPreview."""
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        header_written = False
+
+        def write_batch(columns: list, rows: list) -> None:
+            nonlocal header_written
+            if not header_written:
+                writer.writerow(columns)
+                header_written = True
+            writer.writerows(rows)
+
+        preview = preview_query(connection, sql, preview_rows=preview_rows, on_batch=write_batch)
+        if not header_written:
+            writer.writerow(preview.columns)
+    return preview
+
+def _output_key(version: str | None, *parts) -> str | None:
+    """Returns the manifest key of a batch output, or None when outputs are not versioned."""
+    if version is None:
+        return None
+    return hashlib.sha256("\0".join([version, *map(str, parts)]).encode("utf-8")).hexdigest()
+
+def _outputs_current(output_dir: pathlib.Path, manifest: dict, stem: str, key: str | None, suffixes: list) -> bool:
+    """Returns True if every file of a batch output was written for the same key by an earlier run."""
+    return (key is not None and manifest.get(stem) == key
+            and all(output_dir.joinpath(stem).with_suffix(suffix).is_file() for suffix in suffixes))
+
+def render_report_batch(connection, query_results: dict, output_dir: pathlib.Path,
+                        formats: tuple = ("png", "svg"), workers: int | None = None,
+                        profiler: StatementProfiler | None = None, version: str | None = None,
+                        export: dict[str, ColumnarTable] | None = None, spool_dir: pathlib.Path | None = None) -> None:
+    """
+    Writes the whole report without opening any windows: every query result as HTML and CSV
+    tables plus a figure, and every chart, as files in output_dir. Figures are rendered in
+    parallel by a process pool on the Agg backend, each worker reusing one figure object.
+    A CSV that a statement already wrote to spool_dir while it ran is copied; only statements
+    whose preview came from a cache are run again to write theirs.
+    If a data version is given (see utils_pipeline.py), outputs that an earlier run wrote for the same
+    version, statement and formats are listed in REPORT_MANIFEST and left as they are.
+
+    Args:
+        connection (sqlite3.Connection): SQLite connection object.
+        query_results (dict): Query file name -> list of (statement, QueryPreview).
+        output_dir (pathlib.Path): Folder the report files are written to.
+        formats (tuple): Figure formats to save (e.g., png, svg).
+        workers (int): Number of render processes (defaults to the CPU count).
+        profiler (StatementProfiler): Optional profiler recording the chart data queries.
+        version (str): Fingerprint of the data the results were read from, or None to write everything.
+        export (dict): Optional column export (see open_column_export) the chart data is computed from.
+        spool_dir (pathlib.Path): Folder execute_statement wrote the full results to, if any.
+    """
+    start = time.perf_counter()
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = output_dir.joinpath(REPORT_MANIFEST)
+    manifest = json.loads(manifest_path.read_text()) if version is not None and manifest_path.is_file() else {}
+    figure_suffixes = [f".{fmt}" for fmt in formats]
+    jobs = []
+    job_keys = []
+    unchanged = 0
+    for qf, results in query_results.items():
+        for index, (stmt, preview) in enumerate(results, start=1):
+            output_stem = output_dir.joinpath(f"{pathlib.Path(qf).stem}_{index:02d}")
+            key = _output_key(version, normalize_sql(stmt), preview.row_count, formats)
+            if _outputs_current(output_dir, manifest, output_stem.name, key, [".csv", ".html", *figure_suffixes]):
+                unchanged += 1
+                continue
+            df = preview_frame(preview)
+            # The CSV holds every row, streamed in batches; the HTML and figure show the preview.
+            spooled = spooled_result_path(spool_dir, stmt) if spool_dir is not None else None
+            if spooled is not None and spooled.is_file():
+                shutil.copyfile(spooled, output_stem.with_suffix(".csv"))
+            else:
+                write_result_csv(connection, stmt, output_stem.with_suffix(".csv"))
+            df.to_html(output_stem.with_suffix(".html"), index=False)
+            jobs.append((output_stem, draw_dataframe_text, (df, result_title(qf, stmt, preview)), formats))
+            job_keys.append(key)
+    for name, data_function, draw_function in CHARTS:
+        key = _output_key(version, name, formats)
+        if _outputs_current(output_dir, manifest, name, key, figure_suffixes):
+            unchanged += 1
+            continue
+        try:
+            with profile_scope(profiler, connection, f"chart:{name}") as scope:
+                df = data_function(connection, export=export)
+                scope.rows = None if df is None else len(df)
+        except Exception as e:
+            logger.error(f"Error preparing chart data for {name}: {e}")
+            continue
+        if df is not None:
+            jobs.append((output_dir.joinpath(name), draw_function, (df,), formats))
+            job_keys.append(key)
+
+    written = 0
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_render_worker) as pool:
+            for job, key, paths in zip(jobs, job_keys, pool.map(_render_job, jobs)):
+                written += len(paths)
+                if key is not None and paths:
+                    manifest[job[0].name] = key
+    if version is not None:
+        manifest_path.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    elapsed = time.perf_counter() - start
+    logger.info(f"Batch report: {len(jobs)} figures ({written} files) written to {output_dir} in {elapsed:.2f}s, "
+                f"{unchanged} unchanged")
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adds the report options to a parser (shared by this script and cli.py query)."""
+    parser.add_argument("--sync", action="store_true",
+                        help="Apply only the CSV rows that changed instead of reloading the tables.")
+    parser.add_argument("--cache-mb", type=float, default=DEFAULT_MAX_BYTES / (1024 * 1024),
+                        help="Memory bound in MiB for cached query results.")
+    parser.add_argument("--cache-spill", type=pathlib.Path, default=None,
+                        help="Directory to spill evicted query results to instead of discarding them; later runs "
+                             "reuse them while the database files are unchanged.")
+    parser.add_argument("--batch", type=pathlib.Path, default=None, metavar="OUTPUT_DIR",
+                        help="Render every table and figure to OUTPUT_DIR without opening windows.")
+    parser.add_argument("--formats", default="png,svg",
+                        help="Comma-separated figure formats for --batch (default: png,svg).")
+    parser.add_argument("--render-workers", type=int, default=None,
+                        help="Number of processes rendering figures in --batch mode (default: CPU count).")
+    parser.add_argument("--preview-rows", type=int, default=DEFAULT_PREVIEW_ROWS,
+                        help=f"Number of leading rows printed and rendered per statement (default: {DEFAULT_PREVIEW_ROWS}).")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Number of report statements run at the same time (default: {DEFAULT_WORKERS}).")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="Copy the database into memory first and run every report on that frozen copy "
+                             "(not done for a partitioned catalog, which is read from disk).")
+    parser.add_argument("--snapshot-max-mb", type=float, default=DEFAULT_SNAPSHOT_MAX_BYTES / (1024 * 1024),
+                        help="Largest database in MiB to snapshot; bigger ones are read from disk (default: 1024).")
+    parser.add_argument("--columnar", action="store_true",
+                        help="Compute the charts from a memory-mapped column export of the tables, refreshed first.")
+
+# Report query files, in the order their results are printed.
+QUERY_FILES = [
+    "query_aggregation.sql",
+    "query_filters.sql",
+    "query_sorting.sql",
+    "query_group_by.sql",
+    "query_join.sql"
+]
+
+def stage_inputs(args: argparse.Namespace) -> list:
+    """Returns the files and options load_report_data's result depends on (see utils_pipeline.py)."""
+    return [
+        *[path for _, _, path in list_migrations()],
+        DATA_FOLDER.joinpath("authors.csv"),
+        DATA_FOLDER.joinpath("books.csv"),
+        SQL_QUERIES_FOLDER.joinpath("data_addition.sql"),
+        f"sync={args.sync}",
+    ]
+
+def load_report_data(connection, args: argparse.Namespace, profiler: StatementProfiler | None = None) -> None:
+    """
+    Migrates the schema, loads the CSV data and adds the pricing data the reports read.
+
+    Args:
+        connection (sqlite3.Connection): Read-write connection to the report database.
+        args (argparse.Namespace): Options from add_arguments.
+        profiler (StatementProfiler): Optional profiler recording every statement.
+    """
+    # Make sure the keyed schema (including book_price) is in place before loading.
+    try:
+        apply_migrations(connection)
+    except Exception as e:
+        logger.error(f"Failed to apply migrations: {e}")
         sys.exit(1)
     
     # Load CSV data into the database.
     authors_csv = DATA_FOLDER.joinpath("authors.csv")
     books_csv = DATA_FOLDER.joinpath("books.csv")
     try:
-        insert_data_from_csv(DB_PATH, authors_csv, books_csv)
+        if args.sync:
+            sync_data_from_csv(connection, authors_csv, books_csv)
+        else:
+            insert_data_from_csv(connection, authors_csv, books_csv)
     except Exception as e:
         logger.error(f"Failed to insert CSV data: {e}")
     
-    # Execute data_addition.sql to update schema and insert pricing data.
+    # Execute data_addition.sql to insert pricing data.
     data_addition_file = SQL_QUERIES_FOLDER.joinpath("data_addition.sql")
     try:
-        execute_script_file(connection, data_addition_file)
+        execute_script_file(connection, data_addition_file, profiler)
     except Exception as e:
         logger.error(f"Failed to execute data_addition.sql: {e}")
-    
-    # List of query files to execute.
-    query_files = [
-        "query_aggregation.sql",
-        "query_filters.sql",
-        "query_sorting.sql",
-        "query_group_by.sql",
-        "query_join.sql"
-    ]
-    
+
+def open_column_export(connection) -> dict[str, ColumnarTable] | None:
+    """
+    Brings the column export of the connection's database up to date (see utils_columnar.py) and
+    opens it. Returns None, so the charts are computed in SQL, if the export cannot be written.
+    """
+    folder = columns_folder(database_path(connection))
+    try:
+        results = export_columns(connection, folder)
+        export = open_columns(folder)
+    except Exception as e:
+        logger.warning(f"Not using the column export: {e}. The charts are computed in SQL.")
+        return None
+    print("\nColumn export: " + ", ".join(f"{result.table} {result.mode} ({result.rows:,} rows)" for result in results.values()))
+    return export
+
+def report_queries(connection, args: argparse.Namespace, profiler: StatementProfiler | None = None,
+                   cache: ResultCache | PipelineResultStore | None = None) -> None:
+    """
+    Runs every report query and shows (or, with --batch, writes) the results and charts.
+    With --snapshot they all read an in-memory copy of the database taken first (see utils_snapshot.py).
+    With --columnar the charts are computed from the column export, refreshed from the database file first.
+
+    Args:
+        connection (sqlite3.Connection): Read-write connection to the report database.
+        args (argparse.Namespace): Options from add_arguments.
+        profiler (StatementProfiler): Optional profiler recording every statement.
+        cache (ResultCache | PipelineResultStore): Where statement results are reused from.
+            Defaults to an in-memory ResultCache bounded by --cache-mb.
+    """
+    # The export state is kept in the database file, so it is refreshed there, not in a snapshot.
+    export = open_column_export(connection) if getattr(args, "columnar", False) else None
+    if not getattr(args, "snapshot", False):
+        _report_queries(connection, database_path(connection), args, profiler, cache, export)
+        return
+
+    try:
+        snapshot = DatabaseSnapshot(connection, max_bytes=int(args.snapshot_max_mb * 1024 * 1024))
+    except ValueError as e:
+        logger.warning(f"Not taking a snapshot: {e}. Running the reports on the database file.")
+        _report_queries(connection, database_path(connection), args, profiler, cache, export)
+        return
+
+    with snapshot:
+        # Every statement and chart reads the same frozen copy, so the report is consistent
+        # even while another process writes to the database file.
+        _report_queries(snapshot.connection, snapshot.uri, args, profiler, cache, export)
+        logger.info(snapshot.describe())
+        print(f"\n{snapshot.describe()}")
+
+def _report_queries(connection, db_source, args: argparse.Namespace, profiler: StatementProfiler | None,
+                    cache: ResultCache | PipelineResultStore | None,
+                    export: dict[str, ColumnarTable] | None = None) -> None:
+    """
+    Runs the reports on connection; worker connections open db_source (a file path or "file:" URI).
+    The charts are computed from export when it is given.
+    """
+    if args.batch:
+        # Headless report servers have no display, so never select an interactive backend.
+        plt.switch_backend("Agg")
+
+    query_files = QUERY_FILES
     query_results = {}
+    result_cache = cache if cache is not None else ResultCache(max_bytes=int(args.cache_mb * 1024 * 1024), spill_dir=args.cache_spill)
+    # The worker connections are opened for this fan-out only, so the results are keyed on this connection's version.
+    result_cache.pin(connection)
+    spool_dir = args.batch.joinpath(RESULT_SPOOL_FOLDER) if args.batch else None
+    if spool_dir is not None:
+        shutil.rmtree(spool_dir, ignore_errors=True)
+        spool_dir.mkdir(parents=True)
+    try:
+        _run_report(connection, args, query_files, query_results, db_source, result_cache, profiler, export, spool_dir)
+    finally:
+        if spool_dir is not None:
+            shutil.rmtree(spool_dir, ignore_errors=True)
+
+def _run_report(connection, args: argparse.Namespace, query_files: list, query_results: dict, db_source,
+                result_cache: ResultCache | PipelineResultStore, profiler: StatementProfiler | None,
+                export: dict[str, ColumnarTable] | None, spool_dir: pathlib.Path | None) -> None:
+    """Runs the query files and shows or writes their results and the charts (see _report_queries)."""
+    # The query files are independent read-only workloads, so run their statements concurrently.
+    logger.info(f"Executing {len(query_files)} query files with up to {args.workers} concurrent statements")
+    file_results = execute_query_files(db_source, [SQL_QUERIES_FOLDER.joinpath(qf) for qf in query_files],
+                                       workers=args.workers, cache=result_cache, preview_rows=args.preview_rows,
+                                       profiler=profiler, spool_dir=spool_dir)
     
     for qf in query_files:
-        file_path = SQL_QUERIES_FOLDER.joinpath(qf)
-        logger.info(f"Executing query file: {file_path}")
-        results = execute_multiple_queries(connection, file_path)
+        results = file_results[qf]
         if results:
             print(f"\nResults for {qf}:")
-            for stmt, df in results:
+            for stmt, preview in results:
+                df = preview_frame(preview)
                 print(f"\nStatement:\n{stmt}\n")
-                print(df)
-                display_dataframe_text(df, title=f"Results for {qf}\nQuery: {stmt[:50]}...")
+                print(df.to_string(index=False) if len(df) else "(no rows)")
+                print(describe_preview(preview))
+                if not args.batch:
+                    display_dataframe_text(df, title=result_title(qf, stmt, preview))
             query_results[qf] = results
         else:
             logger.error(f"No results returned for {qf}")
-            input("Press Enter to continue...")
+            if not args.batch:
+                input("Press Enter to continue...")
     
-    # Additional Visualizations:
-    visualize_publication_year_histogram(connection)
-    visualize_book_price_pie(connection)
-    visualize_total_books_per_author(connection)
-    visualize_average_publication_year(connection)
+    logger.info(f"Query result cache: {result_cache.hits} hits, {result_cache.misses} misses.")
+
+    if args.batch:
+        formats = tuple(fmt.strip() for fmt in args.formats.split(",") if fmt.strip())
+        # Results from the pipeline's store carry the fingerprint of the data they were read from.
+        version = result_cache.upstream if isinstance(result_cache, PipelineResultStore) else None
+        render_report_batch(connection, query_results, args.batch, formats=formats, workers=args.render_workers,
+                            profiler=profiler, version=version, export=export, spool_dir=spool_dir)
+    else:
+        # Additional Visualizations:
+        visualize_publication_year_histogram(connection, export)
+        visualize_book_price_pie(connection, export)
+        visualize_total_books_per_author(connection, export)
+        visualize_average_publication_year(connection, export)
+
+def run_queries(connection, args: argparse.Namespace, profiler: StatementProfiler | None = None) -> None:
+    """
+    Loads the CSV data, runs every report query and shows (or, with --batch, writes) the results and charts.
+
+    Args:
+        connection (sqlite3.Connection): Read-write connection to the report database.
+        args (argparse.Namespace): Options from add_arguments.
+        profiler (StatementProfiler): Optional profiler recording every statement.
+    """
+    load_report_data(connection, args, profiler)
+    report_queries(connection, args, profiler)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the report queries and visualizations.")
+    add_arguments(parser)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    profiler = StatementProfiler(slow_ms=args.slow_ms)
+    
+    try:
+        connection = connect(DB_PATH)
+        logger.info(f"Connected to database: {DB_PATH}")
+    except Exception as e:
+        logger.error(f"Error connecting to database: {e}")
+        sys.exit(1)
+
+    run_queries(connection, args, profiler)
+    # The data was reloaded outside cli.py's pipeline, so its recorded stages no longer describe the database.
+    invalidate_pipeline(connection)
     
+    if args.profile_top > 0:
+        profiler.print_report(args.profile_top)
     connection.close()
     logger.info("Database connection closed.")
 
@@ -0,0 +1,183 @@
+"""
+Synthetic Catalog Generator Script
+File: generate_catalog.py
+
+This script writes authors.csv and books.csv files of any size for load and query testing.
+
+Features:
+- Deterministic: the same --seed and sizes always produce byte-identical files.
+- Streams rows to disk in chunks, so 1e8 books need no more memory than 1e3.
+- Uses skewed, realistic distributions: a few prolific authors write most books (power law),
+  publication years cluster in recent decades, and prices follow a log-normal curve.
+- Uses the same headers and ID formats as data/authors.csv and data/books.csv, plus a book_price column.
+- Optionally writes book_prices.csv, a new price for every book, to test bulk price refreshes
+  (db02_features.py --prices).
+"""
+
+# Imports from Python Standard Library
+import argparse
+import csv
+import itertools
+import pathlib
+import random
+import time
+from typing import Iterator
+
+# Imports from local modules
+from utils_logger import logger
+
+ROOT_DIR = pathlib.Path(__file__).parent.resolve()
+OUTPUT_FOLDER = ROOT_DIR.joinpath("data").joinpath("generated")
+
+# Rows generated and written per writerows call
+WRITE_CHUNK_SIZE: int = 50_000
+
+# Higher values give more books to the first (most prolific) authors.
+DEFAULT_AUTHOR_SKEW: float = 3.0
+
+FIRST_NAMES = [
+    "Ada", "Alan", "Alice", "Amara", "Anna", "Arthur", "Beatrix", "Carlos", "Chen", "Clara", "Daniel", "Elena",
+    "Emily", "Fatima", "George", "Grace", "Hana", "Harper", "Isaac", "Jane", "John", "Kenji", "Leo", "Lina",
+    "Maria", "Mark", "Mei", "Nadia", "Noah", "Olga", "Omar", "Priya", "Ray", "Rosa", "Samuel", "Sofia",
+    "Thomas", "Ursula", "Victor", "Wei", "Yusuf", "Zora",
+]
+SURNAMES = [
+    "Abe", "Austen", "Baldwin", "Borges", "Bronte", "Calvino", "Christie", "Dickens", "Eliot", "Ferrante",
+    "Garcia", "Hemingway", "Ishiguro", "Joyce", "Kafka", "Lee", "Le Guin", "Mann", "Morrison", "Murakami",
+    "Nabokov", "Okafor", "Orwell", "Pratchett", "Rowling", "Rushdie", "Sato", "Shelley", "Smith", "Tolkien",
+    "Tolstoy", "Twain", "Walker", "Woolf", "Zhang",
+]
+TITLE_ADJECTIVES = [
+    "Silent", "Last", "Hidden", "Golden", "Broken", "Distant", "Secret", "Burning", "Forgotten", "Crimson",
+    "Endless", "Quiet", "Wild", "Lost", "Bright", "Hollow", "Iron", "Winter", "Summer", "Midnight",
+]
+TITLE_NOUNS = [
+    "River", "Garden", "Empire", "Letter", "Mountain", "Kingdom", "Voyage", "Mirror", "Harbor", "Library",
+    "Forest", "Orchard", "Station", "Island", "Crown", "Shadow", "Map", "Song", "House", "Sea",
+]
+
+
+def id_width(count: int) -> int:
+    """Return the zero-padded width of generated IDs: 3 digits like the sample data, more when needed."""
+    return max(3, len(str(count)))
+
+
+def iter_authors(author_count: int, seed: int) -> Iterator[tuple]:
+    """Yields (author_id, first, surname) rows."""
+    rng = random.Random(f"{seed}-authors")
+    width = id_width(author_count)
+    for number in range(1, author_count + 1):
+        yield f"AUTHOR_{number:0{width}d}", rng.choice(FIRST_NAMES), rng.choice(SURNAMES)
+
+
+def iter_books(book_count: int, author_count: int, seed: int, skew: float = DEFAULT_AUTHOR_SKEW) -> Iterator[tuple]:
+    """
+    Yields (book_id, title, year_published, author_id, book_price) rows.
+    Authors are drawn as int(author_count * u**skew) for uniform u, a power law that needs no lookup table.
+    About 2% of books have no price.
+    """
+    rng = random.Random(f"{seed}-books")
+    book_width = id_width(book_count)
+    author_width = id_width(author_count)
+    for number in range(1, book_count + 1):
+        author = min(int(author_count * rng.random() ** skew), author_count - 1) + 1
+        title = f"The {rng.choice(TITLE_ADJECTIVES)} {rng.choice(TITLE_NOUNS)}"
+        if rng.random() < 0.3:
+            title += f" {rng.choice(('II', 'III', 'Revisited', 'Returns', 'Chronicles'))}"
+        # Most books are recent; the exponential tail reaches back to early printing.
+        year = max(1450, 2024 - int(rng.expovariate(1 / 25)))
+        price = round(rng.lognormvariate(2.6, 0.45), 2) if rng.random() >= 0.02 else None
+        yield f"BOOK_{number:0{book_width}d}", title, year, f"AUTHOR_{author:0{author_width}d}", price
+
+
+def iter_price_refresh(book_count: int, seed: int) -> Iterator[tuple]:
+    """Yields (book_id, book_price) rows with a new price for every book, e.g. after a price review."""
+    rng = random.Random(f"{seed}-prices")
+    book_width = id_width(book_count)
+    for number in range(1, book_count + 1):
+        yield f"BOOK_{number:0{book_width}d}", round(rng.lognormvariate(2.6, 0.45), 2)
+
+
+def write_csv(path: pathlib.Path, header: list[str], rows: Iterator[tuple], chunk_size: int = WRITE_CHUNK_SIZE) -> int:
+    """Streams rows to a CSV file chunk by chunk and returns the number of rows written."""
+    row_count = 0
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(header)
+        while chunk := list(itertools.islice(rows, chunk_size)):
+            writer.writerows(chunk)
+            row_count += len(chunk)
+    return row_count
+
+
+def generate_catalog(
+    output_dir: pathlib.Path,
+    book_count: int,
+    author_count: int | None = None,
+    seed: int = 42,
+    skew: float = DEFAULT_AUTHOR_SKEW,
+) -> tuple[pathlib.Path, pathlib.Path]:
+    """
+    Writes authors.csv and books.csv to output_dir.
+
+    Args:
+        output_dir (pathlib.Path): Folder for the CSV files.
+        book_count (int): Number of books.
+        author_count (int): Number of authors (defaults to one per ten books).
+        seed (int): Random seed; the same seed gives the same files.
+        skew (float): Power-law exponent for books per author.
+
+    Returns:
+        tuple: Paths of the authors and books CSV files.
+    """
+    if book_count < 1:
+        raise ValueError(f"book_count must be at least 1, got {book_count}")
+    author_count = author_count or max(1, book_count // 10)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    authors_csv = output_dir.joinpath("authors.csv")
+    books_csv = output_dir.joinpath("books.csv")
+
+    start = time.perf_counter()
+    write_csv(authors_csv, ["author_id", "first", "surname"], iter_authors(author_count, seed))
+    write_csv(books_csv, ["book_id", "title", "year_published", "author_id", "book_price"],
+              iter_books(book_count, author_count, seed, skew))
+    elapsed = time.perf_counter() - start
+    logger.info(f"Generated {author_count} authors and {book_count} books in {output_dir} in {elapsed:.2f}s "
+                f"({book_count / elapsed if elapsed > 0 else float('inf'):,.0f} books/s)")
+    return authors_csv, books_csv
+
+
+def generate_price_refresh(output_dir: pathlib.Path, book_count: int, seed: int = 42) -> pathlib.Path:
+    """Writes book_prices.csv (book_id, book_price for every book) to output_dir and returns its path."""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    prices_csv = output_dir.joinpath("book_prices.csv")
+    write_csv(prices_csv, ["book_id", "book_price"], iter_price_refresh(book_count, seed))
+    logger.info(f"Generated new prices for {book_count} books in {prices_csv}")
+    return prices_csv
+
+
+def count_argument(value: str) -> int:
+    """Parse a row count given as an integer or in scientific notation (e.g. 1e6)."""
+    return int(float(value))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate synthetic authors.csv and books.csv files.")
+    parser.add_argument("--books", type=count_argument, default=1000, help="Number of books (e.g. 1e6).")
+    parser.add_argument("--authors", type=count_argument, default=None,
+                        help="Number of authors (default: one per ten books).")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed.")
+    parser.add_argument("--skew", type=float, default=DEFAULT_AUTHOR_SKEW,
+                        help="Power-law exponent for books per author (1 = uniform).")
+    parser.add_argument("--output-dir", type=pathlib.Path, default=OUTPUT_FOLDER,
+                        help="Folder for the generated CSV files.")
+    parser.add_argument("--price-refresh", action="store_true",
+                        help="Also write book_prices.csv with a new price for every book.")
+    args = parser.parse_args()
+    generate_catalog(args.output_dir, args.books, args.authors, args.seed, args.skew)
+    if args.price_refresh:
+        generate_price_refresh(args.output_dir, args.books, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""
+Index Advisor Script
+File: index_advisor.py
+
+This script checks how SQLite plans every statement in sql_queries/ and recommends indexes.
+
+Features:
+- Runs EXPLAIN QUERY PLAN on each statement and reports every SCAN or temporary sort B-tree.
+- Recommends indexes from the join, filter, group and sort columns of the statements that scan:
+  single-column indexes for joins and filters, composite indexes for multi-column GROUP BY,
+  and composite indexes for multi-column ORDER BY (e.g., year_published, title) that also cover
+  the columns the statement filters by, never every column of the table: each indexed column
+  is rewritten by every write to it.
+- Never recommends an index that an existing index already serves, or whose leading columns
+  are an existing index's key (e.g. the primary key followed by more columns).
+- With --apply, writes the recommendations as the next migration in sql_migrations/,
+  applies it, and reports the plans before and after so each change from SCAN to SEARCH can be checked.
+"""
+
+# Imports from Python Standard Library
+import argparse
+import pathlib
+import re
+import sqlite3
+
+# Imports from local modules
+from utils_db import connect
+from utils_logger import logger
+from utils_migrate import MIGRATIONS_FOLDER, apply_migrations, list_migrations
+from utils_sql import strip_sql_comments, table_columns
+from utils_sql_registry import get_statements, statement_summary
+
+ROOT_DIR = pathlib.Path(__file__).parent.resolve()
+DB_PATH = ROOT_DIR.joinpath("data").joinpath("db.sqlite")
+SQL_QUERIES_FOLDER = ROOT_DIR.joinpath("sql_queries")
+
+# Words that can follow a table name in FROM/JOIN and are not an alias
+SQL_KEYWORDS = {
+    "WHERE", "INNER", "LEFT", "RIGHT", "OUTER", "CROSS", "JOIN", "ON", "GROUP", "ORDER",
+    "HAVING", "LIMIT", "SET", "UNION", "AS", "USING",
+}
+
+CLAUSE_END = r"(?=\b(?:INNER|LEFT|RIGHT|CROSS|JOIN|WHERE|GROUP|HAVING|ORDER|LIMIT|UNION)\b|$)"
+
+
+def explain_query_plan(connection: sqlite3.Connection, statement: str) -> list[str]:
+    """Return the detail lines of EXPLAIN QUERY PLAN for a statement."""
+    return [row[3] for row in connection.execute(f"EXPLAIN QUERY PLAN {statement}")]
+
+
+def plan_scans(plan: list[str]) -> list[str]:
+    """
+    Return the plan lines that read a whole table without an index or sort through a temporary B-tree.
+    Ordered walks of an index ("SCAN ... USING INDEX") are not counted.
+    """
+    return [
+        line for line in plan
+        if (line.startswith("SCAN ") and " USING " not in line and "CONSTANT ROW" not in line)
+        or line.startswith("USE TEMP B-TREE")
+    ]
+
+
+def _table_aliases(statement: str) -> dict[str, str]:
+    """Map every table name and alias used in FROM/JOIN/UPDATE to its table."""
+    aliases = {}
+    for match in re.finditer(r"\b(?:FROM|JOIN|UPDATE)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", statement, re.IGNORECASE):
+        table, alias = match.group(1), match.group(2)
+        aliases[table] = table
+        if alias and alias.upper() not in SQL_KEYWORDS:
+            aliases[alias] = table
+    return aliases
+
+
+def _resolve_column(connection: sqlite3.Connection, reference: str, aliases: dict[str, str]) -> tuple[str, str] | None:
+    """Resolve "alias.column" or "column" to (table, column), or None for expressions and unknown names."""
+    reference = re.sub(r"\s+(?:ASC|DESC)$", "", reference.strip(), flags=re.IGNORECASE)
+    match = re.fullmatch(r"(?:(\w+)\.)?(\w+)", reference)
+    if not match:
+        return None
+    qualifier, column = match.groups()
+    if qualifier:
+        table = aliases.get(qualifier)
+        return (table, column) if table and column in table_columns(connection, table) else None
+    tables = {table for table in aliases.values() if column in table_columns(connection, table)}
+    return (tables.pop(), column) if len(tables) == 1 else None
+
+
+def _clause(statement: str, keyword: str) -> str:
+    """Return the text of the first clause starting with keyword, up to the next clause."""
+    match = re.search(rf"\b{keyword}\b(.*?){CLAUSE_END}", statement, re.IGNORECASE | re.DOTALL)
+    return match.group(1) if match else ""
+
+
+def _column_list(connection: sqlite3.Connection, text: str, aliases: dict[str, str]) -> list[tuple[str, str]]:
+    """Resolve a comma-separated column list (GROUP BY / ORDER BY); any expression makes it unusable."""
+    columns = [_resolve_column(connection, item, aliases) for item in text.split(",") if item.strip()]
+    return columns if columns and all(columns) else []
+
+
+def existing_index_keys(connection: sqlite3.Connection, table: str) -> list[list[str]]:
+    """Return the key columns of every index on a table, including the primary key."""
+    keys = []
+    primary_key = [row[1] for row in sorted(connection.execute(f'PRAGMA table_info("{table}")'), key=lambda row: row[5]) if row[5] > 0]
+    if primary_key:
+        keys.append(primary_key)
+    for index in connection.execute(f'PRAGMA index_list("{table}")').fetchall():
+        keys.append([row[2] for row in connection.execute(f'PRAGMA index_xinfo("{index[1]}")') if row[5] and row[2]])
+    return keys
+
+
+def recommend_indexes(connection: sqlite3.Connection, statement: str, plan: list[str]) -> list[tuple[str, tuple, tuple]]:
+    """
+    Recommends indexes for one statement as (table, key columns, extra covering columns).
+    Only tables the plan scans, or statements that sort through a temporary B-tree, get recommendations.
+    """
+    scans = plan_scans(plan)
+    if not scans:
+        return []
+    sql = strip_sql_comments(statement).rstrip(";")
+    aliases = _table_aliases(sql)
+    scanned = {aliases.get(line.split()[1], line.split()[1]) for line in scans if line.startswith("SCAN ")}
+    sorts = any(line.startswith("USE TEMP B-TREE") for line in scans)
+    recommendations = []
+
+    # Join columns: the searched side of each equality needs an index on its column.
+    for on_clause in re.findall(rf"\bON\b(.*?){CLAUSE_END}", sql, re.IGNORECASE | re.DOTALL):
+        for left, right in re.findall(r"([\w.]+)\s*=\s*([\w.]+)", on_clause):
+            for reference in (left, right):
+                resolved = _resolve_column(connection, reference, aliases)
+                if resolved:
+                    recommendations.append((resolved[0], (resolved[1],), ()))
+
+    # Filter columns compared against a value in WHERE.
+    where_clause = _clause(sql, "WHERE")
+    filtered = []
+    for reference in re.findall(r"([\w.]+)\s*(?:=|<>|!=|>=|<=|>|<|\bBETWEEN\b|\bIN\b)", where_clause, re.IGNORECASE):
+        resolved = _resolve_column(connection, reference, aliases)
+        if resolved:
+            filtered.append(resolved)
+        if resolved and resolved[0] in scanned:
+            recommendations.append((resolved[0], (resolved[1],), ()))
+
+    # GROUP BY and ORDER BY columns on a single table can be read in index order instead of sorted.
+    for keyword in (r"GROUP\s+BY", r"ORDER\s+BY"):
+        columns = _column_list(connection, _clause(sql, keyword), aliases)
+        tables = {table for table, _ in columns}
+        if not columns or len(tables) != 1 or not (sorts or tables & scanned):
+            continue
+        table = tables.pop()
+        key = tuple(column for _, column in columns)
+        covering = ()
+        if keyword.startswith("ORDER") and len(key) > 1:
+            # The ordered walk can test the filters from the index; the other columns are read from the table.
+            covering = tuple(dict.fromkeys(column for filter_table, column in filtered if filter_table == table and column not in key))
+        recommendations.append((table, key, covering))
+    return recommendations
+
+
+def merge_recommendations(connection: sqlite3.Connection, recommendations: list[tuple[str, tuple, tuple]]) -> list[tuple[str, tuple, tuple]]:
+    """
+    Drops duplicates, recommendations already served by an existing index (whose key starts with
+    theirs) or starting with an existing index's key, and recommendations whose key is a prefix of a
+    wider recommended index that also covers them.
+    """
+    unique = []
+    for recommendation in recommendations:
+        if recommendation not in unique:
+            unique.append(recommendation)
+
+    merged = []
+    for table, key, covering in unique:
+        columns = list(key + covering)
+        if any(existing[:len(key)] == list(key) or columns[:len(existing)] == existing
+               for existing in existing_index_keys(connection, table)):
+            continue
+        subsumed = any(
+            other_table == table and (other_key, other_covering) != (key, covering)
+            and other_key[:len(key)] == key and set(covering) <= set(other_key + other_covering)
+            for other_table, other_key, other_covering in unique
+        )
+        if not subsumed:
+            merged.append((table, key, covering))
+    return merged
+
+
+def index_statement(table: str, key: tuple, covering: tuple) -> str:
+    """Return the CREATE INDEX statement for a recommendation."""
+    columns = key + covering
+    suffix = "_covering" if covering else ""
+    return f"CREATE INDEX IF NOT EXISTS idx_{table}_{'_'.join(key)}{suffix} ON {table} ({', '.join(columns)});"
+
+
+def collect_statements(folder: pathlib.Path = SQL_QUERIES_FOLDER) -> list[tuple[str, str]]:
+    """Return (label, statement) for every statement in the folder's SQL files."""
+    statements = []
+    for path in sorted(folder.glob("*.sql")):
+        for statement in get_statements(path):
+            statements.append((f"{statement.name}: {statement_summary(statement)}", statement.sql))
+    return statements
+
+
+def analyze_workload(connection: sqlite3.Connection, statements: list[tuple[str, str]]) -> dict[str, list[str]]:
+    """Return the query plan of every statement, keyed by its label."""
+    plans = {}
+    for label, statement in statements:
+        try:
+            plans[label] = explain_query_plan(connection, statement)
+        except sqlite3.Error as e:
+            logger.error(f"Could not explain {label}: {e}")
+            plans[label] = [f"ERROR: {e}"]
+    return plans
+
+
+def write_index_migration(index_statements: list[str], folder: pathlib.Path = MIGRATIONS_FOLDER) -> pathlib.Path:
+    """Writes the index statements as the next numbered migration and returns its path."""
+    versions = [version for version, _, _ in list_migrations(folder)]
+    path = folder.joinpath(f"{max(versions, default=0) + 1:04d}_add_query_indexes.sql")
+    lines = [
+        "-- Indexes recommended by index_advisor.py for the sql_queries/ workload.",
+        "-- Each one turns a full-table SCAN or a temporary sort B-tree into an index SEARCH or ordered index walk.",
+        *index_statements,
+    ]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return path
+
+
+def print_plans(title: str, plans: dict[str, list[str]], before: dict[str, list[str]] | None = None) -> None:
+    """Prints each statement's plan, marking statements that still scan (and plans that changed)."""
+    print(f"\n===== {title} =====")
+    for label, plan in plans.items():
+        status = "SCAN" if plan_scans(plan) else "INDEXED"
+        changed = " (changed)" if before is not None and before.get(label) != plan else ""
+        print(f"\n[{status}{changed}] {label}")
+        for line in plan:
+            print(f"    {line}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Recommend and create indexes for the sql_queries workload.")
+    parser.add_argument("--db", type=pathlib.Path, default=DB_PATH, help="SQLite database to analyze.")
+    parser.add_argument("--apply", action="store_true",
+                        help="Write the recommended indexes as a migration and apply it.")
+    args = parser.parse_args()
+
+    connection = connect(args.db)
+    logger.info(f"Connected to database: {args.db}")
+    try:
+        apply_migrations(connection)
+        statements = collect_statements()
+        before = analyze_workload(connection, statements)
+        print_plans("Query plans before", before)
+
+        recommendations = []
+        for (label, statement), plan in zip(statements, before.values()):
+            recommendations.extend(recommend_indexes(connection, statement, plan))
+        index_statements = [index_statement(*recommendation) for recommendation in merge_recommendations(connection, recommendations)]
+
+        print("\n===== Recommended indexes =====")
+        for statement in index_statements or ["(none - every filter, join and sort column is already indexed)"]:
+            print(statement)
+
+        if args.apply and index_statements:
+            migration = write_index_migration(index_statements)
+            logger.info(f"Wrote index migration: {migration}")
+            apply_migrations(connection)
+            after = analyze_workload(connection, statements)
+            print_plans("Query plans after", after, before)
+    finally:
+        connection.close()
+        logger.info("Database connection closed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Partitioned Catalog Script
+File: partition_catalog.py
+
+This script builds a catalog whose books are split across several SQLite files, and reports on it.
+
+Features:
+- build: migrates a separate main database, loads the authors into it and the books into
+  partition files next to it, by publication decade or author_id hash, loading the files in parallel.
+- info: lists the partitions with their row counts and year ranges.
+- report: runs the db03_queries.py report queries and charts on the partitioned catalog. The
+  sql_queries/ files read the TEMP books view over the partitions unchanged; the year histogram
+  and average year are fanned out over the partitions and merged.
+
+The single-file database (data/db.sqlite) is not touched.
+
+Examples:
+    python generate_catalog.py --books 1e6
+    python partition_catalog.py build --partitions 4 --by decade --books data/generated/books.csv --authors data/generated/authors.csv
+    python partition_catalog.py info
+    python partition_catalog.py report --batch reports/partitioned
+"""
+
+# Imports from Python Standard Library
+import argparse
+import pathlib
+import sys
+import time
+
+# Imports from local modules
+import db03_queries
+from utils_db import connect
+from utils_logger import logger
+from utils_migrate import apply_migrations
+from utils_partition import DEFAULT_PARTITIONS, PARTITION_SCHEMES, build_partitions, partition_layout
+from utils_profile import StatementProfiler, add_profile_arguments
+
+ROOT_DIR = pathlib.Path(__file__).parent.resolve()
+DATA_FOLDER = ROOT_DIR.joinpath("data")
+PARTITIONED_DB_PATH = DATA_FOLDER.joinpath("partitioned").joinpath("db.sqlite")
+
+
+def build(args: argparse.Namespace) -> None:
+    """Creates the main database and loads the CSV files into it and its partitions."""
+    connection = connect(args.db, partitioned=False)
+    try:
+        apply_migrations(connection)
+        build_partitions(connection, args.authors, args.books, count=args.partitions, scheme=args.by,
+                         workers=args.workers, validate=args.validate)
+    finally:
+        connection.close()
+
+
+def info(args: argparse.Namespace) -> None:
+    """Prints the partitions of the catalog."""
+    connection = connect(args.db, read_only=True, partitioned=False)
+    try:
+        partitions = partition_layout(connection)
+    finally:
+        connection.close()
+    if not partitions:
+        print(f"{args.db} is not partitioned; run: python partition_catalog.py build")
+        return
+    for partition in partitions:
+        print(f"part_{partition.number}: {partition.rows:>12,} books, years {partition.min_year}-{partition.max_year}  {partition.path}")
+    print(f"{sum(partition.rows for partition in partitions):,} books in {len(partitions)} partitions")
+
+
+def report(args: argparse.Namespace) -> None:
+    """Runs the report queries and charts on the partitioned catalog."""
+    profiler = StatementProfiler(slow_ms=args.slow_ms)
+    connection = connect(args.db)
+    try:
+        if not partition_layout(connection):
+            raise ValueError(f"{args.db} is not partitioned; run: python partition_catalog.py build")
+        db03_queries.report_queries(connection, args, profiler)
+    finally:
+        if args.profile_top > 0 and profiler.records:
+            profiler.print_report(args.profile_top)
+        connection.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build and report on a catalog whose books are split across several files.")
+    parser.add_argument("--db", type=pathlib.Path, default=PARTITIONED_DB_PATH,
+                        help=f"Main database of the partitioned catalog (default: {PARTITIONED_DB_PATH}).")
+    subparsers = parser.add_subparsers(dest="command", required=True, metavar="COMMAND")
+
+    build_parser = subparsers.add_parser("build", help="Load the CSV files into a main database and its partitions.")
+    build_parser.add_argument("--authors", type=pathlib.Path, default=DATA_FOLDER.joinpath("authors.csv"),
+                              help="Authors CSV (default: data/authors.csv).")
+    build_parser.add_argument("--books", type=pathlib.Path, default=DATA_FOLDER.joinpath("books.csv"),
+                              help="Books CSV (default: data/books.csv).")
+    build_parser.add_argument("--partitions", type=int, default=DEFAULT_PARTITIONS,
+                              help=f"Number of partition files (default: {DEFAULT_PARTITIONS}).")
+    build_parser.add_argument("--by", choices=PARTITION_SCHEMES, default="decade",
+                              help="Split by publication decade (ranges, prunable by year) or author_id hash.")
+    build_parser.add_argument("--workers", type=int, default=None,
+                              help="Partitions loaded at the same time (default: CPU count).")
+    build_parser.add_argument("--validate", action="store_true",
+                              help="Check the CSV rows first and leave out the rejected ones.")
+    subparsers.add_parser("info", help="List the partitions and their year ranges.")
+    report_parser = subparsers.add_parser("report", help="Run the report queries and charts on the partitions.")
+    db03_queries.add_arguments(report_parser)
+    add_profile_arguments(report_parser)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        {"build": build, "info": info, "report": report}[args.command](args)
+    except Exception as e:
+        logger.error(f"partition_catalog.py {args.command} failed: {e}")
+        sys.exit(1)
+    logger.info(f"partition_catalog.py {args.command} took {time.perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
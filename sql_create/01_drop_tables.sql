@@ -1,5 +1,15 @@
+-- Drop the full-text search indexes over books and authors
+DROP TABLE IF EXISTS books_fts;
+DROP TABLE IF EXISTS authors_fts;
+
+-- Drop the per-author rollups maintained by triggers on books
+DROP TABLE IF EXISTS author_stats;
+
 -- Drop the books table if it exists
 DROP TABLE IF EXISTS books;
 
 -- Drop the authors table if it exists
-DROP TABLE IF EXISTS authors;
\ No newline at end of file
+DROP TABLE IF EXISTS authors;
+
+-- Forget the applied migrations so the next run re-creates the schema from sql_migrations
+DROP TABLE IF EXISTS schema_version;
@@ -1,18 +1,22 @@
+-- Baseline schema.
+-- Replaces any authors/books tables created before schema versioning (for example by
+-- pandas.to_sql, which drops the keys) with the declared, typed and keyed tables.
+-- The CSV data is loaded into these tables after the migrations have run.
+DROP TABLE IF EXISTS books;
+DROP TABLE IF EXISTS authors;
+
 -- Create the authors table
 CREATE TABLE authors (
     author_id TEXT PRIMARY KEY, -- Prefixed sequential ID as the primary key (e.g., AUTHOR_001)
     first TEXT NOT NULL,        -- Author's first name (mandatory field)
-    surname TEXT NOT NULL,      -- Author's last name (mandatory field)
-    birth_year INTEGER,         -- Year of birth (optional)
-    nationality TEXT            -- Nationality of the author (optional)
+    surname TEXT NOT NULL       -- Author's last name (mandatory field)
 );
 
 -- Create the books table
 CREATE TABLE books (
     book_id TEXT PRIMARY KEY,   -- Prefixed sequential ID as the primary key (e.g., BOOK_001)
     title TEXT NOT NULL,        -- Book title (mandatory field)
-    genre TEXT,                 -- Book genre (optional)
-    publication_year INTEGER,   -- Year of publication (optional)
+    year_published INTEGER,     -- Year of publication (optional)
     author_id TEXT,             -- Foreign key linking to authors
     FOREIGN KEY (author_id) REFERENCES authors (author_id) -- Relationship with authors
-);
\ No newline at end of file
+);
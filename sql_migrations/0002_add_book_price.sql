@@ -0,0 +1,3 @@
+-- Add the book_price column used by the pricing data in sql_queries/data_addition.sql.
+-- ADD COLUMN changes the table in place, so the primary key B-tree is kept.
+ALTER TABLE books ADD COLUMN book_price REAL;
@@ -0,0 +1,9 @@
+-- Indexes recommended by index_advisor.py for the sql_queries/ workload.
+-- Each one turns a full-table SCAN or a temporary sort B-tree into an index SEARCH or ordered index walk.
+CREATE INDEX IF NOT EXISTS idx_books_author_id ON books (author_id);
+CREATE INDEX IF NOT EXISTS idx_authors_author_id_first_surname ON authors (author_id, first, surname);
+CREATE INDEX IF NOT EXISTS idx_authors_surname ON authors (surname);
+CREATE INDEX IF NOT EXISTS idx_books_book_price ON books (book_price);
+CREATE INDEX IF NOT EXISTS idx_authors_first_surname ON authors (first, surname);
+CREATE INDEX IF NOT EXISTS idx_books_title ON books (title);
+CREATE INDEX IF NOT EXISTS idx_books_year_published_title_covering ON books (year_published, title, book_id, author_id, book_price);
@@ -0,0 +1,56 @@
+-- Per-author book counts and price totals, kept up to date by triggers on books.
+-- Reports read these rollups instead of joining and grouping all of books on every run.
+-- Authors without books simply have no row (or a row with zero counts), so readers LEFT JOIN authors to author_stats.
+CREATE TABLE author_stats (
+    author_id TEXT PRIMARY KEY,              -- Author the rollup belongs to
+    book_count INTEGER NOT NULL DEFAULT 0,   -- Number of books by the author
+    priced_count INTEGER NOT NULL DEFAULT 0, -- Number of those books with a book_price (the AVG denominator)
+    price_sum REAL NOT NULL DEFAULT 0        -- Sum of book_price over those books
+);
+
+-- Seed the rollups from the books already in the database.
+INSERT INTO author_stats (author_id, book_count, priced_count, price_sum)
+SELECT author_id, COUNT(*), COUNT(book_price), COALESCE(SUM(book_price), 0)
+FROM books
+WHERE author_id IS NOT NULL
+GROUP BY author_id;
+
+-- Add a new book to its author's rollup.
+CREATE TRIGGER author_stats_books_insert AFTER INSERT ON books
+WHEN NEW.author_id IS NOT NULL
+BEGIN
+    INSERT INTO author_stats (author_id, book_count, priced_count, price_sum)
+    VALUES (NEW.author_id, 1, NEW.book_price IS NOT NULL, COALESCE(NEW.book_price, 0))
+    ON CONFLICT (author_id) DO UPDATE SET
+        book_count = book_count + 1,
+        priced_count = priced_count + (NEW.book_price IS NOT NULL),
+        price_sum = price_sum + COALESCE(NEW.book_price, 0);
+END;
+
+-- Remove a deleted book from its author's rollup.
+CREATE TRIGGER author_stats_books_delete AFTER DELETE ON books
+WHEN OLD.author_id IS NOT NULL
+BEGIN
+    UPDATE author_stats SET
+        book_count = book_count - 1,
+        priced_count = priced_count - (OLD.book_price IS NOT NULL),
+        price_sum = price_sum - COALESCE(OLD.book_price, 0)
+    WHERE author_id = OLD.author_id;
+END;
+
+-- Move a book between rollups when its author or price changes (e.g., sql_queries/data_addition.sql).
+CREATE TRIGGER author_stats_books_update AFTER UPDATE OF author_id, book_price ON books
+BEGIN
+    UPDATE author_stats SET
+        book_count = book_count - 1,
+        priced_count = priced_count - (OLD.book_price IS NOT NULL),
+        price_sum = price_sum - COALESCE(OLD.book_price, 0)
+    WHERE author_id = OLD.author_id;
+    INSERT INTO author_stats (author_id, book_count, priced_count, price_sum)
+    SELECT NEW.author_id, 1, NEW.book_price IS NOT NULL, COALESCE(NEW.book_price, 0)
+    WHERE NEW.author_id IS NOT NULL
+    ON CONFLICT (author_id) DO UPDATE SET
+        book_count = book_count + 1,
+        priced_count = priced_count + (NEW.book_price IS NOT NULL),
+        price_sum = price_sum + COALESCE(NEW.book_price, 0);
+END;
@@ -0,0 +1,64 @@
+-- Full-text search over book titles and author names (see utils_search.py).
+-- The FTS5 tables are external-content tables: they store only the search index and read the
+-- text itself from books and authors by rowid, so the titles and names are not stored twice.
+-- prefix='2 3' keeps extra indexes for 2- and 3-character prefixes, so prefix queries such as
+-- "har*" do not have to scan every term that starts with those letters.
+-- unicode61 with remove_diacritics 2 matches "Bronte" to "Brontë".
+CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+    title,
+    content='books',
+    content_rowid='rowid',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS authors_fts USING fts5(
+    first,
+    surname,
+    content='authors',
+    content_rowid='rowid',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'
+);
+
+-- Rank author matches in the surname twice as high as matches in the first name.
+-- Stored as the index's default rank, so "ORDER BY rank" uses the weights without extra arguments.
+INSERT INTO authors_fts (authors_fts, rank) VALUES ('rank', 'bm25(1.0, 2.0)');
+
+-- Index the rows already in the tables.
+INSERT INTO books_fts (books_fts) VALUES ('rebuild');
+INSERT INTO authors_fts (authors_fts) VALUES ('rebuild');
+
+-- Keep the indexes in step with every insert, update and delete.
+-- An external-content index is told to remove a row by passing its old values to the 'delete' command.
+CREATE TRIGGER IF NOT EXISTS books_fts_insert AFTER INSERT ON books
+BEGIN
+    INSERT INTO books_fts (rowid, title) VALUES (NEW.rowid, NEW.title);
+END;
+
+CREATE TRIGGER IF NOT EXISTS books_fts_delete AFTER DELETE ON books
+BEGIN
+    INSERT INTO books_fts (books_fts, rowid, title) VALUES ('delete', OLD.rowid, OLD.title);
+END;
+
+CREATE TRIGGER IF NOT EXISTS books_fts_update AFTER UPDATE OF title ON books
+BEGIN
+    INSERT INTO books_fts (books_fts, rowid, title) VALUES ('delete', OLD.rowid, OLD.title);
+    INSERT INTO books_fts (rowid, title) VALUES (NEW.rowid, NEW.title);
+END;
+
+CREATE TRIGGER IF NOT EXISTS authors_fts_insert AFTER INSERT ON authors
+BEGIN
+    INSERT INTO authors_fts (rowid, first, surname) VALUES (NEW.rowid, NEW.first, NEW.surname);
+END;
+
+CREATE TRIGGER IF NOT EXISTS authors_fts_delete AFTER DELETE ON authors
+BEGIN
+    INSERT INTO authors_fts (authors_fts, rowid, first, surname) VALUES ('delete', OLD.rowid, OLD.first, OLD.surname);
+END;
+
+CREATE TRIGGER IF NOT EXISTS authors_fts_update AFTER UPDATE OF first, surname ON authors
+BEGIN
+    INSERT INTO authors_fts (authors_fts, rowid, first, surname) VALUES ('delete', OLD.rowid, OLD.first, OLD.surname);
+    INSERT INTO authors_fts (rowid, first, surname) VALUES (NEW.rowid, NEW.first, NEW.surname);
+END;
@@ -0,0 +1,4 @@
+-- idx_authors_author_id_first_surname (0003) repeats the authors primary key index on author_id.
+-- No sql_queries/ plan reads it as a covering index (the joins look authors up by rowid or by
+-- the primary key), so it only added write cost to every author insert and update.
+DROP INDEX IF EXISTS idx_authors_author_id_first_surname;
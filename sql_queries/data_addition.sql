@@ -1,8 +1,6 @@
--- Insert records into the books table to give more data to work with to make the outputs more interesting
--- Alter the books table to add a new column for book price.
-ALTER TABLE books ADD COLUMN book_price REAL;
-
--- Update the new column using a CASE statement.
+-- Add pricing data to the books table to make the outputs more interesting.
+-- The book_price column itself is added by sql_migrations/0002_add_book_price.sql.
+-- Update the column using a CASE statement.
 UPDATE books
 SET book_price = 
     CASE book_id
@@ -19,14 +19,15 @@ SELECT AVG(book_price) AS average_book_price
 FROM books;
 
 -- Sum the total price of books per author for authors who have more than one book.
+-- Reads the per-author rollups that triggers keep up to date in author_stats.
 SELECT 
     a.author_id,
     a.first,
     a.surname,
-    COUNT(b.book_id) AS book_count,
-    SUM(b.book_price) AS total_price,
-    AVG(b.book_price) AS average_price
+    s.book_count AS book_count,
+    CASE WHEN s.priced_count > 0 THEN s.price_sum END AS total_price,
+    s.price_sum / NULLIF(s.priced_count, 0) AS average_price
 FROM authors a
-JOIN books b ON a.author_id = b.author_id
-GROUP BY a.author_id, a.first, a.surname
-HAVING COUNT(b.book_id) > 1;
+JOIN author_stats s ON a.author_id = s.author_id
+WHERE s.book_count > 1
+ORDER BY a.author_id;
@@ -1,38 +1,40 @@
 -- Group books by author.
 -- For each author, count the number of books, and compute the average and total book price.
+-- Reads the per-author rollups that triggers keep up to date in author_stats.
 SELECT 
     a.author_id, 
     a.first, 
     a.surname,
-    COUNT(b.book_id) AS total_books,
-    AVG(b.book_price) AS avg_book_price,
-    SUM(b.book_price) AS total_book_price
+    COALESCE(s.book_count, 0) AS total_books,
+    s.price_sum / NULLIF(s.priced_count, 0) AS avg_book_price,
+    CASE WHEN s.priced_count > 0 THEN s.price_sum END AS total_book_price
 FROM authors a
-LEFT JOIN books b ON a.author_id = b.author_id
-GROUP BY a.author_id, a.first, a.surname;
+LEFT JOIN author_stats s ON a.author_id = s.author_id
+ORDER BY a.author_id;
 
 -- Group books by author.
 -- For each author, count the number of books, and compute the average and total book price.
+-- Reads the per-author rollups that triggers keep up to date in author_stats.
 SELECT 
     a.author_id, 
     a.first, 
     a.surname,
-    COUNT(b.book_id) AS total_books,
-    AVG(b.book_price) AS avg_book_price,
-    SUM(b.book_price) AS total_book_price
+    COALESCE(s.book_count, 0) AS total_books,
+    s.price_sum / NULLIF(s.priced_count, 0) AS avg_book_price,
+    CASE WHEN s.priced_count > 0 THEN s.price_sum END AS total_book_price
 FROM authors a
-LEFT JOIN books b ON a.author_id = b.author_id
-GROUP BY a.author_id, a.first, a.surname;
+LEFT JOIN author_stats s ON a.author_id = s.author_id
+ORDER BY a.author_id;
 
 -- Group books by publication year.
 -- This query counts the number of books published in each year and aggregates their pricing information.
 SELECT 
-    publication_year,
+    year_published,
     COUNT(*) AS total_books,
     AVG(book_price) AS avg_book_price,
     SUM(book_price) AS total_book_price
 FROM books
-GROUP BY publication_year;
+GROUP BY year_published;
 
 -- Group authors by the first letter of their surname. This query shows how many authors have surnames starting with the same letter.
 SELECT 
@@ -42,11 +44,12 @@ FROM authors
 GROUP BY surname_initial;
 
 -- additional functionality needed
+-- Total books per author name, read from the author_stats rollups.
 SELECT 
     a.first, 
     a.surname,
-    COUNT(b.book_id) AS total_books
+    COALESCE(SUM(s.book_count), 0) AS total_books
 FROM authors a
-LEFT JOIN books b ON a.author_id = b.author_id
+LEFT JOIN author_stats s ON a.author_id = s.author_id
 GROUP BY a.first, a.surname
 ORDER BY a.surname;
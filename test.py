@@ -1,8 +1,8 @@
-import sqlite3
 import pathlib
+from utils_db import connect
 
 DB_PATH = pathlib.Path("data/db.sqlite")
-conn = sqlite3.connect(DB_PATH)
+conn = connect(DB_PATH, read_only=True)
 print("Authors:")
 for row in conn.execute("SELECT * FROM authors;").fetchall():
     print(row)
@@ -16,7 +16,7 @@ print("*******************************************************")
 print()
 
 DB_PATH = pathlib.Path("project.db")
-conn = sqlite3.connect(DB_PATH)
+conn = connect(DB_PATH, read_only=True)
 print("Authors:")
 for row in conn.execute("SELECT * FROM authors;").fetchall():
     print(row)
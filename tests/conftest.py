@@ -0,0 +1,53 @@
+"""
+Shared pytest fixtures
+File: tests/conftest.py
+
+Features:
+- Puts the project folder on sys.path, so the tests import the flat modules as the scripts do.
+- Runs every test in its own temporary folder, so logs/ and any databases are written there.
+- Generates a small, seeded catalog and a migrated database for the tests to load it into.
+
+Run the tests from the project folder with: python -m pytest -q
+"""
+
+# Imports from Python Standard Library
+import pathlib
+import sqlite3
+import sys
+
+# Imports from external packages
+import pytest
+
+PROJECT_FOLDER: pathlib.Path = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_FOLDER))
+
+# Imports from local modules
+from generate_catalog import generate_catalog
+from utils_db import connect
+from utils_migrate import apply_migrations
+
+# Size of the generated catalog: big enough to fill several partitions and decades, small enough to load in a blink
+BOOK_COUNT: int = 2_000
+AUTHOR_COUNT: int = 150
+
+
+@pytest.fixture(autouse=True)
+def work_folder(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> pathlib.Path:
+    """Runs the test in tmp_path (the logger writes logs/ relative to the working folder)."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def catalog(tmp_path: pathlib.Path) -> tuple[pathlib.Path, pathlib.Path]:
+    """Return the (authors.csv, books.csv) paths of a generated catalog."""
+    return generate_catalog(tmp_path.joinpath("csv"), BOOK_COUNT, AUTHOR_COUNT, seed=7)
+
+
+@pytest.fixture
+def connection(tmp_path: pathlib.Path) -> sqlite3.Connection:
+    """Yields a connection to an empty, migrated database."""
+    connection = connect(tmp_path.joinpath("db.sqlite"))
+    apply_migrations(connection)
+    yield connection
+    connection.close()
@@ -0,0 +1,71 @@
+"""
+Tests for the author_stats rollups: after every bulk path they equal a GROUP BY over books.
+"""
+
+# Imports from Python Standard Library
+import csv
+
+# Imports from local modules
+from generate_catalog import generate_catalog, iter_price_refresh, write_csv
+from utils_bulk import bulk_delete, bulk_update
+from utils_loader import load_csv_files
+from utils_sync import sync_csv_files
+
+from conftest import AUTHOR_COUNT, BOOK_COUNT
+
+
+def assert_author_stats_match(connection) -> None:
+    """Asserts the rollups equal the GROUP BY they stand in for (authors without books have no row or a zero row)."""
+    rollups = connection.execute(
+        "SELECT author_id, book_count, priced_count, round(price_sum, 6) FROM author_stats "
+        "WHERE book_count > 0 ORDER BY author_id"
+    ).fetchall()
+    grouped = connection.execute(
+        "SELECT author_id, COUNT(*), COUNT(book_price), round(COALESCE(SUM(book_price), 0), 6) FROM books "
+        "WHERE author_id IS NOT NULL GROUP BY author_id ORDER BY author_id"
+    ).fetchall()
+    assert rollups == grouped
+    assert rollups
+
+
+def test_author_stats_after_load_bulk_and_sync(connection, catalog, tmp_path):
+    authors_csv, books_csv = catalog
+
+    load_csv_files(connection, [("authors", authors_csv), ("books", books_csv)])
+    assert_author_stats_match(connection)
+
+    # Loading again replaces every row rather than adding to the rollups.
+    load_csv_files(connection, [("authors", authors_csv), ("books", books_csv)])
+    assert_author_stats_match(connection)
+
+    prices_csv = tmp_path.joinpath("prices.csv")
+    write_csv(prices_csv, ["book_id", "book_price"], iter_price_refresh(BOOK_COUNT, seed=8))
+    assert bulk_update(connection, prices_csv).affected > 0
+    assert_author_stats_match(connection)
+
+    retired_csv = tmp_path.joinpath("retired.csv")
+    write_csv(retired_csv, ["book_id"], iter([("BOOK_0001",), ("BOOK_0500",), ("BOOK_1999",)]))
+    assert bulk_delete(connection, retired_csv).affected == 3
+    assert_author_stats_match(connection)
+
+    # A different catalog moves books between authors, re-prices them and drops some.
+    changed_authors, changed_books = generate_catalog(tmp_path.joinpath("changed"), BOOK_COUNT - 100, AUTHOR_COUNT, seed=9)
+    upserted, deleted = sync_csv_files(
+        connection, [("authors", changed_authors, "author_id"), ("books", changed_books, "book_id")]
+    )["books"]
+    assert upserted > 0 and deleted > 0
+    assert_author_stats_match(connection)
+
+
+def test_author_stats_follow_single_row_changes(connection, catalog):
+    load_csv_files(connection, [("authors", catalog[0]), ("books", catalog[1])])
+    with open(catalog[0], newline="", encoding="utf-8") as file:
+        other_author = list(csv.reader(file))[-1][0]
+
+    with connection:
+        connection.execute("UPDATE books SET author_id = ?, book_price = NULL WHERE book_id = 'BOOK_0010'", (other_author,))
+        connection.execute("DELETE FROM books WHERE book_id = 'BOOK_0020'")
+        connection.execute("INSERT INTO books (book_id, title, year_published, author_id, book_price) "
+                           "VALUES ('BOOK_NEW', 'New', 2020, ?, 7.25)", (other_author,))
+
+    assert_author_stats_match(connection)
@@ -0,0 +1,74 @@
+"""
+Tests for utils_bulk.py: staging stops at a ragged row and changes nothing.
+"""
+
+# Imports from Python Standard Library
+import pathlib
+
+# Imports from external packages
+import pytest
+
+# Imports from local modules
+from generate_catalog import write_csv
+from utils_bulk import BULK_STAGE_TABLE, bulk_delete, bulk_update
+from utils_loader import load_csv_files
+
+
+@pytest.fixture
+def loaded(connection, catalog):
+    """A database loaded from the generated catalog."""
+    load_csv_files(connection, [("authors", catalog[0]), ("books", catalog[1])])
+    return connection
+
+
+def books(connection) -> list[tuple]:
+    """Return every book, in key order."""
+    return connection.execute("SELECT * FROM books ORDER BY book_id").fetchall()
+
+
+def write_rows(path: pathlib.Path, header: list[str], rows: list[tuple]) -> pathlib.Path:
+    """Writes rows to a CSV file and returns its path."""
+    write_csv(path, header, iter(rows))
+    return path
+
+
+def test_bulk_update_sets_only_changed_rows(loaded, tmp_path):
+    price = loaded.execute("SELECT book_price FROM books WHERE book_id = 'BOOK_0002'").fetchone()[0]
+    csv_path = write_rows(tmp_path.joinpath("prices.csv"), ["book_id", "book_price"],
+                          [("BOOK_0001", 123.45), ("BOOK_0002", price), ("BOOK_MISSING", 1.0)])
+
+    result = bulk_update(loaded, csv_path)
+
+    assert (result.staged, result.affected, result.unmatched) == (3, 1, 1)
+    assert loaded.execute("SELECT book_price FROM books WHERE book_id = 'BOOK_0001'").fetchone() == (123.45,)
+
+
+@pytest.mark.parametrize("ragged_row", [
+    ("BOOK_0003",),                    # too few fields
+    ("BOOK_0003", 5.0, "extra"),       # too many fields
+], ids=["short-row", "long-row"])
+@pytest.mark.parametrize("operation", [bulk_update, bulk_delete], ids=["update", "delete"])
+def test_ragged_row_stops_staging_and_changes_nothing(loaded, tmp_path, operation, ragged_row):
+    before = books(loaded)
+    rows = [("BOOK_0001", 1.0), ("BOOK_0002", 2.0), ragged_row, ("BOOK_0004", 4.0)]
+    csv_path = write_rows(tmp_path.joinpath("ragged.csv"), ["book_id", "book_price"], rows)
+
+    with pytest.raises(ValueError, match="Record 3 after the header"):
+        operation(loaded, csv_path, chunk_size=2)
+
+    # The rows before the ragged one were staged but never applied.
+    assert books(loaded) == before
+    assert not loaded.in_transaction
+    assert not loaded.execute("SELECT 1 FROM temp.sqlite_master WHERE name = ?", (BULK_STAGE_TABLE,)).fetchone()
+
+
+def test_bulk_delete_of_an_author_with_books_changes_nothing(loaded, tmp_path):
+    before = books(loaded)
+    author = loaded.execute("SELECT author_id FROM books LIMIT 1").fetchone()[0]
+    csv_path = write_rows(tmp_path.joinpath("retired.csv"), ["author_id"], [(author,)])
+
+    with pytest.raises(ValueError, match="reference missing rows"):
+        bulk_delete(loaded, csv_path)
+
+    assert books(loaded) == before
+    assert loaded.execute("SELECT 1 FROM authors WHERE author_id = ?", (author,)).fetchone()
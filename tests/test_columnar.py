@@ -0,0 +1,66 @@
+"""
+Tests for utils_columnar.py: an export brought up to date by appending matches a full export.
+"""
+
+# Imports from local modules
+from utils_columnar import export_columns, open_columns
+from utils_loader import load_csv_files
+
+
+def decoded(table) -> dict:
+    """Return every column of an exported table decoded to Python values (None for NULL), with its dtype."""
+    columns = {}
+    for spec in table.manifest["columns"]:
+        name = spec["name"]
+        if spec["kind"] == "number":
+            numbers = table.numbers(name)
+            values = [None if null else value for value, null in zip(numbers.tolist(), table.nulls(name).tolist())]
+            columns[name] = (str(numbers.dtype), values)
+        elif spec["kind"] == "text":
+            columns[name] = ("text", table.text(name))
+        else:
+            columns[name] = ("dictionary", table.values(name).tolist())
+    return columns
+
+
+def test_appended_export_matches_full_export(connection, catalog, tmp_path):
+    load_csv_files(connection, [("authors", catalog[0]), ("books", catalog[1])])
+    appended_folder = tmp_path.joinpath("appended")
+    results = export_columns(connection, appended_folder)
+    assert {result.mode for result in results.values()} == {"full"}
+
+    # New rows bring new dictionary values (names, author_ids) and NULLs in every nullable column.
+    with connection:
+        connection.executemany("INSERT INTO authors (author_id, first, surname) VALUES (?, ?, ?)",
+                               [("AUTHOR_NEW", "Zelda", "Zywiec"), ("AUTHOR_NEW2", "Aaron", "Aardvark")])
+        connection.executemany(
+            "INSERT INTO books (book_id, title, year_published, author_id, book_price) VALUES (?, ?, ?, ?, ?)",
+            [("BOOK_NEW", "A New Title", 2021, "AUTHOR_NEW", 12.5),
+             ("BOOK_NEW2", "", None, "AUTHOR_NEW2", None),
+             ("BOOK_NEW3", "Third", 1999, None, 3.0)],
+        )
+    results = export_columns(connection, appended_folder)
+    assert {table: (result.mode, result.added) for table, result in results.items()} == {
+        "authors": ("appended", 2), "books": ("appended", 3)}
+
+    full_folder = tmp_path.joinpath("full")
+    export_columns(connection, full_folder, full=True)
+
+    appended, full = open_columns(appended_folder), open_columns(full_folder)
+    for table in ("authors", "books"):
+        assert appended[table].rows == full[table].rows
+        assert decoded(appended[table]) == decoded(full[table])
+
+    # And both match the table itself.
+    titles = [row[0] for row in connection.execute("SELECT title FROM books ORDER BY rowid")]
+    assert decoded(appended["books"])["title"] == ("text", titles)
+
+
+def test_unchanged_tables_are_not_exported_again(connection, catalog, tmp_path):
+    load_csv_files(connection, [("authors", catalog[0]), ("books", catalog[1])])
+    folder = tmp_path.joinpath("columns")
+    export_columns(connection, folder)
+
+    results = export_columns(connection, folder)
+
+    assert {(result.mode, result.added) for result in results.values()} == {("unchanged", 0)}
@@ -0,0 +1,72 @@
+"""
+Tests for utils_partition.py: aggregates fanned out over the partitions match the same query on one file.
+"""
+
+# Imports from external packages
+import pytest
+
+# Imports from local modules
+from utils_db import connect
+from utils_loader import load_csv_files
+from utils_migrate import apply_migrations
+from utils_partition import build_partitions, fan_out_aggregate
+
+# Per-decade aggregates that can be merged across partitions
+DECADE_SQL: str = (
+    "SELECT year_published / 10 * 10 AS decade, COUNT(*) AS books, COUNT(book_price) AS priced, "
+    "SUM(book_price) AS price_sum, MIN(book_price) AS low, MAX(book_price) AS high FROM books {where}"
+    "GROUP BY decade"
+)
+DECADE_MERGE: dict = {"books": "sum", "priced": "sum", "price_sum": "sum", "low": "min", "high": "max"}
+
+
+@pytest.fixture
+def single_file(connection, catalog):
+    """The generated catalog loaded into one database file."""
+    load_csv_files(connection, [("authors", catalog[0]), ("books", catalog[1])])
+    return connection
+
+
+@pytest.fixture(params=["decade", "author"])
+def partitioned(request, catalog, tmp_path):
+    """Yields a connection to the generated catalog split into 3 partition files by each scheme."""
+    db_path = tmp_path.joinpath("partitioned.sqlite")
+    connection = connect(db_path, partitioned=False)
+    try:
+        apply_migrations(connection)
+        build_partitions(connection, catalog[0], catalog[1], count=3, scheme=request.param, workers=2)
+    finally:
+        connection.close()
+    connection = connect(db_path)
+    yield connection
+    connection.close()
+
+
+def rounded(rows: list[tuple]) -> list[tuple]:
+    """Rounds floats, since sums merged from partitions are added in another order."""
+    return [tuple(round(value, 6) if isinstance(value, float) else value for value in row) for row in rows]
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_fan_out_matches_single_file(single_file, partitioned, workers):
+    expected = single_file.execute(DECADE_SQL.format(where="") + " ORDER BY decade").fetchall()
+
+    columns, rows = fan_out_aggregate(partitioned, DECADE_SQL.format(where=""), DECADE_MERGE, workers=workers)
+
+    assert columns == ["decade", "books", "priced", "price_sum", "low", "high"]
+    assert rounded(rows) == rounded(expected)
+
+
+def test_pruned_fan_out_matches_single_file(single_file, partitioned):
+    where = "WHERE year_published BETWEEN ? AND ? "
+    expected = single_file.execute(DECADE_SQL.format(where=where) + " ORDER BY decade", (1990, 2009)).fetchall()
+
+    _, rows = fan_out_aggregate(partitioned, DECADE_SQL.format(where=where), DECADE_MERGE,
+                                params=(1990, 2009), year_range=(1990, 2009))
+
+    assert rows and rounded(rows) == rounded(expected)
+
+
+def test_partitioned_view_and_rollups_match_single_file(single_file, partitioned):
+    for sql in ("SELECT * FROM books ORDER BY book_id", "SELECT * FROM author_stats WHERE book_count > 0 ORDER BY author_id"):
+        assert rounded(partitioned.execute(sql).fetchall()) == rounded(single_file.execute(sql).fetchall())
@@ -0,0 +1,105 @@
+"""
+Tests for utils_sync.py: every table of a sync is applied in one transaction.
+"""
+
+# Imports from Python Standard Library
+import csv
+import pathlib
+
+# Imports from external packages
+import pytest
+
+# Imports from local modules
+from generate_catalog import write_csv
+from utils_db import connect
+from utils_loader import load_csv_files
+from utils_migrate import apply_migrations
+from utils_sync import SYNC_STATE_TABLE, sync_csv_files
+
+
+def read_rows(csv_path: pathlib.Path) -> tuple[list[str], list[list[str]]]:
+    """Return the header and rows of a CSV file."""
+    with open(csv_path, newline="", encoding="utf-8") as file:
+        header, *rows = csv.reader(file)
+    return header, rows
+
+
+def snapshot(connection) -> tuple:
+    """Return every row of authors, books and the sync state, in key order (the state is empty after a load)."""
+    return tuple(
+        connection.execute(f"SELECT * FROM {table} ORDER BY 1").fetchall()
+        for table in ("authors", "books", SYNC_STATE_TABLE)
+        if table != SYNC_STATE_TABLE or connection.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (table,)).fetchone()
+    )
+
+
+@pytest.fixture
+def synced(connection, catalog):
+    """A database synced once from the generated catalog."""
+    authors_csv, books_csv = catalog
+    sync_csv_files(connection, [("authors", authors_csv, "author_id"), ("books", books_csv, "book_id")])
+    return connection
+
+
+def changed_catalog(catalog, folder: pathlib.Path, book_row: list[str]) -> tuple[pathlib.Path, pathlib.Path]:
+    """Writes a copy of the catalog with one author renamed, one author added and book_row appended to the books."""
+    folder.mkdir()
+    header, authors = read_rows(catalog[0])
+    authors[0][2] = "Renamed"
+    authors.append(["AUTHOR_NEW", "New", "Author"])
+    authors_csv = folder.joinpath("authors.csv")
+    write_csv(authors_csv, header, iter(authors))
+    header, books = read_rows(catalog[1])
+    books_csv = folder.joinpath("books.csv")
+    write_csv(books_csv, header, iter(books + [book_row]))
+    return authors_csv, books_csv
+
+
+def test_sync_applies_changes_to_every_table(synced, catalog, tmp_path):
+    authors_csv, books_csv = changed_catalog(catalog, tmp_path.joinpath("changed"), ["BOOK_NEW", "New Book", "2020", "AUTHOR_NEW", "9.5"])
+
+    results = sync_csv_files(synced, [("authors", authors_csv, "author_id"), ("books", books_csv, "book_id")])
+
+    assert results == {"authors": (2, 0), "books": (1, 0)}
+    assert synced.execute("SELECT author_id FROM books WHERE book_id = 'BOOK_NEW'").fetchone() == ("AUTHOR_NEW",)
+
+
+@pytest.mark.parametrize("book_row", [
+    ["BOOK_NEW", "Orphan", "2020", "AUTHOR_MISSING", "9.5"],  # a dangling foreign key, found before the commit
+    ["BOOK_NEW", "Ragged", "2020"],                             # a row with too few fields, found while staging
+], ids=["dangling-author", "ragged-row"])
+def test_sync_failure_rolls_back_every_table(synced, catalog, tmp_path, book_row):
+    before = snapshot(synced)
+    foreign_keys = synced.execute("PRAGMA foreign_keys").fetchone()[0]
+    authors_csv, books_csv = changed_catalog(catalog, tmp_path.joinpath("changed"), book_row)
+
+    with pytest.raises(ValueError):
+        sync_csv_files(synced, [("authors", authors_csv, "author_id"), ("books", books_csv, "book_id")])
+
+    # The authors were synced before the books failed, and are unchanged too.
+    assert snapshot(synced) == before
+    assert synced.execute("PRAGMA foreign_keys").fetchone()[0] == foreign_keys
+    assert not synced.in_transaction
+
+
+def test_sync_of_unchanged_files_changes_nothing(synced, catalog):
+    authors_csv, books_csv = catalog
+    before = snapshot(synced)
+
+    results = sync_csv_files(synced, [("authors", authors_csv, "author_id"), ("books", books_csv, "book_id")])
+
+    assert results == {"authors": (0, 0), "books": (0, 0)}
+    assert snapshot(synced) == before
+
+
+def test_sync_matches_a_full_load(synced, catalog, tmp_path):
+    authors_csv, books_csv = changed_catalog(catalog, tmp_path.joinpath("changed"), ["BOOK_NEW", "New Book", "2020", "AUTHOR_NEW", ""])
+    sync_csv_files(synced, [("authors", authors_csv, "author_id"), ("books", books_csv, "book_id")])
+
+    loaded = connect(tmp_path.joinpath("loaded.sqlite"))
+    try:
+        apply_migrations(loaded)
+        load_csv_files(loaded, [("authors", authors_csv), ("books", books_csv)])
+        assert snapshot(loaded)[:2] == snapshot(synced)[:2]
+    finally:
+        loaded.close()
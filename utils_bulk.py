@@ -0,0 +1,174 @@
+"""
+Bulk Mutation Script
+File: utils_bulk.py
+
+This script applies updates and deletes listed in CSV files to a table as set-based SQL statements.
+
+Features:
+- Streams the CSV into a TEMP staging table with executemany, in bounded chunks, so a file of
+  millions of rows needs no more memory than a file of ten.
+- Applies it with one UPDATE ... FROM (or DELETE ... WHERE key IN (SELECT ...)) statement instead of
+  one statement per row, in the same transaction as the staging, so a failure changes nothing.
+- Only rewrites rows whose values actually differ, so unchanged rows cost no writes or trigger work.
+- Picks the target table from the CSV's key column (book_id -> books, author_id -> authors).
+- Stops at a row whose field count differs from the header, and runs one PRAGMA foreign_key_check
+  before committing, so deleting an author who still has books (or pointing a book at a missing
+  author) changes nothing.
+- Logs rows staged, rows changed, keys not found and throughput.
+
+CSV layout: the first column is the key; for updates every other column is a column to set.
+An empty field sets the column to NULL.
+"""
+
+# Imports from Python Standard Library
+import contextlib
+import pathlib
+import sqlite3
+import time
+from collections import namedtuple
+
+# Imports from local modules
+from utils_author_stats import suspended_author_stats
+from utils_logger import logger
+from utils_loader import DEFAULT_CHUNK_SIZE, check_field_counts, check_foreign_keys, iter_csv_chunks, read_csv_header
+from utils_profile import StatementProfiler, profile_scope
+
+BULK_STAGE_TABLE: str = "_bulk_stage"
+
+# Key column -> table whose rows it identifies
+KEY_TABLES: dict = {"book_id": "books", "author_id": "authors"}
+
+# The outcome of one bulk update or delete: rows read from the CSV (after removing repeated keys),
+# rows changed in the table, keys that matched no row, and seconds for staging plus applying.
+BulkResult = namedtuple("BulkResult", ["operation", "table", "staged", "affected", "unmatched", "seconds"])
+
+
+def target_table(header: list[str]) -> tuple[str, str]:
+    """Return (table, key column) for a bulk CSV, chosen by its first column."""
+    key = header[0] if header else None
+    if key not in KEY_TABLES:
+        raise ValueError(f"The first CSV column must be one of {sorted(KEY_TABLES)}, got {key!r}")
+    return KEY_TABLES[key], key
+
+
+def _declared_types(connection: sqlite3.Connection, table: str) -> dict[str, str]:
+    """Return the declared type of every column of a table."""
+    return {row[1]: row[2] for row in connection.execute(f'PRAGMA main.table_info("{table}")')}
+
+
+def _stage_csv(connection: sqlite3.Connection, csv_path: pathlib.Path, table: str, columns: list[str],
+               key: str, chunk_size: int, field_count: int) -> int:
+    """
+    Streams the leading columns of a CSV into temp._bulk_stage, keyed on the key column so later
+    rows for the same key replace earlier ones. The staging columns copy the target's declared
+    types, so values are converted to INTEGER/REAL the way the target would store them.
+    Every row must have field_count fields (the header's). Returns the number of rows staged.
+    """
+    types = _declared_types(connection, table)
+    missing = [column for column in columns if column not in types]
+    if missing:
+        raise ValueError(f"Columns {missing} from {csv_path} are not in table {table}")
+
+    columns_sql = ", ".join(f'"{column}"' for column in columns)
+    definitions = ", ".join(f'"{column}" {types[column]}' for column in columns)
+    connection.execute(f"DROP TABLE IF EXISTS temp.{BULK_STAGE_TABLE}")
+    connection.execute(f'CREATE TEMP TABLE {BULK_STAGE_TABLE} ({definitions}, PRIMARY KEY ("{key}"))')
+    placeholders = ", ".join("?" for _ in columns)
+    insert_sql = f"INSERT OR REPLACE INTO temp.{BULK_STAGE_TABLE} ({columns_sql}) VALUES ({placeholders})"
+    width = len(columns)
+    for chunk in check_field_counts(iter_csv_chunks(csv_path, chunk_size), field_count, csv_path):
+        connection.executemany(insert_sql, [row[:width] for row in chunk] if field_count > width else chunk)
+    return connection.execute(f"SELECT count(*) FROM temp.{BULK_STAGE_TABLE}").fetchone()[0]
+
+
+def _count_unmatched(connection: sqlite3.Connection, table: str, key: str) -> int:
+    """Return the number of staged keys with no row in the table."""
+    return connection.execute(
+        f'SELECT count(*) FROM temp.{BULK_STAGE_TABLE} AS s '
+        f'WHERE NOT EXISTS (SELECT 1 FROM main."{table}" AS t WHERE t."{key}" = s."{key}")'
+    ).fetchone()[0]
+
+
+def _apply(connection: sqlite3.Connection, operation: str, csv_path: pathlib.Path, chunk_size: int,
+           profiler: StatementProfiler | None, apply_staged, key_only: bool = False) -> BulkResult:
+    """
+    Stages a CSV (only its key column if key_only) and runs apply_staged(table, key, columns)
+    in one transaction, then logs the result. The transaction is rolled back if any row is left
+    referencing a missing one.
+    """
+    header = read_csv_header(csv_path)
+    table, key = target_table(header)
+    if len(set(header)) != len(header):
+        raise ValueError(f"Repeated column names in the header of {csv_path}")
+
+    columns = [key] if key_only else header
+
+    start = time.perf_counter()
+    connection.commit()
+    try:
+        with profile_scope(profiler, connection, f"bulk_{operation}:{csv_path.name}"):
+            connection.execute("BEGIN")
+            staged = _stage_csv(connection, csv_path, table, columns, key, chunk_size, len(header))
+            unmatched = _count_unmatched(connection, table, key)
+            # The author rollups are recomputed once rather than by a trigger call per changed book.
+            with suspended_author_stats(connection) if table == "books" else contextlib.nullcontext():
+                affected = apply_staged(table, key, columns)
+            connection.execute(f"DROP TABLE temp.{BULK_STAGE_TABLE}")
+            check_foreign_keys(connection)
+            connection.commit()
+    except Exception as e:
+        connection.rollback()
+        logger.error(f"Error applying bulk {operation} from {csv_path} to {table}: {e}")
+        raise
+    seconds = time.perf_counter() - start
+    result = BulkResult(operation, table, staged, affected, unmatched, seconds)
+    logger.bind(**result._asdict()).info(f"Bulk {operation} of {table} from {csv_path}: {staged} rows staged, {affected} rows changed, "
+                f"{unmatched} keys not found, in {seconds:.3f}s ({staged / seconds if seconds > 0 else 0:,.0f} rows/s)")
+    return result
+
+
+def bulk_update(connection: sqlite3.Connection, csv_path: pathlib.Path, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                profiler: StatementProfiler | None = None) -> BulkResult:
+    """
+    Sets the columns listed in a CSV on the rows whose key it lists, with one UPDATE ... FROM.
+
+    Args:
+        connection (sqlite3.Connection): Read-write SQLite connection.
+        csv_path (pathlib.Path): CSV with the key column first, then the columns to set (e.g. book_id,book_price).
+        chunk_size (int): Number of CSV rows staged per executemany call.
+        profiler (StatementProfiler): Optional profiler recording the statements.
+    """
+    def apply_staged(table: str, key: str, columns: list[str]) -> int:
+        values = [column for column in columns if column != key]
+        if not values:
+            raise ValueError(f"{csv_path} has no columns to update besides {key}")
+        set_sql = ", ".join(f'"{column}" = s."{column}"' for column in values)
+        changed_sql = " OR ".join(f'main."{table}"."{column}" IS NOT s."{column}"' for column in values)
+        cursor = connection.execute(
+            f'UPDATE main."{table}" SET {set_sql} FROM temp.{BULK_STAGE_TABLE} AS s '
+            f'WHERE main."{table}"."{key}" = s."{key}" AND ({changed_sql})'
+        )
+        return cursor.rowcount
+
+    return _apply(connection, "update", csv_path, chunk_size, profiler, apply_staged)
+
+
+def bulk_delete(connection: sqlite3.Connection, csv_path: pathlib.Path, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                profiler: StatementProfiler | None = None) -> BulkResult:
+    """
+    Deletes the rows whose key is listed in the first column of a CSV, with one DELETE ... IN (SELECT ...).
+    Any other columns in the file are ignored.
+
+    Args:
+        connection (sqlite3.Connection): Read-write SQLite connection.
+        csv_path (pathlib.Path): CSV whose first column is book_id or author_id.
+        chunk_size (int): Number of CSV rows staged per executemany call.
+        profiler (StatementProfiler): Optional profiler recording the statements.
+    """
+    def apply_staged(table: str, key: str, columns: list[str]) -> int:
+        cursor = connection.execute(
+            f'DELETE FROM main."{table}" WHERE "{key}" IN (SELECT "{key}" FROM temp.{BULK_STAGE_TABLE})'
+        )
+        return cursor.rowcount
+
+    return _apply(connection, "delete", csv_path, chunk_size, profiler, apply_staged, key_only=True)
@@ -0,0 +1,539 @@
+"""
+Columnar Export Script
+File: utils_columnar.py
+
+This script exports the catalog tables to memory-mapped NumPy column files, so repeated analytics
+read arrays instead of querying SQLite every time.
+
+Features:
+- Writes every column of books and authors to its own .npy file: numbers in the compact dtypes of
+  utils_dtypes.py (year_published as int16), repeated text (author_id, first, surname) dictionary-encoded
+  as int32 codes plus its distinct values, and unique text (book_id, title) as one UTF-8 buffer with offsets.
+  NULLs are kept in a separate mask file (code -1 in dictionary-encoded columns).
+- Opens the files with np.load(mmap_mode="r"), so a computation only pages in the columns it reads
+  and several processes share one copy in the page cache.
+- Refreshes incrementally: a table that has not changed since the last export is skipped, rows that
+  were only appended are added to the existing files, and only a table with updated or deleted rows
+  is exported again. Changes are noticed by triggers that clear the table's export state, as in
+  utils_sync.py; full CSV loads suspend them and clear the state once.
+- Also writes <table>.parquet next to the column files when pyarrow is installed, for other tools.
+- Computes the db03_queries.py chart data (books per decade, top prices, books per author and the
+  average year) from the arrays with vectorized NumPy operations. The results match the SQL, except
+  that summed prices can differ in the last digits because NumPy adds floats in another order.
+"""
+
+# Imports from Python Standard Library
+import contextlib
+import datetime
+import json
+import pathlib
+import shutil
+import sqlite3
+import time
+import uuid
+from collections import namedtuple
+from typing import Iterator
+
+# Imports from local modules
+from utils_dtypes import COLUMN_DTYPES, HAS_PYARROW, column_dtype
+from utils_lazy import lazy_import
+from utils_logger import logger
+
+# Imported on first use, so importing the loader stays fast.
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# Tables exported by default, and where their export state is recorded in the database
+EXPORT_TABLES: list = ["authors", "books"]
+EXPORT_STATE_TABLE: str = "_columnar_state"
+
+# File in every table folder describing its columns and the export it holds
+MANIFEST_FILE: str = "manifest.json"
+
+# Number of rows fetched from SQLite at a time while exporting
+EXPORT_CHUNK_SIZE: int = 100_000
+
+# What an export did to one table: "unchanged", "appended" or "full", its rows afterwards, and rows added
+ExportResult = namedtuple("ExportResult", ["table", "mode", "rows", "added", "seconds"])
+
+
+def columns_folder(db_path: pathlib.Path) -> pathlib.Path:
+    """Return the folder a database's column export is written to (columns/ next to the database file)."""
+    return pathlib.Path(db_path).parent.joinpath("columns")
+
+
+def _column_specs(connection: sqlite3.Connection, table: str) -> list[dict]:
+    """
+    Return how each column of a table is stored: "number" (with its dtype), "dictionary" for the
+    repeated text utils_dtypes.py reads as categoricals, or "text" for any other text.
+    """
+    specs = []
+    for _, name, declared, *_ in connection.execute(f'PRAGMA main.table_info("{table}")'):
+        declared = (declared or "").upper()
+        if COLUMN_DTYPES.get(name) == "category":
+            specs.append({"name": name, "kind": "dictionary"})
+        elif "INT" in declared:
+            specs.append({"name": name, "kind": "number", "dtype": column_dtype(name, storage=True) or "int64"})
+        elif any(word in declared for word in ("REAL", "FLOA", "DOUB", "NUM", "DEC")):
+            specs.append({"name": name, "kind": "number", "dtype": "float64"})
+        else:
+            specs.append({"name": name, "kind": "text"})
+    return specs
+
+
+def _has_rowid(connection: sqlite3.Connection, table: str) -> bool:
+    """Return False if table is read through a view (e.g. the books view of a partitioned catalog)."""
+    try:
+        connection.execute(f'SELECT rowid FROM "{table}" LIMIT 0')
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def _trigger_names(table: str) -> list[str]:
+    """Return the names of the export triggers on a table (insert, update, delete)."""
+    return [f"_columnar_dirty_{table}_{event}" for event in ("insert", "update", "delete")]
+
+
+def _install_export_triggers(connection: sqlite3.Connection, table: str) -> bool:
+    """
+    Creates the triggers that clear a table's export state when its rows change: every update and
+    delete, and any insert that does not append (a rowid at or below the last exported one).
+    Returns False if they were missing, in which case any stored state must not be trusted.
+    """
+    trigger_names = _trigger_names(table)
+    existing = {
+        row[0]
+        for row in connection.execute(
+            "SELECT name FROM main.sqlite_master WHERE type = 'trigger' AND tbl_name = ?", (table,)
+        )
+    }
+    if all(name in existing for name in trigger_names):
+        return True
+
+    clear_state = f"DELETE FROM {EXPORT_STATE_TABLE} WHERE table_name = '{table}';"
+    appended = f"WHEN NEW.rowid <= (SELECT max_rowid FROM {EXPORT_STATE_TABLE} WHERE table_name = '{table}')"
+    for name, event in zip(trigger_names, (f"INSERT ON \"{table}\" {appended}", f'UPDATE ON "{table}"', f'DELETE ON "{table}"')):
+        # Created in main, so a TEMP view with the same name (a partitioned catalog's books) is not picked.
+        connection.execute(f'DROP TRIGGER IF EXISTS main."{name}"')
+        connection.execute(f'CREATE TRIGGER main."{name}" AFTER {event} BEGIN {clear_state} END')
+    return False
+
+
+def clear_export_state(connection: sqlite3.Connection, tables: list[str]) -> None:
+    """Marks the export of tables as stale, so the next export rewrites them in full."""
+    if not tables or not connection.execute(
+        "SELECT 1 FROM main.sqlite_master WHERE type = 'table' AND name = ?", (EXPORT_STATE_TABLE,)
+    ).fetchone():
+        return
+    connection.execute(
+        f"DELETE FROM {EXPORT_STATE_TABLE} WHERE table_name IN ({', '.join('?' for _ in tables)})", tables)
+
+
+@contextlib.contextmanager
+def suspended_export_tracking(connection: sqlite3.Connection, tables: list[str]) -> Iterator[None]:
+    """
+    Drops the export triggers on tables for the duration of a with block, so a bulk load does not
+    run them for every row, then re-creates them and clears the tables' export state once.
+    Must run inside the caller's transaction, like utils_search.deferred_search_index.
+    """
+    tracked = [
+        table for table in tables
+        if connection.execute("SELECT 1 FROM main.sqlite_master WHERE type = 'trigger' AND name = ?",
+                              (_trigger_names(table)[0],)).fetchone()
+    ]
+    for table in tracked:
+        for name in _trigger_names(table):
+            connection.execute(f'DROP TRIGGER IF EXISTS main."{name}"')
+    yield
+    for table in tracked:
+        _install_export_triggers(connection, table)
+    clear_export_state(connection, tracked)
+
+
+def _read_rows(connection: sqlite3.Connection, table: str, names: list[str], after_rowid: int | None,
+               chunk_size: int) -> tuple[list | None, list[list]]:
+    """
+    Fetches the rows of a table in rowid order, only those after after_rowid when it is given.
+    Return the rowids (None for a view, which has none) and one list of values per column.
+    """
+    columns_sql = ", ".join(f'"{name}"' for name in names)
+    if _has_rowid(connection, table):
+        where = "" if after_rowid is None else f"WHERE rowid > {int(after_rowid)} "
+        cursor = connection.execute(f'SELECT rowid, {columns_sql} FROM "{table}" {where}ORDER BY rowid')
+        rowids = []
+    else:
+        cursor = connection.execute(f'SELECT NULL, {columns_sql} FROM "{table}"')
+        rowids = None
+    values = [[] for _ in names]
+    while rows := cursor.fetchmany(chunk_size):
+        columns = list(zip(*rows))
+        if rowids is not None:
+            rowids.extend(columns[0])
+        for column_values, fetched in zip(values, columns[1:]):
+            column_values.extend(fetched)
+    return rowids, values
+
+
+def _number_array(values: list, dtype: str):
+    """
+    Return the values of a numeric column as an array of dtype and its NULL mask. Values that
+    do not fit dtype (fractions in an integer column, or out of its range) keep float64.
+    """
+    numbers = np.array(values, dtype=np.float64)
+    nulls = np.isnan(numbers)
+    if np.dtype(dtype).kind == "i":
+        whole = np.where(nulls, 0, numbers)
+        info = np.iinfo(dtype)
+        if not len(whole) or (np.all(whole % 1 == 0) and whole.min() >= info.min and whole.max() <= info.max):
+            return whole.astype(dtype), nulls
+    return numbers, nulls
+
+
+def _text_arrays(values) -> tuple:
+    """Return text values as one UTF-8 buffer (uint8), the offsets of each value in it, and the NULL mask."""
+    nulls = np.fromiter((value is None for value in values), dtype=bool, count=len(values))
+    encoded = [b"" if value is None else str(value).encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)), out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets, nulls
+
+
+def _decode_text(buffer, offsets, positions=None) -> list:
+    """Decodes the text values at positions (all values if None) from a UTF-8 buffer and its offsets."""
+    if positions is None:
+        data = bytes(buffer)
+        bounds = np.asarray(offsets).tolist()
+        return [data[start:end].decode("utf-8") for start, end in zip(bounds, bounds[1:])]
+    return [bytes(buffer[offsets[position]:offsets[position + 1]]).decode("utf-8") for position in positions]
+
+
+def _encode_column(spec: dict, values: list, previous: "ColumnarTable | None") -> dict:
+    """
+    Encodes one column's values as the arrays of its files (file name -> array). With previous,
+    the table's current export, the values are appended to its arrays; dictionary codes already
+    written stay valid and new distinct values are added to the end of the dictionary.
+    """
+    name = spec["name"]
+    arrays = {}
+    if spec["kind"] == "number":
+        numbers, nulls = _number_array(values, spec["dtype"])
+        if previous is not None:
+            numbers = np.concatenate([previous.numbers(name), numbers])
+        arrays[f"{name}.npy"] = numbers
+    elif spec["kind"] == "text":
+        buffer, offsets, nulls = _text_arrays(values)
+        if previous is not None:
+            old_offsets = previous.load(f"{name}.offsets.npy")
+            buffer = np.concatenate([previous.load(f"{name}.values.npy"), buffer])
+            offsets = np.concatenate([old_offsets, offsets[1:] + old_offsets[-1]])
+        arrays[f"{name}.values.npy"], arrays[f"{name}.offsets.npy"] = buffer, offsets
+    else:
+        text = np.array([None if value is None else str(value) for value in values], dtype=object)
+        nulls = pd.isna(text)
+        if previous is None:
+            # Sorted, so the codes of a full export follow the values' order.
+            codes, dictionary = pd.factorize(text, sort=True)
+        else:
+            dictionary = previous.dictionary(name)
+            codes = pd.Index(dictionary).get_indexer(text)
+            unknown = (codes < 0) & ~nulls
+            new_codes, new_values = pd.factorize(text[unknown], sort=True)
+            codes[unknown] = new_codes + len(dictionary)
+            codes = np.concatenate([previous.codes(name), codes])
+            dictionary = np.concatenate([dictionary, new_values])
+        buffer, offsets, _ = _text_arrays(list(dictionary))
+        arrays[f"{name}.codes.npy"] = np.asarray(codes, dtype=np.int32)
+        arrays[f"{name}.values.npy"], arrays[f"{name}.offsets.npy"] = buffer, offsets
+        # The codes already mark NULLs with -1.
+        return arrays
+
+    if previous is not None:
+        nulls = np.concatenate([previous.nulls(name), nulls])
+    if nulls.any():
+        arrays[f"{name}.nulls.npy"] = nulls
+    return arrays
+
+
+def _write_parquet(table_folder: pathlib.Path, table: "ColumnarTable") -> None:
+    """Writes an exported table to <table>.parquet, with its dictionary columns as categoricals."""
+    data = {}
+    for spec in table.manifest["columns"]:
+        name = spec["name"]
+        if spec["kind"] == "dictionary":
+            data[name] = pd.Categorical.from_codes(np.asarray(table.codes(name)), categories=table.dictionary(name))
+        elif spec["kind"] == "text":
+            data[name] = pd.Series(table.text(name), dtype=object).where(~table.nulls(name))
+        else:
+            data[name] = pd.Series(np.asarray(table.numbers(name))).where(~table.nulls(name))
+    pd.DataFrame(data).to_parquet(table_folder.joinpath(f"{table.name}.parquet"), index=False)
+
+
+def _write_table(folder: pathlib.Path, table: str, arrays: dict, manifest: dict) -> None:
+    """
+    Writes a table's files to a new folder and then swaps it in place of the old one, so a reader
+    never sees files from two different exports.
+    """
+    folder.mkdir(parents=True, exist_ok=True)
+    staging = folder.joinpath(f".{table}-{manifest['export_id']}")
+    staging.mkdir()
+    try:
+        for file_name, array in arrays.items():
+            np.save(staging.joinpath(file_name), array)
+        staging.joinpath(MANIFEST_FILE).write_text(json.dumps(manifest, indent=2))
+        if HAS_PYARROW:
+            _write_parquet(staging, ColumnarTable(staging))
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    target = folder.joinpath(table)
+    retired = folder.joinpath(f".{table}-retired-{manifest['export_id']}")
+    if target.exists():
+        target.rename(retired)
+    staging.rename(target)
+    # Processes that still map the old files keep reading them until they close them.
+    shutil.rmtree(retired, ignore_errors=True)
+
+
+def _refresh_table(connection: sqlite3.Connection, folder: pathlib.Path, table: str, full: bool,
+                   chunk_size: int) -> tuple[str, int, int]:
+    """Brings one table's export up to date; must run inside a write transaction. Return (mode, rows, added)."""
+    specs = _column_specs(connection, table)
+    if not specs:
+        raise ValueError(f"Table {table} does not exist")
+    tracked = _install_export_triggers(connection, table)
+    state = connection.execute(
+        f"SELECT export_id, row_count, max_rowid FROM {EXPORT_STATE_TABLE} WHERE table_name = ?", (table,)
+    ).fetchone()
+    previous = None
+    manifest_path = folder.joinpath(table).joinpath(MANIFEST_FILE)
+    if not full and tracked and state is not None and manifest_path.is_file():
+        previous = ColumnarTable(folder.joinpath(table))
+        if previous.manifest["export_id"] != state[0] or previous.manifest["columns"] != specs:
+            previous = None
+
+    names = [spec["name"] for spec in specs]
+    if previous is not None:
+        if state[2] is None:
+            # Read through a view: its rows are only replaced by a rebuild, which clears the state.
+            return "unchanged", previous.rows, 0
+        rowids, values = _read_rows(connection, table, names, state[2], chunk_size)
+        total = connection.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+        if not rowids and total == previous.rows:
+            return "unchanged", previous.rows, 0
+        if not rowids or total != previous.rows + len(rowids):
+            # Rows were removed without a trigger firing (e.g. INSERT OR REPLACE), so start over.
+            previous = None
+    if previous is None:
+        rowids, values = _read_rows(connection, table, names, None, chunk_size)
+
+    arrays = {}
+    for spec, column_values in zip(specs, values):
+        arrays.update(_encode_column(spec, column_values, previous))
+    added = len(values[0])
+    rows = added if previous is None else previous.rows + added
+    # A view has no rowids, so its export is never appended to.
+    max_rowid = None if rowids is None else (rowids[-1] if rowids else 0)
+    manifest = {
+        "table": table,
+        "export_id": uuid.uuid4().hex,
+        "rows": rows,
+        "max_rowid": max_rowid,
+        "exported_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "columns": specs,
+    }
+    _write_table(folder, table, arrays, manifest)
+    connection.execute(
+        f"INSERT INTO {EXPORT_STATE_TABLE} (table_name, export_id, row_count, max_rowid, exported_at) "
+        "VALUES (?, ?, ?, ?, ?) ON CONFLICT (table_name) DO UPDATE SET export_id = excluded.export_id, "
+        "row_count = excluded.row_count, max_rowid = excluded.max_rowid, exported_at = excluded.exported_at",
+        (table, manifest["export_id"], rows, max_rowid, manifest["exported_at"]),
+    )
+    return ("full" if previous is None else "appended"), rows, added
+
+
+def export_columns(
+    connection: sqlite3.Connection,
+    folder: pathlib.Path,
+    tables: list[str] | None = None,
+    full: bool = False,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> dict[str, ExportResult]:
+    """
+    Exports tables to memory-mapped column files in folder/<table>/, or brings an earlier export up to date.
+
+    Args:
+        connection (sqlite3.Connection): Read-write connection (the export state and triggers are stored in it).
+        folder (pathlib.Path): Folder the table folders are written to (see columns_folder).
+        tables (list): Tables to export. Defaults to EXPORT_TABLES.
+        full (bool): Export every table again, even if it has not changed.
+        chunk_size (int): Number of rows fetched at a time.
+
+    Returns:
+        dict: ExportResult per table.
+    """
+    folder = pathlib.Path(folder)
+    results = {}
+    # Close any open transaction, so each table is exported in a transaction of its own.
+    connection.commit()
+    connection.execute(
+        f"CREATE TABLE IF NOT EXISTS main.{EXPORT_STATE_TABLE} ("
+        "table_name TEXT PRIMARY KEY, export_id TEXT NOT NULL, row_count INTEGER NOT NULL, "
+        "max_rowid INTEGER, exported_at TEXT NOT NULL)"
+    )
+    connection.commit()
+    for table in tables or EXPORT_TABLES:
+        start = time.perf_counter()
+        try:
+            # Writers wait until the files and the export state agree.
+            connection.execute("BEGIN IMMEDIATE")
+            mode, rows, added = _refresh_table(connection, folder, table, full, chunk_size)
+            connection.commit()
+        except Exception as e:
+            connection.rollback()
+            logger.error(f"Error exporting {table} to {folder}: {e}")
+            raise
+        elapsed = time.perf_counter() - start
+        results[table] = ExportResult(table, mode, rows, added, elapsed)
+        logger.bind(table=table, rows=rows, seconds=round(elapsed, 6)).info(
+            f"Column export of {table}: {mode}, {added} rows written, {rows} rows in {folder.joinpath(table)} ({elapsed:.3f}s)")
+    return results
+
+
+class ColumnarTable:
+    """One exported table: its manifest and its memory-mapped column files."""
+
+    def __init__(self, folder: pathlib.Path) -> None:
+        self.folder = pathlib.Path(folder)
+        self.manifest = json.loads(self.folder.joinpath(MANIFEST_FILE).read_text())
+        self.name = self.manifest["table"]
+        self.rows = self.manifest["rows"]
+        self._dictionaries = {}
+
+    def load(self, file_name: str):
+        """Return the array in one of the table's files, memory-mapped read-only."""
+        return np.load(self.folder.joinpath(file_name), mmap_mode="r")
+
+    def numbers(self, column: str):
+        """Return a numeric column (0 where the value is NULL; see nulls)."""
+        return self.load(f"{column}.npy")
+
+    def nulls(self, column: str):
+        """Return the NULL mask of a number or text column."""
+        path = self.folder.joinpath(f"{column}.nulls.npy")
+        return self.load(path.name) if path.is_file() else np.zeros(self.rows, dtype=bool)
+
+    def codes(self, column: str):
+        """Return the dictionary codes of a dictionary-encoded column (-1 for NULL)."""
+        return self.load(f"{column}.codes.npy")
+
+    def dictionary(self, column: str):
+        """Return the distinct values of a dictionary-encoded column as an array, in code order."""
+        if column not in self._dictionaries:
+            values = _decode_text(self.load(f"{column}.values.npy"), self.load(f"{column}.offsets.npy"))
+            self._dictionaries[column] = np.array(values, dtype=object)
+        return self._dictionaries[column]
+
+    def values(self, column: str):
+        """Return a dictionary-encoded column decoded to one value per row (None for NULL)."""
+        # Code -1 reads the None appended after the last value.
+        return np.append(self.dictionary(column), None)[np.asarray(self.codes(column))]
+
+    def text(self, column: str, positions=None) -> list:
+        """Decodes a text column at positions (every row if None); NULLs are returned as None."""
+        values = _decode_text(self.load(f"{column}.values.npy"), self.load(f"{column}.offsets.npy"), positions)
+        nulls = self.nulls(column)
+        selected = nulls if positions is None else nulls[np.asarray(positions, dtype=np.int64)]
+        return [None if null else value for value, null in zip(values, selected.tolist())]
+
+
+def open_columns(folder: pathlib.Path, tables: list[str] | None = None) -> dict[str, ColumnarTable]:
+    """Opens an export written by export_columns. Raises FileNotFoundError if a table has not been exported."""
+    return {table: ColumnarTable(pathlib.Path(folder).joinpath(table)) for table in tables or EXPORT_TABLES}
+
+
+def describe_export(folder: pathlib.Path) -> list[str]:
+    """Return one line per exported table in folder: rows, export time and size on disk."""
+    lines = []
+    for manifest_path in sorted(pathlib.Path(folder).glob(f"*/{MANIFEST_FILE}")):
+        table = ColumnarTable(manifest_path.parent)
+        size = sum(path.stat().st_size for path in table.folder.iterdir()) / (1024 * 1024)
+        kinds = ", ".join(f"{spec['name']} ({spec['kind']})" for spec in table.manifest["columns"])
+        lines.append(f"{table.name}: {table.rows:,} rows, exported {table.manifest['exported_at']}, {size:.1f} MiB: {kinds}")
+    return lines
+
+
+def decade_counts(books: ColumnarTable, first_year: int = 1950, last_year: int = 2020) -> tuple[list, list]:
+    """
+    Counts the books per decade between first_year and last_year; the last decade also includes
+    last_year. Return (column names, rows) like the SQL in db03_queries.publication_year_data.
+    """
+    years = np.asarray(books.numbers("year_published"))
+    selected = ~np.asarray(books.nulls("year_published")) & (years >= first_year) & (years <= last_year)
+    # Truncated toward zero like SQLite's integer division, also for years before 0.
+    decades = (np.minimum(years[selected], last_year - 1) / 10).astype(np.int64)
+    if not len(decades):
+        return ["decade", "total_books"], []
+    low = decades.min()
+    counts = np.bincount(decades - low)
+    return ["decade", "total_books"], [(int(low + i) * 10, int(count)) for i, count in enumerate(counts) if count]
+
+
+def top_prices(books: ColumnarTable, top_n: int) -> tuple[list, list]:
+    """
+    Return the top_n most expensive books (ties ordered by book_id) and an "Other" row with the
+    summed price and count of the rest, like db03_queries.book_price_data.
+    """
+    prices = np.asarray(books.numbers("book_price"), dtype=np.float64)
+    priced = np.flatnonzero(~np.asarray(books.nulls("book_price")))
+    values = prices[priced]
+    candidates = priced
+    if len(values) > top_n > 0:
+        # Only books priced at least the top_n-th highest price (ties included) need their book_id.
+        threshold = np.partition(values, len(values) - top_n)[len(values) - top_n]
+        candidates = priced[values >= threshold]
+    elif top_n <= 0:
+        candidates = priced[:0]
+    book_ids = books.text("book_id", candidates)
+    order = sorted(range(len(candidates)),
+                   key=lambda i: (-prices[candidates[i]], book_ids[i] is not None, book_ids[i] or ""))[:max(top_n, 0)]
+    top = candidates[order]
+    rows = [(title, float(prices[position]), 1) for title, position in zip(books.text("title", top), top.tolist())]
+    rest = np.setdiff1d(priced, top, assume_unique=True)
+    rows.append(("Other", float(prices[rest].sum()) if len(rest) else None, len(rest)))
+    return ["label", "total_price", "book_count"], rows
+
+
+def books_per_author(books: ColumnarTable, authors: ColumnarTable) -> tuple[list, list]:
+    """
+    Counts the books of every author (authors without books count 0) and sums the counts per
+    first name and surname, ordered by surname, like db03_queries.total_books_per_author_data.
+    """
+    book_codes = np.asarray(books.codes("author_id"))
+    book_authors = books.dictionary("author_id")
+    per_code = np.bincount(book_codes[book_codes >= 0], minlength=len(book_authors))
+
+    # Match every distinct author_id of books to its row in authors; unknown ids are not counted.
+    author_ids = authors.values("author_id")
+    stored = np.flatnonzero(pd.notna(author_ids))
+    author_rows = pd.Index(author_ids[stored]).get_indexer(book_authors)
+    matched = author_rows >= 0
+    per_author = np.bincount(stored[author_rows[matched]], weights=per_code[matched], minlength=authors.rows)
+
+    first_codes = np.asarray(authors.codes("first"), dtype=np.int64)
+    surname_codes = np.asarray(authors.codes("surname"), dtype=np.int64)
+    name_keys = (first_codes + 1) * (len(authors.dictionary("surname")) + 1) + (surname_codes + 1)
+    _, representatives, groups = np.unique(name_keys, return_index=True, return_inverse=True)
+    totals = np.bincount(groups, weights=per_author, minlength=len(representatives))
+    firsts = authors.values("first")[representatives]
+    surnames = authors.values("surname")[representatives]
+    rows = sorted(zip(firsts.tolist(), surnames.tolist(), totals.astype(np.int64).tolist()),
+                  key=lambda row: (row[1] is not None, row[1] or "", row[0] is not None, row[0] or ""))
+    return ["first", "surname", "total_books"], rows
+
+
+def average_year(books: ColumnarTable) -> tuple[list, list]:
+    """Return the average publication year of the books (None if there is none), like AVG(year_published)."""
+    years = np.asarray(books.numbers("year_published"))[~np.asarray(books.nulls("year_published"))]
+    average = float(years.sum(dtype=np.float64)) / len(years) if len(years) else None
+    return ["average_year_published"], [(average,)]
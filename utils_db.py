@@ -0,0 +1,250 @@
+"""
+Database Connection Script
+File: utils_db.py
+
+This script opens every SQLite connection used by the project, so all scripts share the same settings.
+
+Features:
+- Puts the database in WAL mode, so readers keep working while the loader writes.
+- Applies tuned PRAGMA settings to every connection: synchronous, cache_size, mmap_size and temp_store.
+- Waits on a busy timeout instead of failing at once when another connection holds the write lock.
+- Opens read-only connections with "mode=ro" URIs for report queries.
+- Keeps a thread-safe pool of connections that worker threads can borrow and return.
+- Also opens "file:" URIs, such as the in-memory snapshots of utils_snapshot.py.
+- Attaches the partition files of a partitioned catalog (utils_partition.py) to every connection
+  and puts a TEMP books view over them, so queries written for one books table run unchanged.
+"""
+
+# Imports from Python Standard Library
+import contextlib
+import pathlib
+import queue
+import sqlite3
+import threading
+from typing import Iterator
+
+# Imports from local modules
+from utils_logger import logger
+
+ROOT_DIR: pathlib.Path = pathlib.Path(__file__).parent.resolve()
+DB_PATH: pathlib.Path = ROOT_DIR.joinpath("data").joinpath("db.sqlite")
+
+# Seconds a connection waits for a lock held by another connection before raising "database is locked"
+DEFAULT_BUSY_TIMEOUT: float = 30.0
+
+# PRAGMA settings applied to every connection. A value of None leaves the setting alone.
+# cache_size is negative, so it is read as KiB (64 MiB here) rather than pages.
+# synchronous=NORMAL is safe in WAL mode: a power loss can only lose the last commits, never corrupt the file.
+DEFAULT_CONNECTION_PRAGMAS: dict = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -65536,
+    "mmap_size": 268435456,
+    "temp_store": "MEMORY",
+}
+
+# Settings a read-only connection cannot change; the journal mode is stored in the database file.
+READ_ONLY_SKIPPED_PRAGMAS = {"journal_mode", "synchronous"}
+
+# Settings that apply to one schema at a time, so they are repeated for every attached partition
+PER_SCHEMA_PRAGMAS = ("cache_size", "mmap_size")
+
+# Table listing the partition files that hold the books of a partitioned catalog (see utils_partition.py)
+PARTITION_TABLE: str = "_partitions"
+
+
+def apply_connection_pragmas(connection: sqlite3.Connection, pragmas: dict, read_only: bool = False) -> None:
+    """Applies PRAGMA settings to a connection, skipping the ones a read-only connection cannot set."""
+    for name, value in pragmas.items():
+        if value is None or (read_only and name in READ_ONLY_SKIPPED_PRAGMAS):
+            continue
+        connection.execute(f"PRAGMA {name} = {value}")
+
+
+def is_uri(db_path: pathlib.Path | str) -> bool:
+    """Return True if db_path is a "file:" URI string rather than a file path."""
+    return isinstance(db_path, str) and db_path.startswith("file:")
+
+
+def connect(
+    db_path: pathlib.Path | str = DB_PATH,
+    read_only: bool = False,
+    pragmas: dict | None = None,
+    timeout: float = DEFAULT_BUSY_TIMEOUT,
+    check_same_thread: bool = True,
+    partitioned: bool = True,
+) -> sqlite3.Connection:
+    """
+    Opens a connection with the project's PRAGMA settings.
+    If the database is a partitioned catalog, its partition files are attached (see attach_partitions).
+
+    Args:
+        db_path (pathlib.Path | str): Path to the SQLite database file, or a "file:" URI string.
+        read_only (bool): Open the database with a "mode=ro" URI; writes raise sqlite3.OperationalError.
+        pragmas (dict): PRAGMA settings for the connection. Defaults to DEFAULT_CONNECTION_PRAGMAS.
+        timeout (float): Busy timeout in seconds.
+        check_same_thread (bool): Passed to sqlite3.connect; pooled connections turn it off.
+        partitioned (bool): Attach the partition files; turned off to write the main file's own tables.
+    """
+    pragmas = DEFAULT_CONNECTION_PRAGMAS if pragmas is None else pragmas
+    if not is_uri(db_path):
+        db_path = pathlib.Path(db_path)
+    try:
+        if is_uri(db_path):
+            uri = f"{db_path}{'&' if '?' in db_path else '?'}mode=ro" if read_only else db_path
+            connection = sqlite3.connect(uri, uri=True, timeout=timeout, check_same_thread=check_same_thread)
+        elif read_only:
+            uri = f"{db_path.resolve().as_uri()}?mode=ro"
+            connection = sqlite3.connect(uri, uri=True, timeout=timeout, check_same_thread=check_same_thread)
+        else:
+            db_path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(db_path, timeout=timeout, check_same_thread=check_same_thread)
+        apply_connection_pragmas(connection, pragmas, read_only=read_only)
+        if partitioned:
+            attach_partitions(connection, read_only=read_only, pragmas=pragmas)
+    except sqlite3.Error as e:
+        logger.error(f"Error connecting to database {db_path}: {e}")
+        raise
+    return connection
+
+
+def attach_partitions(connection: sqlite3.Connection, read_only: bool = False, pragmas: dict | None = None) -> int:
+    """
+    Attaches the partition files listed in the _partitions table as part_0, part_1, ... and creates
+    a TEMP books view that is the UNION ALL of their books tables. Unqualified names are looked up in
+    temp first, so the view hides the (empty) books table of the main file.
+    The cache and mmap settings in pragmas (PER_SCHEMA_PRAGMAS) are applied to each partition as well.
+    Returns the number of partitions attached, 0 for a database that is not partitioned.
+    """
+    pragmas = DEFAULT_CONNECTION_PRAGMAS if pragmas is None else pragmas
+    listed = connection.execute(
+        "SELECT 1 FROM main.sqlite_master WHERE type = 'table' AND name = ?", (PARTITION_TABLE,)
+    ).fetchone()
+    partitions = connection.execute(
+        f"SELECT partition_no, path FROM main.{PARTITION_TABLE} ORDER BY partition_no"
+    ).fetchall() if listed else []
+    if not partitions:
+        return 0
+    for number, path in partitions:
+        # A read-only connection was opened with URI names enabled, so its partitions can be read-only too.
+        target = f"{pathlib.Path(path).resolve().as_uri()}?mode=ro" if read_only else path
+        connection.execute(f"ATTACH DATABASE ? AS part_{number}", (target,))
+        for name in PER_SCHEMA_PRAGMAS:
+            if pragmas.get(name) is not None:
+                connection.execute(f"PRAGMA part_{number}.{name} = {pragmas[name]}")
+    selects = " UNION ALL ".join(f"SELECT * FROM part_{number}.books" for number, _ in partitions)
+    connection.execute(f"CREATE TEMP VIEW books AS {selects}")
+    return len(partitions)
+
+
+def database_path(connection: sqlite3.Connection) -> pathlib.Path:
+    """Return the file of a connection's main database, e.g. to open more connections to it."""
+    return pathlib.Path(connection.execute("PRAGMA database_list").fetchone()[2])
+
+
+@contextlib.contextmanager
+def open_connection(db_path: pathlib.Path = DB_PATH, read_only: bool = False, **kwargs) -> Iterator[sqlite3.Connection]:
+    """
+    Yields a connection from connect(), commits if the block succeeds, rolls back if it raises,
+    and always closes the connection (sqlite3's own context manager does not close it).
+    """
+    connection = connect(db_path, read_only=read_only, **kwargs)
+    try:
+        yield connection
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+
+class ConnectionPool:
+    """
+    A thread-safe pool of connections to one database.
+    Connections are opened lazily up to size and handed to one thread at a time.
+
+    Args:
+        db_path (pathlib.Path | str): Path to the SQLite database file, or a "file:" URI string.
+        size (int): Maximum number of open connections.
+        read_only (bool): Open read-only ("mode=ro") connections.
+        pragmas (dict): PRAGMA settings for every connection. Defaults to DEFAULT_CONNECTION_PRAGMAS.
+        timeout (float): Busy timeout in seconds.
+    """
+
+    def __init__(self, db_path: pathlib.Path | str = DB_PATH, size: int = 4, read_only: bool = False,
+                 pragmas: dict | None = None, timeout: float = DEFAULT_BUSY_TIMEOUT) -> None:
+        if size < 1:
+            raise ValueError(f"Pool size must be at least 1, got {size}")
+        self.db_path = db_path if is_uri(db_path) else pathlib.Path(db_path)
+        self.size = size
+        self.read_only = read_only
+        self.pragmas = pragmas
+        self.timeout = timeout
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._opened: list[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def acquire(self) -> sqlite3.Connection:
+        """
+        Return an idle connection, opening a new one if the pool is not full, else wait for one.
+        Raises RuntimeError once the pool is closed, even if connections were left idle.
+        """
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed")
+                if len(self._opened) < self.size:
+                    connection = connect(self.db_path, read_only=self.read_only, pragmas=self.pragmas,
+                                         timeout=self.timeout, check_same_thread=False)
+                    self._opened.append(connection)
+                    return connection
+            try:
+                connection = self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                message = f"No pooled connection to {self.db_path} became free within {self.timeout}s (all {self.size} in use)"
+                logger.error(message)
+                raise sqlite3.OperationalError(message) from None
+        # The pool may have been closed while this thread was taking the connection.
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+        return connection
+
+    def release(self, connection: sqlite3.Connection) -> None:
+        """Return a connection to the pool, rolling back anything its borrower left uncommitted."""
+        if self._closed:
+            # close() has closed it already.
+            return
+        if connection.in_transaction:
+            connection.rollback()
+        self._idle.put(connection)
+
+    @contextlib.contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection for the duration of a with block."""
+        connection = self.acquire()
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def close(self) -> None:
+        """Close every connection the pool opened."""
+        with self._lock:
+            self._closed = True
+            for connection in self._opened:
+                connection.close()
+            self._opened.clear()
+            while not self._idle.empty():
+                self._idle.get_nowait()
+
+    def __enter__(self) -> "ConnectionPool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,138 @@
+"""
+DataFrame Types Script
+File: utils_dtypes.py
+
+This script gives the project's known columns compact pandas dtypes when CSV files and query
+results are read into DataFrames.
+
+Features:
+- Maps known columns to small dtypes: repeated names and IDs (author_id, first, surname) to
+  categoricals, years to int16, prices to float32, and counts to int32. A column with NULLs
+  gets the nullable version of its integer type (Int16, Int32).
+- Stores unique text (book_id, title) as Arrow-backed strings when pyarrow is installed;
+  without pyarrow those columns keep the type pandas reads them as.
+- Leaves columns it does not know, and values that do not fit the compact type, unchanged.
+- Wraps pd.read_csv, pd.read_sql_query and DataFrame construction, so every reader gets the same types.
+
+float32 keeps about 7 significant digits: exact to the cent for prices below 10,000, which is
+enough for charts and aggregates. Frames written back to the database should be read with
+storage=True, which keeps prices as float64 so they round-trip exactly.
+"""
+
+# Imports from Python Standard Library
+import importlib.util
+import pathlib
+import sqlite3
+
+# Imports from local modules
+from utils_lazy import lazy_import
+from utils_logger import logger
+
+# Imported on first use, so importing this module stays fast.
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# Marks text columns that are stored as Arrow-backed strings when pyarrow is installed
+STRING: str = "string"
+
+# Compact dtype per known column name (in tables and query results)
+COLUMN_DTYPES: dict = {
+    "author_id": "category",
+    "first": "category",
+    "surname": "category",
+    "book_id": STRING,
+    "title": STRING,
+    "year_published": "int16",
+    "decade": "int16",
+    "book_price": "float32",
+    "total_books": "int32",
+    "book_count": "int32",
+}
+
+# Nullable pandas integer type used when an integer column has NULLs
+NULLABLE_INTEGERS: dict = {"int16": "Int16", "int32": "Int32"}
+
+HAS_PYARROW: bool = importlib.util.find_spec("pyarrow") is not None
+
+
+def string_dtype():
+    """Return the Arrow-backed pandas string dtype, or None when pyarrow is not installed."""
+    return pd.StringDtype("pyarrow") if HAS_PYARROW else None
+
+
+def column_dtype(column: str, storage: bool = False):
+    """
+    Return the compact dtype for a column name, or None if the column is not known
+    (or is text and pyarrow is not installed). With storage, prices stay float64.
+    """
+    dtype = COLUMN_DTYPES.get(column)
+    if dtype == STRING:
+        return string_dtype()
+    if storage and dtype == "float32":
+        return None
+    return dtype
+
+
+def _fits_integer(series, dtype: str) -> bool:
+    """
+    Return True if every non-missing value of a series is a whole number within dtype's
+    range. astype() does not check this: it truncates 1937.6 to 1937 and wraps 70000 to 4464.
+    """
+    present = series.dropna()
+    if pd.api.types.is_bool_dtype(present.dtype):
+        return False
+    # Text such as "1937" is checked by its number; text that is not a number does not fit.
+    numbers = pd.to_numeric(present, errors="coerce")
+    if numbers.isna().any():
+        return False
+    values = numbers.to_numpy(dtype=np.float64)
+    if not len(values):
+        return True
+    info = np.iinfo(dtype)
+    return bool(np.all(values % 1 == 0) and values.min() >= info.min and values.max() <= info.max)
+
+
+def apply_dtypes(df, storage: bool = False):
+    """
+    Converts the known columns of a DataFrame to their compact dtypes, in place, and returns it.
+    A column whose values do not fit (e.g. an average year with a fraction) is left as it is.
+
+    Args:
+        df (pd.DataFrame): Frame read from a CSV file or a query.
+        storage (bool): Keep prices as float64, for frames written back to the database.
+    """
+    for column in df.columns:
+        dtype = column_dtype(column, storage)
+        if dtype is None or df[column].dtype == dtype:
+            continue
+        if dtype in NULLABLE_INTEGERS:
+            if not _fits_integer(df[column], dtype):
+                logger.debug(f"Kept column {column} as {df[column].dtype}; its values are not whole numbers within {dtype}")
+                continue
+            if df[column].isna().any():
+                dtype = NULLABLE_INTEGERS[dtype]
+        try:
+            df[column] = df[column].astype(dtype)
+        except (TypeError, ValueError, OverflowError) as e:
+            logger.debug(f"Kept column {column} as {df[column].dtype}; it does not fit {dtype}: {e}")
+    return df
+
+
+def read_csv(csv_path: pathlib.Path, storage: bool = False, **kwargs):
+    """pd.read_csv with compact dtypes for the known columns (see apply_dtypes)."""
+    return apply_dtypes(pd.read_csv(csv_path, **kwargs), storage=storage)
+
+
+def read_sql_query(sql: str, connection: sqlite3.Connection, params=None):
+    """pd.read_sql_query with compact dtypes for the known columns (see apply_dtypes)."""
+    return apply_dtypes(pd.read_sql_query(sql, connection, params=params))
+
+
+def frame_from_rows(rows: list, columns: list[str]):
+    """Builds a DataFrame from fetched rows, with compact dtypes for the known columns."""
+    return apply_dtypes(pd.DataFrame(rows, columns=columns))
+
+
+def memory_mb(df) -> float:
+    """Return the memory used by a DataFrame in MiB, including the strings it holds."""
+    return df.memory_usage(deep=True).sum() / (1024 * 1024)
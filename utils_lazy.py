@@ -0,0 +1,57 @@
+"""
+Lazy Import Script
+File: utils_lazy.py
+
+This script defers importing heavy packages (pandas, matplotlib, numpy) until they are first used.
+
+Features:
+- lazy_import("pandas") returns a stand-in module object; the real import happens on the first
+  attribute access, so commands that never touch pandas never pay for importing it.
+- Runs an optional hook right after the real import (e.g. to set matplotlib rcParams).
+- Safe to use from several threads: the module is imported once.
+"""
+
+# Imports from Python Standard Library
+import importlib
+import threading
+from types import ModuleType
+from typing import Callable
+
+
+class LazyModule:
+    """
+    Stands in for a module until one of its attributes is used.
+
+    Args:
+        name (str): Fully qualified module name, e.g. "matplotlib.pyplot".
+        on_import (Callable): Called with the module right after it is imported.
+    """
+
+    def __init__(self, name: str, on_import: Callable[[ModuleType], None] | None = None) -> None:
+        self._name = name
+        self._on_import = on_import
+        self._module: ModuleType | None = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> ModuleType:
+        """Import the module (once) and return it."""
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    module = importlib.import_module(self._name)
+                    if self._on_import is not None:
+                        self._on_import(module)
+                    self._module = module
+        return self._module
+
+    def __getattr__(self, attribute: str):
+        return getattr(self._load(), attribute)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_import(name: str, on_import: Callable[[ModuleType], None] | None = None) -> LazyModule:
+    """Return a LazyModule for name; the module is imported the first time an attribute is used."""
+    return LazyModule(name, on_import)
@@ -2,19 +2,43 @@
 Logger Setup Script
 File: utils_logger.py
 
-This script provides logging functions for the project. 
-Logging is an essential way to track events and issues during execution. 
+This script provides logging functions for the project.
+Logging is an essential way to track events and issues during execution.
 
 Features:
 - Logs information, warnings, and errors to a designated log file.
-- Ensures the log directory exists.
+- Creates the log directory and file when the first message is logged, not on import.
+- Copies slow SQL statements to a separate slow query log file.
+- Writes the log files from a background thread (enqueue), so logging in a hot loop never waits on the disk.
+- Rotates the log files by size or time, compresses the old ones and keeps only the newest few.
+- Optionally writes JSON lines, with timing fields bound by the caller (e.g. rows, seconds)
+  as keys of the record's "extra" object.
+- Optionally rate-limits and samples repetitive INFO/DEBUG messages per call site; warnings
+  and errors are never dropped, and the next message says how many were suppressed.
+
+Everything is configured with environment variables, so no script has to change:
+    LOG_LEVEL        Lowest level written (default: INFO).
+    LOG_ENQUEUE      Write log files from a background thread: 1 or 0 (default: 1).
+    LOG_ROTATION     Start a new file at a size or time, e.g. "10 MB", "1 day", "00:00", or "none" (default: 10 MB).
+    LOG_RETENTION    Rotated files to keep: a count or a duration such as "1 week", or "none" (default: 10).
+    LOG_COMPRESSION  Compress rotated files: gz, bz2, xz, zip, or "none" (default: gz).
+    LOG_FORMAT       text or json (one JSON object per line) for the log files (default: text).
+    LOG_RATE_LIMIT   INFO/DEBUG messages per second allowed from each line of code; 0 for no limit (default: 0).
+    LOG_SAMPLE       Fraction of INFO/DEBUG messages kept, between 0 and 1 (default: 1).
+
+For example: LOG_FORMAT=json LOG_RATE_LIMIT=5 python db01_setup.py
 
 THIS LOGGER SHOULD WORK WITHOUT NEEDING MODIFICATION.
 Just put a copy in your root project folder and import in your scripts as shown in the examples.
 """
 
 # Imports from Python Standard Library
+import os
 import pathlib
+import random
+import sys
+import threading
+import time
 
 # Imports from external packages
 from loguru import logger
@@ -28,19 +52,173 @@ LOG_FOLDER: pathlib.Path = pathlib.Path("logs")
 # Set the name of the log file
 LOG_FILE: pathlib.Path = LOG_FOLDER.joinpath("project_log.log")
 
-# Ensure the log folder exists or create it
-try:
-    LOG_FOLDER.mkdir(exist_ok=True)
-    logger.info(f"Log folder created at: {LOG_FOLDER}")
-except Exception as e:
-    logger.error(f"Error creating log folder: {e}")
+# Set the name of the log file that only receives slow SQL statements
+SLOW_QUERY_LOG_FILE: pathlib.Path = LOG_FOLDER.joinpath("slow_queries.log")
+
+# Rotation, retention and compression of the log files when LOG_* does not set them (or sets them wrongly)
+DEFAULT_ROTATION: str = "10 MB"
+DEFAULT_RETENTION: int = 10
+DEFAULT_COMPRESSION: str = "gz"
+
+# Messages at this level (WARNING) and above are never rate-limited or sampled
+ALWAYS_KEPT_LEVEL_NO: int = 30
+
+STDERR_FORMAT = (
+    "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | "
+    "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>"
+)
+FILE_FORMAT = "{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {name}:{function}:{line} - {message}"
+
+
+def _env(name: str, default: str) -> str:
+    """Return an environment variable, or default when it is unset or blank."""
+    value = os.environ.get(name, "").strip()
+    return value or default
+
+
+def _optional(value: str) -> str | int | None:
+    """Return None for "none"/"off"/"0", an int for a plain count, else the text (e.g. "10 MB")."""
+    if value.lower() in ("none", "off", "0", "false"):
+        return None
+    return int(value) if value.isdigit() else value
+
+
+class RepeatFilter:
+    """
+    A loguru filter that limits INFO/DEBUG messages from each call site (module, function, line):
+    at most rate messages per second (a token bucket that allows short bursts), and only a
+    sample fraction of them. When messages were dropped, the next one that passes carries the
+    count in record["extra"]["suppressed"].
+
+    Args:
+        rate (float): Messages per second per call site; 0 for no limit.
+        sample (float): Fraction of messages kept, between 0 and 1.
+        burst (float): Messages a quiet call site may log at once before the rate applies.
+        extra_filter (Callable): Another filter a record must also pass (e.g. the slow query filter).
+    """
+
+    def __init__(self, rate: float = 0.0, sample: float = 1.0, burst: float | None = None, extra_filter=None) -> None:
+        self.rate = rate
+        self.sample = sample
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self.extra_filter = extra_filter
+        self._buckets: dict = {}  # call site -> [tokens, last refill time]
+        self._suppressed: dict = {}  # call site -> messages dropped since the last one kept
+        self._lock = threading.Lock()
+
+    def __call__(self, record: dict) -> bool:
+        if self.extra_filter is not None and not self.extra_filter(record):
+            return False
+        if record["level"].no >= ALWAYS_KEPT_LEVEL_NO or (self.rate <= 0 and self.sample >= 1):
+            return True
+        site = (record["name"], record["function"], record["line"])
+        with self._lock:
+            keep = self.sample >= 1 or random.random() < self.sample
+            if keep and self.rate > 0:
+                now = time.monotonic()
+                tokens, last = self._buckets.get(site, (self.burst, now))
+                tokens = min(self.burst, tokens + (now - last) * self.rate)
+                keep = tokens >= 1
+                self._buckets[site] = (tokens - 1 if keep else tokens, now)
+            if not keep:
+                self._suppressed[site] = self._suppressed.get(site, 0) + 1
+                return False
+            suppressed = self._suppressed.pop(site, 0)
+        if suppressed:
+            record["extra"]["suppressed"] = suppressed
+        return True
+
+
+def _with_suppressed(base_format: str):
+    """Return a loguru format function that appends the suppressed-message count when there is one."""
+    def format_record(record: dict) -> str:
+        suffix = " ({extra[suppressed]} similar messages suppressed)" if record["extra"].get("suppressed") else ""
+        return base_format + suffix + "\n{exception}"
+    return format_record
+
+
+def _add_file_sink(path: pathlib.Path, file_filter, file_options: dict) -> None:
+    """
+    Adds a log file sink. loguru only parses rotation, retention and compression here, so if one
+    of them is malformed the sink is added again with the defaults instead of not writing the file.
+    """
+    try:
+        _handler_ids.append(logger.add(path, filter=file_filter, **file_options))
+        return
+    except (ValueError, TypeError) as e:
+        logger.error(f"Invalid rotation, retention or compression for {path} ({e}); using the defaults "
+                     f"({DEFAULT_ROTATION}, {DEFAULT_RETENTION} files, {DEFAULT_COMPRESSION}).")
+    defaults = {"rotation": DEFAULT_ROTATION, "retention": DEFAULT_RETENTION, "compression": DEFAULT_COMPRESSION}
+    try:
+        _handler_ids.append(logger.add(path, filter=file_filter, **{**file_options, **defaults}))
+    except Exception as e:
+        logger.error(f"Error configuring log file {path}: {e}")
+
+
+def _is_slow_query(record: dict) -> bool:
+    return record["extra"].get("slow_query", False)
+
+
+# Handler IDs added by configure(), so calling it again replaces them
+_handler_ids: list = []
+
+
+def configure(
+    level: str | None = None,
+    enqueue: bool | None = None,
+    rotation: str | int | None = ...,
+    retention: str | int | None = ...,
+    compression: str | None = ...,
+    json_format: bool | None = None,
+    rate_limit: float | None = None,
+    sample: float | None = None,
+) -> None:
+    """
+    (Re)creates the stderr, log file and slow query sinks. Arguments left out are read from the
+    LOG_* environment variables described at the top of this file.
+    """
+    level = level or _env("LOG_LEVEL", "INFO").upper()
+    enqueue = enqueue if enqueue is not None else _env("LOG_ENQUEUE", "1").lower() not in ("0", "false", "no", "off")
+    rotation = rotation if rotation is not ... else _optional(_env("LOG_ROTATION", DEFAULT_ROTATION))
+    retention = retention if retention is not ... else _optional(_env("LOG_RETENTION", str(DEFAULT_RETENTION)))
+    compression = compression if compression is not ... else _optional(_env("LOG_COMPRESSION", DEFAULT_COMPRESSION))
+    json_format = json_format if json_format is not None else _env("LOG_FORMAT", "text").lower() == "json"
+    rate_limit = rate_limit if rate_limit is not None else float(_env("LOG_RATE_LIMIT", "0"))
+    sample = sample if sample is not None else float(_env("LOG_SAMPLE", "1"))
+
+    if not _handler_ids:
+        # Replace loguru's default stderr handler, so the rate limit applies to the console as well.
+        logger.remove()
+    for handler_id in _handler_ids:
+        logger.remove(handler_id)
+    _handler_ids.clear()
+
+    _handler_ids.append(logger.add(sys.stderr, level=level, format=_with_suppressed(STDERR_FORMAT),
+                                   filter=RepeatFilter(rate_limit, sample)))
+
+    # delay=True creates the log folder and opens the file only when the first message is logged,
+    # so importing this module costs no file system work.
+    file_options = dict(level=level, delay=True, enqueue=enqueue, rotation=rotation, retention=retention,
+                        compression=compression, serialize=json_format,
+                        format=FILE_FORMAT if json_format else _with_suppressed(FILE_FORMAT))
+    _add_file_sink(LOG_FILE, RepeatFilter(rate_limit, sample), file_options)
+
+    # Send records logged through slow_query_logger to their own file as well.
+    # Slow statements are WARNING records, so the rate limit never drops them.
+    _add_file_sink(SLOW_QUERY_LOG_FILE, RepeatFilter(rate_limit, sample, extra_filter=_is_slow_query),
+                   {**file_options, "level": "INFO"})
+
 
-# Configure Loguru to write to the log file
 try:
-    logger.add(LOG_FILE, level="INFO")
-    logger.info(f"Logging to file: {LOG_FILE}")
-except Exception as e:
-    logger.error(f"Error configuring logger to write to file: {e}")
+    configure()
+except ValueError as e:
+    # A malformed LOG_* variable must not stop the scripts; fall back to the defaults.
+    logger.error(f"Invalid logging configuration in the environment ({e}); using the defaults.")
+    configure(level="INFO", enqueue=True, rotation=DEFAULT_ROTATION, retention=DEFAULT_RETENTION, compression=DEFAULT_COMPRESSION,
+              json_format=False, rate_limit=0.0, sample=1.0)
+
+# Logger for statements that exceed the slow query threshold (see utils_profile.py)
+slow_query_logger = logger.bind(slow_query=True)
 
 
 def get_log_file_path() -> pathlib.Path:
@@ -54,6 +232,8 @@ def log_example() -> None:
         logger.info("This is an example info message.")
         logger.warning("This is an example warning message.")
         logger.error("This is an example error message.")
+        # Fields bound to a message are written as JSON keys when LOG_FORMAT=json.
+        logger.bind(rows=1000, seconds=0.25).info("This is an example message with timing fields.")
     except Exception as e:
         logger.error(f"An error occurred during logging: {e}")
 
@@ -71,4 +251,4 @@ def main() -> None:
 
 # Conditional execution block that calls main() only when this file is executed directly
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,124 @@
+"""
+Schema Migration Script
+File: utils_migrate.py
+
+This script applies the numbered SQL files in sql_migrations/ to the database, once each.
+
+Features:
+- Records every applied migration in a schema_version table.
+- Runs each migration and its schema_version row in one transaction.
+- Refuses to run when an applied migration file has been edited since (its SHA-256 no longer
+  matches the checksum recorded in schema_version): the database would silently lack the change.
+  Add a new migration instead.
+- Treats ALTER TABLE ... ADD COLUMN as idempotent: a column that already exists is skipped,
+  and a new column is added in place without copying the table.
+
+Migration files are named NNNN_description.sql and are applied in version order.
+"""
+
+# Imports from Python Standard Library
+import datetime
+import hashlib
+import pathlib
+import re
+import sqlite3
+
+# Imports from local modules
+from utils_logger import logger
+from utils_sql import ADD_COLUMN_PATTERN, add_column_if_missing, split_sql_statements, strip_sql_comments
+
+MIGRATIONS_FOLDER: pathlib.Path = pathlib.Path(__file__).parent.resolve().joinpath("sql_migrations")
+
+MIGRATION_FILE_PATTERN = re.compile(r"^(\d+)_(\w+)\.sql$")
+
+
+def list_migrations(folder: pathlib.Path = MIGRATIONS_FOLDER) -> list[tuple[int, str, pathlib.Path]]:
+    """Return (version, name, path) for every migration file in the folder, sorted by version."""
+    migrations = []
+    for path in folder.glob("*.sql"):
+        match = MIGRATION_FILE_PATTERN.match(path.name)
+        if not match:
+            logger.warning(f"Skipping migration file with unexpected name: {path}")
+            continue
+        migrations.append((int(match.group(1)), match.group(2), path))
+    return sorted(migrations)
+
+
+def applied_versions(connection: sqlite3.Connection) -> dict[int, str]:
+    """Return {version: checksum} for the migrations recorded in schema_version, creating the table if needed."""
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        "version INTEGER PRIMARY KEY, name TEXT NOT NULL, checksum TEXT NOT NULL, applied_at TEXT NOT NULL)"
+    )
+    connection.commit()
+    return dict(connection.execute("SELECT version, checksum FROM schema_version").fetchall())
+
+
+def migration_checksum(script: str) -> str:
+    """Return the SHA-256 hex digest of a migration script."""
+    return hashlib.sha256(script.encode("utf-8")).hexdigest()
+
+
+def check_applied_migrations(done: dict[int, str], migrations: list[tuple[int, str, pathlib.Path]]) -> None:
+    """Raises ValueError if any applied migration file no longer matches its recorded checksum."""
+    changed = [
+        path.name for version, _, path in migrations
+        if version in done and migration_checksum(path.read_text(encoding="utf-8")) != done[version]
+    ]
+    if changed:
+        message = (f"Applied migrations were edited after they ran: {', '.join(changed)}. "
+                   "Restore them and put the change in a new migration.")
+        logger.error(message)
+        raise ValueError(message)
+
+
+def _execute_migration_statement(connection: sqlite3.Connection, statement: str) -> None:
+    """Executes one migration statement, skipping ADD COLUMN for columns that already exist."""
+    match = ADD_COLUMN_PATTERN.match(strip_sql_comments(statement))
+    if match:
+        table, column, declaration = match.groups()
+        if not add_column_if_missing(connection, table, column, declaration):
+            logger.info(f"Column {table}.{column} already exists; skipping ADD COLUMN.")
+        return
+    connection.execute(statement)
+
+
+def apply_migrations(connection: sqlite3.Connection, folder: pathlib.Path = MIGRATIONS_FOLDER) -> list[int]:
+    """
+    Applies every migration in the folder that is not yet recorded in schema_version.
+    Raises ValueError, before applying anything, if an applied migration file has changed.
+
+    Args:
+        connection (sqlite3.Connection): SQLite connection object.
+        folder (pathlib.Path): Folder holding the NNNN_description.sql migration files.
+
+    Returns:
+        list: Versions applied by this call.
+    """
+    done = applied_versions(connection)
+    migrations = list_migrations(folder)
+    check_applied_migrations(done, migrations)
+    newly_applied = []
+    for version, name, path in migrations:
+        if version in done:
+            continue
+        script = path.read_text(encoding="utf-8")
+        checksum = migration_checksum(script)
+        try:
+            connection.execute("BEGIN")
+            for statement in split_sql_statements(script):
+                _execute_migration_statement(connection, statement)
+            connection.execute(
+                "INSERT INTO schema_version (version, name, checksum, applied_at) VALUES (?, ?, ?, ?)",
+                (version, name, checksum, datetime.datetime.now(datetime.timezone.utc).isoformat()),
+            )
+            connection.commit()
+        except Exception as e:
+            connection.rollback()
+            logger.error(f"Migration {path.name} failed: {e}")
+            raise
+        logger.info(f"Applied migration {path.name}")
+        newly_applied.append(version)
+    if not newly_applied:
+        logger.info("Database schema is up to date.")
+    return newly_applied
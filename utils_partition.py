@@ -0,0 +1,373 @@
+"""
+Partitioned Catalog Script
+File: utils_partition.py
+
+This script splits the books of a catalog across several SQLite files and queries them together.
+
+Features:
+- Splits books.csv into partitions by publication decade (contiguous ranges of decades holding
+  about the same number of books) or by a hash of author_id.
+- Loads the partitions in parallel, one process per file: each file has its own write lock,
+  so the loads do not wait on each other.
+- Keeps authors, author_stats and the list of partitions (_partitions) in the main file.
+  utils_db.connect attaches the partitions to every connection and puts a TEMP books view
+  (UNION ALL) over them, so sql_queries/ runs unchanged.
+- Fans an aggregate query out over the partitions in a process pool and merges the
+  per-partition results (sums, minimums, maximums), skipping partitions whose years
+  cannot match a year range.
+- Records each partition's row count and year range, which is what the pruning reads.
+
+A UNION ALL view pushes a WHERE clause into every partition, where the year_published index
+finds no rows in a partition outside the range with a single seek. Full-text search of
+book titles and the author_stats triggers cover the single-file layout only; author_stats is
+rebuilt from the partitions when they are built.
+"""
+
+# Imports from Python Standard Library
+import bisect
+import csv
+import os
+import pathlib
+import sqlite3
+import tempfile
+import time
+import zlib
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+# Imports from local modules
+from utils_columnar import clear_export_state
+from utils_db import PARTITION_TABLE, connect
+from utils_lazy import lazy_import
+from utils_loader import DEFAULT_CHUNK_SIZE, check_field_counts, iter_csv_chunks, load_csv_files, read_csv_header, skip_rows
+from utils_logger import logger
+from utils_validate import validate_csv_files
+
+pd = lazy_import("pandas")
+
+# How books are assigned to partitions
+PARTITION_SCHEMES: tuple = ("decade", "author")
+
+DEFAULT_PARTITIONS: int = 4
+
+# One partition file: its number, path, row count, and the range of its years (None if it has none)
+Partition = namedtuple("Partition", ["number", "path", "rows", "min_year", "max_year"])
+
+# How fan_out_aggregate combines a column across partitions; the other columns are the group key.
+MERGE_FUNCTIONS: dict = {
+    "sum": lambda a, b: b if a is None else a if b is None else a + b,
+    "min": lambda a, b: b if a is None else a if b is None else min(a, b),
+    "max": lambda a, b: b if a is None else a if b is None else max(a, b),
+}
+
+
+def ensure_partition_table(connection: sqlite3.Connection) -> None:
+    """Creates the table listing the partition files, if it does not exist."""
+    connection.execute(
+        f"CREATE TABLE IF NOT EXISTS main.{PARTITION_TABLE} ("
+        "partition_no INTEGER PRIMARY KEY, path TEXT NOT NULL, scheme TEXT NOT NULL, "
+        "row_count INTEGER NOT NULL, min_year INTEGER, max_year INTEGER)"
+    )
+
+
+def partition_layout(connection: sqlite3.Connection) -> list[Partition]:
+    """Return the partitions of a catalog, or an empty list if it is not partitioned."""
+    listed = connection.execute(
+        "SELECT 1 FROM main.sqlite_master WHERE type = 'table' AND name = ?", (PARTITION_TABLE,)
+    ).fetchone()
+    if not listed:
+        return []
+    rows = connection.execute(
+        f"SELECT partition_no, path, row_count, min_year, max_year FROM main.{PARTITION_TABLE} ORDER BY partition_no"
+    ).fetchall()
+    return [Partition(number, pathlib.Path(path), count, low, high) for number, path, count, low, high in rows]
+
+
+def partition_path(db_path: pathlib.Path, number: int) -> pathlib.Path:
+    """Return the file of a partition, next to the main database file (db.sqlite -> db_p0.sqlite)."""
+    return db_path.with_name(f"{db_path.stem}_p{number}{db_path.suffix}")
+
+
+def prune_partitions(partitions: list[Partition], year_range: tuple | None) -> list[Partition]:
+    """Return the partitions that can hold a year in year_range (low, high), inclusive; all if year_range is None."""
+    if year_range is None:
+        return list(partitions)
+    low, high = year_range
+    return [
+        partition for partition in partitions
+        if partition.min_year is not None and partition.max_year >= low and partition.min_year <= high
+    ]
+
+
+def decade_boundaries(books_csv: pathlib.Path, count: int) -> list[int]:
+    """
+    Return the first decade of partitions 1..count-1, chosen so each partition holds about the
+    same number of books. A decade is never split, so one very large decade can leave fewer
+    non-empty partitions than count.
+    """
+    years = pd.to_numeric(pd.read_csv(books_csv, usecols=["year_published"])["year_published"], errors="coerce").dropna()
+    decades = ((years // 10) * 10).astype(int).value_counts().sort_index()
+    cumulative = decades.cumsum().to_numpy()
+    total = cumulative[-1] if len(cumulative) else 0
+    boundaries = []
+    for number in range(1, count):
+        # The decade in which the running total passes number/count of the books starts the next
+        # partition; the first decade always stays in partition 0.
+        index = max(int((cumulative <= total * number / count).sum()), 1)
+        if index < len(decades):
+            decade = int(decades.index[index])
+            if not boundaries or decade > boundaries[-1]:
+                boundaries.append(decade)
+    return boundaries
+
+
+def _partition_of_row(row: tuple, columns: dict, scheme: str, count: int, boundaries: list[int]) -> int:
+    """Return the partition a books.csv row belongs to. Books without a year go to partition 0."""
+    if scheme == "author":
+        author_id = row[columns["author_id"]] or ""
+        # crc32, unlike hash(), is the same in every process and run.
+        return zlib.crc32(author_id.encode("utf-8")) % count
+    year = row[columns["year_published"]]
+    try:
+        decade = int(year) // 10 * 10
+    except (TypeError, ValueError):
+        return 0
+    return bisect.bisect_right(boundaries, decade)
+
+
+def _split_csv(books_csv: pathlib.Path, folder: pathlib.Path, count: int, scheme: str, boundaries: list[int],
+               skipped: set, chunk_size: int) -> list[pathlib.Path]:
+    """Writes the rows of books_csv (except the skipped positions) to one CSV per partition."""
+    header = read_csv_header(books_csv)
+    columns = {name: index for index, name in enumerate(header)}
+    paths = [folder.joinpath(f"books_p{number}.csv") for number in range(count)]
+    files = [open(path, "w", newline="", encoding="utf-8") for path in paths]
+    try:
+        writers = [csv.writer(file) for file in files]
+        for writer in writers:
+            writer.writerow(header)
+        chunks = iter_csv_chunks(books_csv, chunk_size)
+        if skipped:
+            chunks = skip_rows(chunks, skipped)
+        for chunk in check_field_counts(chunks, len(header), books_csv):
+            for row in chunk:
+                # iter_csv_chunks returns empty fields as None; write them back as empty fields.
+                writers[_partition_of_row(row, columns, scheme, count, boundaries)].writerow(row)
+    finally:
+        for file in files:
+            file.close()
+    return paths
+
+
+def _books_schema(connection: sqlite3.Connection) -> list[str]:
+    """
+    Return the statements creating a partition's books table and indexes, copied from the main
+    file's books table. Foreign keys are left out: they cannot point into another file.
+    """
+    info = connection.execute("PRAGMA main.table_info(books)").fetchall()
+    if not info:
+        raise ValueError("The main database has no books table; apply the migrations first.")
+    columns = [f'"{name}" {declared}{" NOT NULL" if not_null else ""}' for _, name, declared, not_null, _, _ in info]
+    keys = [name for _, name, _, _, _, pk in sorted(info, key=lambda column: column[5]) if pk]
+    if keys:
+        columns.append(f"PRIMARY KEY ({', '.join(keys)})")
+    indexes = connection.execute(
+        "SELECT sql FROM main.sqlite_master WHERE type = 'index' AND tbl_name = 'books' AND sql IS NOT NULL"
+    ).fetchall()
+    return [f"CREATE TABLE books ({', '.join(columns)})", *[sql for (sql,) in indexes]]
+
+
+def _load_partition(path: pathlib.Path, csv_path: pathlib.Path, schema: list[str], chunk_size: int) -> tuple:
+    """Creates one partition file and loads its CSV into it (runs in a worker process). Returns (rows, min year, max year)."""
+    for suffix in ("", "-wal", "-shm"):
+        pathlib.Path(f"{path}{suffix}").unlink(missing_ok=True)
+    connection = connect(path, partitioned=False)
+    try:
+        with connection:
+            for statement in schema:
+                connection.execute(statement)
+        # The authors are in another file; build_partitions checks the references once all partitions are loaded.
+        load_csv_files(connection, [("books", csv_path)], chunk_size=chunk_size, validate=False)
+        return connection.execute("SELECT COUNT(*), MIN(year_published), MAX(year_published) FROM books").fetchone()
+    finally:
+        connection.close()
+
+
+def _check_author_references(connection: sqlite3.Connection, paths: list[pathlib.Path]) -> None:
+    """Raises ValueError if a book in a partition refers to an author missing from the main file (one anti-join per partition)."""
+    for number, path in enumerate(paths):
+        connection.execute("ATTACH DATABASE ? AS _partition_check", (str(path),))
+        try:
+            missing = connection.execute(
+                "SELECT COUNT(*) FROM _partition_check.books AS b WHERE b.author_id IS NOT NULL "
+                "AND NOT EXISTS (SELECT 1 FROM main.authors AS a WHERE a.author_id = b.author_id)"
+            ).fetchone()[0]
+        finally:
+            connection.execute("DETACH DATABASE _partition_check")
+        if missing:
+            raise ValueError(f"{missing} books in partition {number} ({path}) refer to authors that are not loaded")
+
+
+def build_partitions(
+    connection: sqlite3.Connection,
+    authors_csv: pathlib.Path,
+    books_csv: pathlib.Path,
+    count: int = DEFAULT_PARTITIONS,
+    scheme: str = "decade",
+    workers: int | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    validate: bool = False,
+) -> list[Partition]:
+    """
+    Loads the authors into the main file and the books into count partition files next to it,
+    replacing any earlier data and partitions. Fails if a book refers to an author that is not loaded.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the migrated main database, opened with partitioned=False.
+        authors_csv (pathlib.Path): Authors CSV, loaded into the main file.
+        books_csv (pathlib.Path): Books CSV, split across the partitions.
+        count (int): Number of partition files.
+        scheme (str): "decade" (ranges of publication decades) or "author" (hash of author_id).
+        workers (int): Partitions loaded at the same time (default: CPU count).
+        chunk_size (int): Number of CSV rows written per executemany call.
+        validate (bool): Check both CSV files with utils_validate first and leave out the rejected rows.
+    """
+    if scheme not in PARTITION_SCHEMES:
+        raise ValueError(f"Unknown partition scheme {scheme!r}; use one of {PARTITION_SCHEMES}")
+    # Every partition is attached to every connection, so stay within SQLite's ATTACH limit.
+    max_count = connection.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+    if not 1 <= count <= max_count:
+        raise ValueError(f"The number of partitions must be between 1 and {max_count}, got {count}")
+    db_path = pathlib.Path(connection.execute("PRAGMA database_list").fetchone()[2])
+    start = time.perf_counter()
+
+    try:
+        # Clear the books first: the authors load checks that no book points to a missing author.
+        with connection:
+            connection.execute("DELETE FROM main.books")
+            ensure_partition_table(connection)
+            connection.execute(f"DELETE FROM main.{PARTITION_TABLE}")
+        load_csv_files(connection, [("authors", authors_csv)], chunk_size=chunk_size, validate=validate)
+
+        skipped = set()
+        if validate:
+            validation = validate_csv_files([("books", books_csv)], connection)
+            skipped = set(validation["books"].rejected.tolist())
+        boundaries = decade_boundaries(books_csv, count) if scheme == "decade" else []
+        schema = _books_schema(connection)
+        paths = [partition_path(db_path, number) for number in range(count)]
+
+        with tempfile.TemporaryDirectory(dir=db_path.parent) as folder:
+            csv_paths = _split_csv(books_csv, pathlib.Path(folder), count, scheme, boundaries, skipped, chunk_size)
+            logger.info(f"Split {books_csv} into {count} partitions by {scheme} in {time.perf_counter() - start:.3f}s")
+            with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, count)) as pool:
+                results = list(pool.map(_load_partition, paths, csv_paths, [schema] * count, [chunk_size] * count))
+        _check_author_references(connection, paths)
+
+        partitions = [Partition(number, path, *result) for number, (path, result) in enumerate(zip(paths, results))]
+        with connection:
+            connection.executemany(
+                f"INSERT INTO main.{PARTITION_TABLE} (partition_no, path, scheme, row_count, min_year, max_year) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(p.number, str(p.path.resolve()), scheme, p.rows, p.min_year, p.max_year) for p in partitions],
+            )
+            # No trigger sees rows written to the partition files, so mark the books export stale here.
+            clear_export_state(connection, ["books"])
+    except Exception as e:
+        logger.error(f"Error building partitions of {books_csv}: {e}")
+        raise
+
+    rebuild_author_stats(connection, workers=workers)
+    for partition in partitions:
+        logger.info(f"Partition {partition.number}: {partition.rows} books, years {partition.min_year}-{partition.max_year} ({partition.path.name})")
+    logger.info(f"Built {count} partitions in {time.perf_counter() - start:.3f}s")
+    return partitions
+
+
+def _run_on_partition(path: pathlib.Path, sql: str, params: tuple) -> tuple:
+    """Runs a query on one partition file on its own (runs in a worker process). Returns (columns, rows)."""
+    connection = connect(path, read_only=True, partitioned=False)
+    try:
+        cursor = connection.execute(sql, params)
+        return [description[0] for description in cursor.description], cursor.fetchall()
+    finally:
+        connection.close()
+
+
+def fan_out_aggregate(
+    connection: sqlite3.Connection,
+    sql: str,
+    merge: dict,
+    params: tuple = (),
+    year_range: tuple | None = None,
+    workers: int | None = None,
+) -> tuple[list[str], list[tuple]]:
+    """
+    Runs an aggregate query on every partition at the same time and merges the results.
+
+    The query reads the partition's own books table, groups by any columns not named in merge,
+    and returns aggregates that can be combined across partitions: counts and sums ("sum"),
+    minimums ("min") and maximums ("max"). An average is a sum and a count, divided after merging.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the partitioned catalog.
+        sql (str): Query run on each partition.
+        merge (dict): Aggregate column -> "sum", "min" or "max".
+        params (tuple): Query parameters.
+        year_range (tuple): (low, high) years the query filters on; other partitions are skipped.
+        workers (int): Partitions queried at the same time (default: CPU count).
+
+    Returns:
+        tuple: (column names, merged rows sorted by the group columns).
+    """
+    layout = partition_layout(connection)
+    partitions = prune_partitions(layout, year_range)
+    if not partitions:
+        return [], []
+    start = time.perf_counter()
+    paths = [partition.path for partition in partitions]
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_run_on_partition, paths, [sql] * len(paths), [params] * len(paths)))
+    else:
+        results = [_run_on_partition(path, sql, params) for path in paths]
+
+    columns = results[0][0]
+    unknown = [column for column in merge if column not in columns]
+    if unknown:
+        raise ValueError(f"Columns {unknown} are not in the result of the query")
+    group_indexes = [index for index, column in enumerate(columns) if column not in merge]
+    merged: dict = {}
+    for _, rows in results:
+        for row in rows:
+            key = tuple(row[index] for index in group_indexes)
+            if key not in merged:
+                merged[key] = list(row)
+                continue
+            current = merged[key]
+            for index, column in enumerate(columns):
+                if column in merge:
+                    current[index] = MERGE_FUNCTIONS[merge[column]](current[index], row[index])
+    rows = sorted((tuple(row) for row in merged.values()),
+                  key=lambda row: tuple((row[index] is not None, row[index]) for index in group_indexes))
+    logger.info(f"Fanned a query out over {len(paths)} of {len(layout)} partitions "
+                f"in {time.perf_counter() - start:.3f}s")
+    return columns, rows
+
+
+def rebuild_author_stats(connection: sqlite3.Connection, workers: int | None = None) -> None:
+    """Recomputes the author_stats rollups from the partitions (the triggers only see the main file's books)."""
+    _, rows = fan_out_aggregate(
+        connection,
+        "SELECT author_id, COUNT(*) AS book_count, COUNT(book_price) AS priced_count, "
+        "COALESCE(SUM(book_price), 0) AS price_sum FROM books WHERE author_id IS NOT NULL GROUP BY author_id",
+        merge={"book_count": "sum", "priced_count": "sum", "price_sum": "sum"},
+        workers=workers,
+    )
+    with connection:
+        connection.execute("DELETE FROM main.author_stats")
+        connection.executemany(
+            "INSERT INTO main.author_stats (author_id, book_count, priced_count, price_sum) VALUES (?, ?, ?, ?)", rows
+        )
+    logger.info(f"Rebuilt author_stats for {len(rows)} authors from the partitions")
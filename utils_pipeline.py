@@ -0,0 +1,296 @@
+"""
+Pipeline Memoization Script
+File: utils_pipeline.py
+
+This script lets the stages db01 -> db02 -> db03 skip work whose inputs have not changed since the last run.
+
+Features:
+- Fingerprints each stage from the SHA-256 of its input files (CSV data, SQL scripts, migrations),
+  its options and the output fingerprints of the stages it depends on.
+- Records the fingerprints in a _pipeline_state table in the database itself and skips a stage whose
+  fingerprint is unchanged. Every run of a stage gets a new output fingerprint, so the stages after
+  it run again.
+- Skips a stage only while the database still holds what it wrote: every stage overwrites the books
+  and authors, so it is up to date only if it ran last, or ran right before stages of the same
+  command that are skipped too. Running "features" after "all" therefore runs it again.
+- Remembers file hashes by size and modification time in _pipeline_files, so unchanged multi-GB
+  CSV files are not re-read just to prove they are unchanged.
+- Stores the preview of every report statement in _pipeline_results, keyed on its SQL and upstream
+  fingerprint, so editing one query file only re-runs that file's changed statements.
+- Any script that changes the data outside the pipeline calls invalidate_pipeline() to forget it all.
+"""
+
+# Imports from Python Standard Library
+import datetime
+import hashlib
+import pathlib
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Iterable
+
+# Imports from local modules
+from utils_logger import logger
+from utils_result_cache import normalize_sql
+from utils_sync import file_sha256
+
+PIPELINE_STATE_TABLE: str = "_pipeline_state"
+PIPELINE_FILES_TABLE: str = "_pipeline_files"
+PIPELINE_RESULTS_TABLE: str = "_pipeline_results"
+PIPELINE_HEAD_TABLE: str = "_pipeline_head"
+
+
+def ensure_pipeline_tables(connection: sqlite3.Connection) -> None:
+    """Creates the pipeline metadata tables if they do not exist yet."""
+    columns = {row[1] for row in connection.execute(f"PRAGMA table_info({PIPELINE_STATE_TABLE})")}
+    if columns and "base" not in columns:
+        # Recorded before stages noted what they ran on; forgetting them only makes the next run do all its work.
+        connection.execute(f"DROP TABLE {PIPELINE_STATE_TABLE}")
+    # base is the database content a stage ran on, output the content it left (see Pipeline.head).
+    connection.execute(
+        f"CREATE TABLE IF NOT EXISTS {PIPELINE_STATE_TABLE} ("
+        "stage TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, output TEXT NOT NULL, base TEXT NOT NULL, "
+        "seconds REAL NOT NULL, completed_at TEXT NOT NULL)"
+    )
+    connection.execute(
+        f"CREATE TABLE IF NOT EXISTS {PIPELINE_HEAD_TABLE} (id INTEGER PRIMARY KEY CHECK (id = 1), content TEXT NOT NULL)"
+    )
+    connection.execute(
+        f"CREATE TABLE IF NOT EXISTS {PIPELINE_FILES_TABLE} ("
+        "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, sha256 TEXT NOT NULL)"
+    )
+    connection.execute(
+        f"CREATE TABLE IF NOT EXISTS {PIPELINE_RESULTS_TABLE} ("
+        "key TEXT PRIMARY KEY, upstream TEXT NOT NULL, result BLOB NOT NULL, created_at TEXT NOT NULL)"
+    )
+    connection.commit()
+
+
+def invalidate_pipeline(connection: sqlite3.Connection) -> None:
+    """
+    Forgets every recorded stage and stored statement result, so the next pipeline run does all its work.
+    Call it after changing the data outside the pipeline (e.g. running db02_features.py directly).
+    """
+    try:
+        with connection:
+            for table in (PIPELINE_STATE_TABLE, PIPELINE_RESULTS_TABLE, PIPELINE_HEAD_TABLE):
+                connection.execute(f"DROP TABLE IF EXISTS {table}")
+    except sqlite3.Error as e:
+        logger.error(f"Error invalidating the pipeline state: {e}")
+        raise
+
+
+def _now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+
+
+class Pipeline:
+    """
+    Runs stages on one read-write connection, skipping those whose fingerprint is unchanged.
+
+    Args:
+        connection (sqlite3.Connection): Read-write connection; the metadata tables live in its database.
+        force (bool): Run every stage and statement even if it is up to date.
+    """
+
+    def __init__(self, connection: sqlite3.Connection, force: bool = False) -> None:
+        self.connection = connection
+        self.force = force
+        self.ran: list[str] = []
+        self.skipped: list[str] = []
+        self.planned: set[str] | None = None
+        ensure_pipeline_tables(connection)
+
+    def file_digest(self, path: pathlib.Path) -> str:
+        """Return the SHA-256 of a file, reusing the stored digest while its size and mtime are unchanged."""
+        path = pathlib.Path(path).resolve()
+        if not path.is_file():
+            return "missing"
+        stat = path.stat()
+        row = self.connection.execute(
+            f"SELECT size, mtime_ns, sha256 FROM {PIPELINE_FILES_TABLE} WHERE path = ?", (str(path),)
+        ).fetchone()
+        if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+        digest = file_sha256(path)
+        with self.connection:
+            self.connection.execute(
+                f"INSERT OR REPLACE INTO {PIPELINE_FILES_TABLE} (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+                (str(path), stat.st_size, stat.st_mtime_ns, digest),
+            )
+        return digest
+
+    def output(self, stage: str) -> str | None:
+        """Return the output fingerprint of the last completed run of a stage, or None."""
+        row = self.connection.execute(
+            f"SELECT output FROM {PIPELINE_STATE_TABLE} WHERE stage = ?", (stage,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def head(self) -> str:
+        """
+        Return the fingerprint of the database content: the output of the stage that wrote it last,
+        a marker while a stage is running (or after it failed), or "unknown" before any stage ran.
+        """
+        row = self.connection.execute(f"SELECT content FROM {PIPELINE_HEAD_TABLE} WHERE id = 1").fetchone()
+        return row[0] if row else "unknown"
+
+    def _set_head(self, content: str) -> None:
+        with self.connection:
+            self.connection.execute(
+                f"INSERT OR REPLACE INTO {PIPELINE_HEAD_TABLE} (id, content) VALUES (1, ?)", (content,)
+            )
+
+    def up_to_date(self, stages: Iterable[tuple[str, Iterable[Any], Iterable[str]]]) -> list[str]:
+        """
+        Return the leading stages of a sequence that need not run again: their fingerprints are
+        unchanged, each of them ran on the content the one before it left, and the last of them
+        left the database as it is now.
+
+        Args:
+            stages (Iterable): (stage, inputs, upstream) of the stages about to run, in order.
+        """
+        head = self.head()
+        chain: list[str] = []
+        current: list[str] = []
+        previous_output = None
+        for stage, inputs, upstream in stages:
+            row = self.connection.execute(
+                f"SELECT fingerprint, output, base FROM {PIPELINE_STATE_TABLE} WHERE stage = ?", (stage,)
+            ).fetchone()
+            if row is None or row[0] != self.fingerprint(inputs, upstream):
+                break
+            if chain and row[2] != previous_output:
+                break
+            chain.append(stage)
+            previous_output = row[1]
+            if row[1] == head:
+                current = list(chain)
+        return current
+
+    def plan(self, stages: Iterable[tuple[str, Iterable[Any], Iterable[str]]]) -> list[str]:
+        """
+        Decides which stages of a sequence are up to date before the first of them runs, and returns them.
+        A stage that is not planned is checked on its own when it runs.
+        """
+        current = self.up_to_date([(stage, list(inputs), list(upstream)) for stage, inputs, upstream in stages])
+        self.planned = set(current)
+        return current
+
+    def fingerprint(self, inputs: Iterable[Any], upstream: Iterable[str] = ()) -> str:
+        """
+        Return the fingerprint of a stage.
+
+        Args:
+            inputs (Iterable): Files (pathlib.Path, hashed by content) and option values (hashed by repr), in order.
+            upstream (Iterable[str]): Stages whose output this stage reads.
+        """
+        digest = hashlib.sha256()
+        for value in inputs:
+            if isinstance(value, pathlib.Path):
+                part = f"file:{value.name}:{self.file_digest(value)}"
+            else:
+                part = f"value:{value!r}"
+            digest.update(part.encode("utf-8") + b"\0")
+        for stage in upstream:
+            digest.update(f"stage:{stage}:{self.output(stage)}".encode("utf-8") + b"\0")
+        return digest.hexdigest()
+
+    def run_stage(self, stage: str, inputs: Iterable[Any], run: Callable[[], Any], upstream: Iterable[str] = ()) -> bool:
+        """
+        Runs a stage unless it is up to date (see up_to_date and plan). Returns True if it ran.
+        The stage's record is removed before it runs, so a stage that fails is run again next time.
+        """
+        inputs = list(inputs)
+        upstream = list(upstream)
+        fingerprint = self.fingerprint(inputs, upstream)
+        current = self.planned if self.planned is not None else self.up_to_date([(stage, inputs, upstream)])
+        if not self.force and stage in current:
+            logger.info(f"Stage {stage} is up to date ({fingerprint[:12]}); skipping it.")
+            self.skipped.append(stage)
+            return False
+
+        base = self.head()
+        with self.connection:
+            self.connection.execute(f"DELETE FROM {PIPELINE_STATE_TABLE} WHERE stage = ?", (stage,))
+        self._set_head(f"running:{stage}:{uuid.uuid4().hex}")
+        start = time.perf_counter()
+        run()
+        seconds = time.perf_counter() - start
+        output = hashlib.sha256(f"{fingerprint}:{uuid.uuid4().hex}".encode("utf-8")).hexdigest()
+        with self.connection:
+            self.connection.execute(
+                f"INSERT OR REPLACE INTO {PIPELINE_STATE_TABLE} (stage, fingerprint, output, base, seconds, completed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (stage, fingerprint, output, base, seconds, _now()),
+            )
+            self.connection.execute(
+                f"INSERT OR REPLACE INTO {PIPELINE_HEAD_TABLE} (id, content) VALUES (1, ?)", (output,)
+            )
+        self.ran.append(stage)
+        return True
+
+    def result_store(self, upstream: Iterable[str], context: Iterable[Any] = ()) -> "PipelineResultStore":
+        """Return a store for statement results that stays valid while the upstream stages do not run again."""
+        return PipelineResultStore(self.fingerprint(context, upstream), force=self.force)
+
+
+class PipelineResultStore:
+    """
+    Stores statement results in _pipeline_results across runs. It has the same pin() and fetch() methods
+    as ResultCache, so the report code can use either. Lookups may run on read-only worker connections;
+    new results are kept in memory until flush() writes them on the read-write connection.
+
+    Args:
+        upstream (str): Fingerprint of everything the results depend on besides their SQL.
+        force (bool): Ignore stored results (new results are still stored).
+    """
+
+    def __init__(self, upstream: str, force: bool = False) -> None:
+        self.upstream = upstream
+        self.force = force
+        self.hits = 0
+        self.misses = 0
+        self._pending: dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def pin(self, connection: sqlite3.Connection) -> None:
+        """Does nothing: the upstream fingerprint already changes whenever the data does (see ResultCache.pin)."""
+
+    def make_key(self, sql: str) -> str:
+        """Build the key of a statement's result."""
+        return hashlib.sha256(f"{self.upstream}:{normalize_sql(sql)}".encode("utf-8")).hexdigest()
+
+    def fetch(self, connection: sqlite3.Connection, sql: str, run: Callable[[str, sqlite3.Connection], Any]) -> Any:
+        """Return the stored result of sql, calling run(sql, connection) if there is none."""
+        key = self.make_key(sql)
+        row = None if self.force else connection.execute(
+            f"SELECT result FROM {PIPELINE_RESULTS_TABLE} WHERE key = ?", (key,)
+        ).fetchone()
+        if row is not None:
+            with self._lock:
+                self.hits += 1
+            return pickle.loads(row[0])
+        value = run(sql, connection)
+        with self._lock:
+            self.misses += 1
+            self._pending[key] = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        return value
+
+    def flush(self, connection: sqlite3.Connection) -> None:
+        """Writes the new results and removes results stored for an older upstream fingerprint."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        try:
+            with connection:
+                connection.execute(f"DELETE FROM {PIPELINE_RESULTS_TABLE} WHERE upstream <> ?", (self.upstream,))
+                connection.executemany(
+                    f"INSERT OR REPLACE INTO {PIPELINE_RESULTS_TABLE} (key, upstream, result, created_at) VALUES (?, ?, ?, ?)",
+                    [(key, self.upstream, blob, _now()) for key, blob in pending.items()],
+                )
+        except sqlite3.Error as e:
+            logger.error(f"Error storing {len(pending)} statement results: {e}")
+            raise
+        logger.info(f"Statement results: {self.hits} reused, {self.misses} executed.")
@@ -0,0 +1,269 @@
+"""
+SQL Profiler Script
+File: utils_profile.py
+
+This script measures every SQL statement the project runs and reports the most expensive ones.
+
+Features:
+- Finds statement boundaries with connection.set_trace_callback, so every statement of an
+  executescript() call is timed separately, and counts SQLite VM steps with set_progress_handler.
+  Statements that triggers and FTS5 run inside a statement count towards it, and the rows of an
+  executemany() call are recorded as one statement, shown with ? in place of their values.
+- Records wall time, rows returned or changed, VM steps and the EXPLAIN QUERY PLAN of each statement.
+  Rows changed come from changes(), so rows written by triggers are not counted, and plans are taken
+  as soon as a statement finishes, while the TEMP tables it reads still exist.
+- Leaves out the schema lookups helpers run along the way (sqlite_master, PRAGMA table_info, the
+  partition list), so a query's scope records only the query and its row count.
+- Writes statements slower than a threshold to logs/slow_queries.log through utils_logger.
+- Aggregates a run into a top-N report of statements by total time.
+"""
+
+# Imports from Python Standard Library
+import argparse
+import contextlib
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from typing import Iterator
+
+# Imports from local modules
+from utils_db import PARTITION_TABLE
+from utils_logger import logger, slow_query_logger
+from utils_result_cache import normalize_sql
+from utils_sql import strip_sql_comments
+
+# Statements slower than this many milliseconds go to the slow query log
+DEFAULT_SLOW_MS: float = 250.0
+
+# The progress handler is called once per this many SQLite VM instructions
+DEFAULT_PROGRESS_STEPS: int = 1000
+
+TRANSACTION_PATTERN = re.compile(r"^\s*(BEGIN|COMMIT|END|ROLLBACK|SAVEPOINT|RELEASE)\b", re.IGNORECASE)
+EXPLAINABLE_PATTERN = re.compile(r"^\s*(SELECT|WITH|INSERT|UPDATE|DELETE|REPLACE)\b", re.IGNORECASE)
+WRITE_PATTERN = re.compile(r"^\s*(INSERT|UPDATE|DELETE|REPLACE)\b", re.IGNORECASE)
+
+# Schema lookups that helpers run to decide what to do (not part of the work being profiled)
+PROBE_PATTERN = re.compile(
+    rf"\bsqlite_(?:master|schema|temp_master)\b|\b{PARTITION_TABLE}\b"
+    r"|^\s*PRAGMA\s+(?:\w+\.)?(?:table_x?info|index_list|index_x?info|database_list|foreign_key_list)\b",
+    re.IGNORECASE,
+)
+
+# String, blob and number literals and NULL: the values sqlite3 writes in place of the ? parameters
+# of the SQL it traces, so every row of an executemany() call is traced with different text.
+LITERAL_PATTERN = re.compile(r"[xX]?'(?:[^']|'')*'|(?<![\w\"])-?\d+(?:\.\d*)?(?:[eE][+-]?\d+)?|\bNULL\b", re.IGNORECASE)
+
+def statement_template(sql: str) -> str:
+    """Return the normalized SQL with its literal values replaced by ?, e.g. to match the rows of executemany()."""
+    return LITERAL_PATTERN.sub("?", normalize_sql(sql))
+
+
+# One executed statement: the label of the helper call that ran it, its SQL, seconds,
+# rows returned (queries) or changed (writes), VM steps, and its query plan lines
+StatementProfile = namedtuple("StatementProfile", ["label", "sql", "seconds", "rows", "vm_steps", "plan"])
+
+
+class ProfileScope:
+    """
+    The statements traced on one connection inside StatementProfiler.profile().
+    Set rows to the number of rows a query returned; statements that write report rows changed instead.
+    """
+
+    def __init__(self, connection: sqlite3.Connection, progress_steps: int, explain: bool = False) -> None:
+        self.connection = connection
+        self.progress_steps = progress_steps
+        self.explain = explain
+        self.rows: int | None = None
+        # [sql, start, seconds, changes, progress calls, executions, text before the first value,
+        #  the rest with ? for its values, ran nested statements, plan]
+        self.statements: list[list] = []
+        self._current: list | None = None
+        self._changes = connection.total_changes
+        self._probing = False
+
+    def on_trace(self, sql: str) -> None:
+        """Trace callback: a new statement is starting, so the previous one has finished."""
+        if self._probing:
+            return
+        current = self._current
+        if sql.startswith("--") or (current is not None and sql == current[0]):
+            # Statements run inside the current one (by triggers, FTS5 or SQLite itself) are traced as
+            # comments, or with the text of the running statement; they are part of its time.
+            if current is not None:
+                current[8] = True
+            return
+        if current is not None and sql.startswith(current[6]) and LITERAL_PATTERN.sub("?", sql[len(current[6]):]) == current[7]:
+            # The next row of an executemany() call (the same SQL with other values) continues the statement.
+            # Only the text after the first value is compared, so long statements are not templated per row.
+            current[3] += self._execution_changes()
+            current[5] += 1
+            current[0] = sql
+            return
+        self.close_current()
+        text = strip_sql_comments(sql)
+        if TRANSACTION_PATTERN.match(text) or PROBE_PATTERN.search(text):
+            return
+        first_value = LITERAL_PATTERN.search(sql)
+        head = sql[:first_value.start()] if first_value else sql
+        self._current = [sql, time.perf_counter(), 0.0, 0, 0, 1, head, LITERAL_PATTERN.sub("?", sql[len(head):]), False, []]
+
+    def on_progress(self) -> int:
+        """Progress handler: count VM instructions of the running statement. Returning 0 lets it continue."""
+        if self._current is not None and not self._probing:
+            self._current[4] += 1
+        return 0
+
+    def _execution_changes(self) -> int:
+        """
+        Return the rows the last execution of the running statement changed. total_changes also counts
+        rows written by triggers and FTS5, so when those ran, changes() is asked for instead.
+        """
+        changes = self.connection.total_changes
+        count = changes - self._changes
+        if self._current[8]:
+            count = self._query("SELECT changes()")[0][0] if WRITE_PATTERN.match(strip_sql_comments(self._current[0])) else 0
+            self._current[8] = False
+        self._changes = changes
+        return count
+
+    def _query(self, sql: str) -> list[tuple]:
+        """Runs a statement of the profiler's own on the traced connection, without tracing it."""
+        self._probing = True
+        try:
+            return self.connection.execute(sql).fetchall()
+        finally:
+            self._probing = False
+
+    def _explain(self, sql: str) -> list[str]:
+        """Return the EXPLAIN QUERY PLAN lines of a statement, or an empty list if it cannot be explained."""
+        if not EXPLAINABLE_PATTERN.match(strip_sql_comments(sql)):
+            return []
+        try:
+            return [row[3] for row in self._query(f"EXPLAIN QUERY PLAN {sql}")]
+        except sqlite3.Error as e:
+            return [f"(not explained: {e})"]
+
+    def close_current(self) -> None:
+        """
+        Finishes timing the running statement, if any, and takes its plan. This runs when the next
+        statement starts, before it can drop a table the finished one used.
+        """
+        if self._current is not None:
+            self._current[2] = time.perf_counter() - self._current[1]
+            self._current[3] += self._execution_changes()
+            if self.explain:
+                self._current[9] = self._explain(self._current[0])
+            self.statements.append(self._current)
+            self._current = None
+        self._changes = self.connection.total_changes
+
+
+class StatementProfiler:
+    """
+    Collects StatementProfiles for every statement run inside profile() blocks, from any thread.
+
+    Args:
+        slow_ms (float): Statements slower than this many milliseconds are written to the slow query log.
+        progress_steps (int): VM instructions between progress handler calls (the VM step resolution).
+        explain (bool): Record the EXPLAIN QUERY PLAN of every statement.
+    """
+
+    def __init__(self, slow_ms: float = DEFAULT_SLOW_MS, progress_steps: int = DEFAULT_PROGRESS_STEPS,
+                 explain: bool = True) -> None:
+        self.slow_ms = slow_ms
+        self.progress_steps = progress_steps
+        self.explain = explain
+        self.records: list[StatementProfile] = []
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def profile(self, connection: sqlite3.Connection, label: str) -> Iterator[ProfileScope]:
+        """
+        Traces every statement run on connection inside the with block.
+
+        Args:
+            connection (sqlite3.Connection): The connection to trace; its trace and progress callbacks
+                are replaced for the duration of the block.
+            label (str): Name recorded with the statements (e.g. the SQL file or registry statement name).
+        """
+        scope = ProfileScope(connection, self.progress_steps, self.explain)
+        connection.set_trace_callback(scope.on_trace)
+        connection.set_progress_handler(scope.on_progress, self.progress_steps)
+        try:
+            yield scope
+        finally:
+            scope.close_current()
+            connection.set_trace_callback(None)
+            connection.set_progress_handler(None, self.progress_steps)
+            self._record(scope, label)
+
+    def _record(self, scope: ProfileScope, label: str) -> None:
+        """Turns the traced statements of a finished scope into StatementProfiles."""
+        records = []
+        for sql, _, seconds, changes, progress_calls, executions, _, _, _, plan in scope.statements:
+            is_query = len(scope.statements) == 1 and scope.rows is not None
+            # A statement run for many rows is recorded once, with ? in place of its values.
+            record = StatementProfile(label, statement_template(sql) if executions > 1 else sql, seconds,
+                                      scope.rows if is_query else changes, progress_calls * scope.progress_steps, plan)
+            records.append(record)
+            if seconds * 1000 >= self.slow_ms:
+                slow_query_logger.bind(label=label, seconds=seconds, rows=record.rows, vm_steps=record.vm_steps).warning(
+                    f"Slow statement ({seconds * 1000:.1f} ms, {record.rows} rows, ~{record.vm_steps} VM steps) "
+                    f"in {label}: {normalize_sql(sql)} | plan: {' / '.join(plan) or 'n/a'}"
+                )
+        with self._lock:
+            self.records.extend(records)
+
+    def report(self, top_n: int = 10) -> list[dict]:
+        """
+        Aggregates the recorded statements by normalized SQL and returns the top_n by total time,
+        each as a dict with calls, total/mean/max milliseconds, rows, VM steps, labels and plan.
+        """
+        groups: dict = {}
+        with self._lock:
+            records = list(self.records)
+        for record in records:
+            key = normalize_sql(record.sql)
+            group = groups.setdefault(key, {"sql": key, "calls": 0, "total_ms": 0.0, "max_ms": 0.0,
+                                            "rows": 0, "vm_steps": 0, "labels": [], "plan": record.plan})
+            group["calls"] += 1
+            group["total_ms"] += record.seconds * 1000
+            group["max_ms"] = max(group["max_ms"], record.seconds * 1000)
+            group["rows"] += record.rows or 0
+            group["vm_steps"] += record.vm_steps
+            if record.label not in group["labels"]:
+                group["labels"].append(record.label)
+        ranked = sorted(groups.values(), key=lambda group: group["total_ms"], reverse=True)[:top_n]
+        for group in ranked:
+            group["mean_ms"] = group["total_ms"] / group["calls"]
+        return ranked
+
+    def print_report(self, top_n: int = 10) -> None:
+        """Prints the top_n statements by total time, with their query plans."""
+        total_ms = sum(record.seconds for record in self.records) * 1000
+        print(f"\n===== SQL profile: top {top_n} of {len(self.records)} statements ({total_ms:.1f} ms total) =====")
+        for rank, group in enumerate(self.report(top_n), start=1):
+            print(f"\n{rank:>2}. {group['total_ms']:9.1f} ms total, {group['calls']} calls, "
+                  f"{group['mean_ms']:.1f} ms mean, {group['max_ms']:.1f} ms max, "
+                  f"{group['rows']} rows, ~{group['vm_steps']} VM steps  [{', '.join(group['labels'])}]")
+            print(f"    {group['sql'][:160]}")
+            for line in group["plan"]:
+                print(f"      {line}")
+        logger.info(f"Profiled {len(self.records)} SQL statements ({total_ms:.1f} ms total)")
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adds the --slow-ms and --profile-top options shared by every script that profiles its SQL."""
+    parser.add_argument("--slow-ms", type=float, default=DEFAULT_SLOW_MS,
+                        help=f"Write SQL statements slower than this to logs/slow_queries.log (default: {DEFAULT_SLOW_MS:g}).")
+    parser.add_argument("--profile-top", type=int, default=10,
+                        help="Number of statements listed in the SQL profile report (0 to skip it).")
+
+
+def profile_scope(profiler: StatementProfiler | None, connection: sqlite3.Connection, label: str):
+    """Return profiler.profile(connection, label), or a scope that records nothing when profiler is None."""
+    if profiler is None:
+        return contextlib.nullcontext(ProfileScope(connection, DEFAULT_PROGRESS_STEPS))
+    return profiler.profile(connection, label)
@@ -0,0 +1,282 @@
+"""
+Query Result Cache Script
+File: utils_result_cache.py
+
+This script caches query results so unchanged reports are not recomputed.
+
+Features:
+- Keys each result on the normalized statement text plus a database-wide version, read once by the
+  caller (pin) before statements fan out to pooled connections: the size and modification time of
+  every database file the connection has open (main, attached partitions), the size and header of
+  its WAL file, and PRAGMA schema_version. Every connection and process sees the same version for the same committed
+  data, so workers that run the same statement share one key, whichever connection they borrowed,
+  and a worker asking for a statement that another worker is still running waits for that result
+  instead of running it again.
+- Any committed UPDATE/DELETE, from this process or another such as db02_features.py, writes to
+  the files and changes the key, so stale results are never returned.
+- Evicts least recently used results once a memory bound is reached, optionally spilling
+  them to pickle files on disk instead of discarding them. Spill files are named after their key
+  and kept between runs, so a later run against unchanged database files reads them back.
+- In-memory databases (e.g. a report snapshot) have no files; their results are keyed on the
+  connection's own data version and are only reused within the run.
+"""
+
+# Imports from Python Standard Library
+import hashlib
+import os
+import pathlib
+import pickle
+import sqlite3
+import sys
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable
+
+# Imports from local modules
+from utils_logger import logger
+from utils_sql import strip_sql_comments
+
+DEFAULT_MAX_BYTES: int = 64 * 1024 * 1024
+
+
+def normalize_sql(sql: str) -> str:
+    """Remove comments, collapse whitespace and drop the trailing semicolon."""
+    return " ".join(strip_sql_comments(sql).split()).rstrip(";").rstrip()
+
+
+def data_version(connection: sqlite3.Connection) -> tuple[int, int, int]:
+    """Return a value that changes whenever the data or schema seen by this connection changes."""
+    return (
+        connection.execute("PRAGMA data_version").fetchone()[0],
+        connection.total_changes,
+        connection.execute("PRAGMA schema_version").fetchone()[0],
+    )
+
+
+def database_version(connection: sqlite3.Connection) -> tuple | None:
+    """
+    Return a version of the committed data and schema of the database files a connection has open,
+    the same for every connection and process: the size and modification time of each file, the size
+    and header of its WAL file (commits append frames to it; the salts in its header change whenever
+    it is started over), and PRAGMA schema_version. Returns None if any database is in memory.
+    """
+    files = [row[2] for row in connection.execute("PRAGMA database_list") if row[1] != "temp"]
+    # The memdb VFS of a snapshot reports a name that is not a file.
+    if not files or not all(files) or not all(os.path.isfile(name) for name in files):
+        return None
+    stats = []
+    for name in files:
+        stat = os.stat(name)
+        # Opening a connection re-creates an empty WAL file, so its modification time is not used.
+        try:
+            with open(f"{name}-wal", "rb") as wal:
+                header = wal.read(32)
+                wal_size = os.fstat(wal.fileno()).st_size
+        except FileNotFoundError:
+            header, wal_size = b"", 0
+        stats.append((name, stat.st_size, stat.st_mtime_ns, wal_size, header))
+    return tuple(stats), connection.execute("PRAGMA schema_version").fetchone()[0]
+
+
+def estimate_size(value: Any, seen: set | None = None) -> int:
+    """
+    Estimate the memory used by a cached value: deep size for pandas objects, and for other values
+    their own size plus that of everything they hold (e.g. a QueryPreview's rows and column summaries).
+    Objects reachable twice are counted once.
+    """
+    memory_usage = getattr(value, "memory_usage", None)
+    if callable(memory_usage):
+        usage = memory_usage(deep=True)
+        return int(usage.sum() if hasattr(usage, "sum") else usage)
+    seen = set() if seen is None else seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(key, seen) + estimate_size(item, seen) for key, item in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, seen) for item in value)
+    elif hasattr(value, "__dict__"):
+        size += estimate_size(vars(value), seen)
+    return size
+
+
+class ResultCache:
+    """
+    A thread-safe LRU cache of query results bounded by estimated memory use.
+
+    Args:
+        max_bytes (int): Memory bound for results kept in memory.
+        spill_dir (pathlib.Path): If given, evicted results are pickled here instead of discarded,
+            and results spilled there by earlier runs are reused while the database is unchanged.
+        max_spill_bytes (int): Bound on the bytes in the spill directory; least recently used spills
+            (including those of earlier runs) are removed first.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, spill_dir: pathlib.Path | None = None,
+                 max_spill_bytes: int = 16 * DEFAULT_MAX_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self.spill_dir = pathlib.Path(spill_dir) if spill_dir else None
+        self.max_spill_bytes = max_spill_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()  # key -> (value, size)
+        self._spilled: OrderedDict = OrderedDict()  # spill file -> bytes on disk
+        self._bytes = 0
+        self._spill_bytes = 0
+        self._version: tuple | None = None
+        # Makes the keys of in-memory databases unique to this cache, so no other run can match them.
+        self._token = uuid.uuid4().hex
+        self._running: dict = {}  # key -> Event set once the thread running that statement has stored it
+        self._lock = threading.Lock()
+        if self.spill_dir:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+            # Results spilled by earlier runs, oldest first; their keys include the database version.
+            for path in sorted(self.spill_dir.glob("*.pkl"), key=lambda path: path.stat().st_mtime_ns):
+                self._spilled[path] = path.stat().st_size
+                self._spill_bytes += self._spilled[path]
+            self._trim_spill()
+
+    def pin(self, connection: sqlite3.Connection) -> None:
+        """
+        Keys the results that follow on the version of connection's database (see database_version).
+        Call it again after writing to the database. Uncommitted writes of connection are not in the
+        files yet, so while it has a transaction open, and for an in-memory database, the key uses the
+        connection's own data_version and only matches within this run.
+        """
+        version = database_version(connection)
+        if version is None or connection.in_transaction:
+            version = (version, self._token, id(connection), data_version(connection))
+        self._version = version
+
+    def make_key(self, sql: str) -> tuple | None:
+        """Build the cache key of sql at the pinned version, or None if no version is pinned yet."""
+        if self._version is None:
+            return None
+        return normalize_sql(sql), self._version
+
+    def get(self, key: tuple) -> Any:
+        """Return the cached value for key, or None."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            value = self._load_spilled(key)
+            if value is not None:
+                self._store(key, value, estimate_size(value))
+                self.hits += 1
+                return value
+            self.misses += 1
+            return None
+
+    def put(self, key: tuple, value: Any) -> None:
+        """Cache a value, evicting least recently used entries beyond the memory bound."""
+        size = estimate_size(value)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._store(key, value, size)
+
+    def fetch(self, connection: sqlite3.Connection, sql: str, run: Callable[[str, sqlite3.Connection], Any]) -> Any:
+        """
+        Return the cached result of sql on connection, calling run(sql, connection) on a miss.
+        Cached values are shared between callers and should be treated as read-only.
+        Nothing is cached until pin() has been called.
+        """
+        key = self.make_key(sql)
+        if key is None:
+            with self._lock:
+                self.misses += 1
+            return run(sql, connection)
+        with self._lock:
+            running = self._running.get(key)
+            if running is None:
+                self._running[key] = threading.Event()
+        if running is not None:
+            # Another worker is running the same statement at this version; wait for its result.
+            running.wait()
+            value = self.get(key)
+            return value if value is not None else run(sql, connection)
+        try:
+            value = self.get(key)
+            if value is None:
+                value = run(sql, connection)
+                self.put(key, value)
+            return value
+        finally:
+            with self._lock:
+                self._running.pop(key).set()
+
+    def clear(self) -> None:
+        """Drop every cached and spilled result."""
+        with self._lock:
+            for path in self._spilled:
+                path.unlink(missing_ok=True)
+            self._entries.clear()
+            self._spilled.clear()
+            self._bytes = 0
+            self._spill_bytes = 0
+
+    def _store(self, key: tuple, value: Any, size: int) -> None:
+        """Insert an entry and evict until under the memory bound. The lock must be held."""
+        self._entries[key] = (value, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            old_key, (old_value, old_size) = self._entries.popitem(last=False)
+            self._bytes -= old_size
+            if self.spill_dir:
+                self._spill(old_key, old_value, old_size)
+
+    def _spill_path(self, key: tuple) -> pathlib.Path:
+        """Return the spill file of a key; the name is the same in every run."""
+        return self.spill_dir.joinpath(hashlib.sha1(repr(key).encode("utf-8")).hexdigest() + ".pkl")
+
+    def _load_spilled(self, key: tuple) -> Any:
+        """Return the spilled value of key, from this run or an earlier one, or None. The lock must be held."""
+        if not self.spill_dir:
+            return None
+        path = self._spill_path(key)
+        try:
+            with open(path, "rb") as file:
+                value = pickle.load(file)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Could not read spilled result {path}: {e}")
+            return None
+        if path not in self._spilled:
+            # Spilled by another process since this cache started.
+            self._spilled[path] = path.stat().st_size
+            self._spill_bytes += self._spilled[path]
+        self._spilled.move_to_end(path)
+        return value
+
+    def _spill(self, key: tuple, value: Any, size: int) -> None:
+        """Pickle an evicted entry to the spill directory, unless it is there already. The lock must be held."""
+        path = self._spill_path(key)
+        if path in self._spilled:
+            self._spilled.move_to_end(path)
+            return
+        partial = path.with_suffix(f".{os.getpid()}.part")
+        try:
+            with open(partial, "wb") as file:
+                pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+            # Renamed into place, so a run reading the directory never sees half a file.
+            os.replace(partial, path)
+        except Exception as e:
+            partial.unlink(missing_ok=True)
+            logger.warning(f"Could not spill cached result to {path}: {e}")
+            return
+        self._spilled[path] = path.stat().st_size
+        self._spill_bytes += self._spilled[path]
+        self._trim_spill()
+
+    def _trim_spill(self) -> None:
+        """Remove least recently used spill files until the directory is within max_spill_bytes."""
+        while self._spill_bytes > self.max_spill_bytes and self._spilled:
+            old_path, old_size = self._spilled.popitem(last=False)
+            old_path.unlink(missing_ok=True)
+            self._spill_bytes -= old_size
@@ -0,0 +1,179 @@
+"""
+Streaming Results Script
+File: utils_results.py
+
+This script reads query results in fixed-size batches instead of loading whole result sets into memory.
+
+Features:
+- Yields rows, or lists of rows, from cursor.fetchmany, so memory stays bounded by the batch size
+  and the first rows are available as soon as SQLite produces them.
+- Optionally yields typed NumPy column batches (int64, float64, or object for text and mixed columns).
+- Builds a preview of a query: its first N rows, the total row count and a per-column summary
+  (non-null count, and min/max/mean for numeric columns), all computed in one streaming pass.
+"""
+
+# Imports from Python Standard Library
+import sqlite3
+import time
+from collections import namedtuple
+from typing import Callable, Iterator
+
+# Imports from local modules
+from utils_lazy import lazy_import
+
+# NumPy is optional and only imported when column batches are requested.
+np = lazy_import("numpy")
+
+# Number of rows fetched from SQLite per fetchmany call
+DEFAULT_BATCH_SIZE: int = 1000
+
+# Number of rows kept for printing and rendering
+DEFAULT_PREVIEW_ROWS: int = 20
+
+# The result of preview_query: column names, the first rows, the total row count,
+# a ColumnSummary per column, and the seconds until the first row and until the last
+QueryPreview = namedtuple(
+    "QueryPreview", ["columns", "rows", "row_count", "summary", "first_row_seconds", "elapsed_seconds"]
+)
+
+
+def iter_batches(connection: sqlite3.Connection, sql: str, params: tuple | dict = (),
+                 batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[tuple[list[str], list[tuple]]]:
+    """
+    Yields (column names, rows) for consecutive batches of at most batch_size rows.
+
+    Args:
+        connection (sqlite3.Connection): SQLite connection object.
+        sql (str): The SELECT statement to run.
+        params (tuple | dict): Parameters bound to the statement.
+        batch_size (int): Maximum number of rows per batch.
+    """
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be at least 1, got {batch_size}")
+    cursor = connection.execute(sql, params)
+    try:
+        columns = [description[0] for description in cursor.description or ()]
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield columns, rows
+    finally:
+        cursor.close()
+
+
+def iter_rows(connection: sqlite3.Connection, sql: str, params: tuple | dict = (),
+              batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[tuple]:
+    """Yields the rows of a query one at a time, fetching them batch_size at a time."""
+    for _, rows in iter_batches(connection, sql, params, batch_size):
+        yield from rows
+
+
+def _column_array(values: tuple):
+    """Return a NumPy array for one column of a batch: int64, float64 (NULL as NaN) or object."""
+    present = [value for value in values if value is not None]
+    if present and all(type(value) is int for value in present) and len(present) == len(values):
+        return np.array(values, dtype=np.int64)
+    if present and all(type(value) in (int, float) for value in present):
+        return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+    return np.array(values, dtype=object)
+
+
+def iter_column_batches(connection: sqlite3.Connection, sql: str, params: tuple | dict = (),
+                        batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[dict]:
+    """
+    Yields batches as {column name: NumPy array}, typed per batch from the values SQLite returned.
+    Integer columns with NULLs become float64 with NaN; text and mixed columns stay object arrays.
+
+    Raises:
+        ImportError: If NumPy is not installed.
+    """
+    for columns, rows in iter_batches(connection, sql, params, batch_size):
+        yield {column: _column_array(values) for column, values in zip(columns, zip(*rows))}
+
+
+class ColumnSummary:
+    """Running non-null count, min, max and mean of one result column."""
+
+    def __init__(self) -> None:
+        self.non_null = 0
+        self.numeric = 0
+        self.minimum = None
+        self.maximum = None
+        self.total = 0.0
+
+    def update(self, values: tuple) -> None:
+        """Adds one batch of the column's values to the summary."""
+        numbers = [value for value in values if type(value) in (int, float)]
+        self.non_null += sum(value is not None for value in values)
+        if numbers:
+            self.numeric += len(numbers)
+            self.total += sum(numbers)
+            low, high = min(numbers), max(numbers)
+            self.minimum = low if self.minimum is None else min(self.minimum, low)
+            self.maximum = high if self.maximum is None else max(self.maximum, high)
+
+    @property
+    def mean(self) -> float | None:
+        return self.total / self.numeric if self.numeric else None
+
+    def describe(self) -> str:
+        """Return the summary as one line of text."""
+        text = f"{self.non_null} non-null"
+        if self.numeric:
+            text += f", min {self.minimum:g}, max {self.maximum:g}, mean {self.mean:g}"
+        return text
+
+
+def preview_query(
+    connection: sqlite3.Connection,
+    sql: str,
+    params: tuple | dict = (),
+    preview_rows: int = DEFAULT_PREVIEW_ROWS,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    on_batch: Callable[[list[str], list[tuple]], None] | None = None,
+) -> QueryPreview:
+    """
+    Runs a query in one streaming pass, keeping only its first preview_rows rows
+    and counting and summarizing the rest.
+
+    Args:
+        connection (sqlite3.Connection): SQLite connection object.
+        sql (str): The SELECT statement to run.
+        params (tuple | dict): Parameters bound to the statement.
+        preview_rows (int): Number of leading rows kept in the preview.
+        batch_size (int): Number of rows fetched per batch.
+        on_batch (Callable): Called with (columns, rows) for every batch, e.g. to stream the rows to a file.
+    """
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be at least 1, got {batch_size}")
+    start = time.perf_counter()
+    first_row_seconds = None
+    rows: list[tuple] = []
+    row_count = 0
+    cursor = connection.execute(sql, params)
+    try:
+        columns = [description[0] for description in cursor.description or ()]
+        summary = {column: ColumnSummary() for column in columns}
+        while batch := cursor.fetchmany(batch_size):
+            if first_row_seconds is None:
+                first_row_seconds = time.perf_counter() - start
+            if len(rows) < preview_rows:
+                rows.extend(batch[:preview_rows - len(rows)])
+            row_count += len(batch)
+            for column, values in zip(columns, zip(*batch)):
+                summary[column].update(values)
+            if on_batch is not None:
+                on_batch(columns, batch)
+    finally:
+        cursor.close()
+    elapsed = time.perf_counter() - start
+    return QueryPreview(columns, rows, row_count, summary, first_row_seconds or elapsed, elapsed)
+
+
+def describe_preview(preview: QueryPreview) -> str:
+    """Return the row count footer and column summary of a preview as text."""
+    shown = len(preview.rows)
+    lines = [f"Showing {shown} of {preview.row_count} rows" if shown < preview.row_count else f"{preview.row_count} rows"]
+    lines += [f"  {column}: {summary.describe()}" for column, summary in preview.summary.items()]
+    return "\n".join(lines)
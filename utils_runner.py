@@ -0,0 +1,89 @@
+"""
+Concurrent Query Runner Script
+File: utils_runner.py
+
+This script runs independent read-only queries at the same time on a pool of connections.
+
+Features:
+- Sends each job to a thread pool; every worker borrows its own read-only connection from a ConnectionPool.
+  sqlite3 releases the GIL while SQLite steps a statement, so the queries really overlap.
+- Returns results in the order the jobs were given, whatever order they finish in.
+- Takes a concurrency limit; with a limit of 1 the jobs run one after another.
+- Offers an asyncio facade for callers that already run an event loop.
+"""
+
+# Imports from Python Standard Library
+import asyncio
+import pathlib
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable
+
+# Imports from local modules
+from utils_db import ConnectionPool
+from utils_logger import logger
+
+DEFAULT_WORKERS: int = 4
+
+
+def run_concurrently(
+    db_path: pathlib.Path | str,
+    jobs: Iterable[Any],
+    run: Callable[[sqlite3.Connection, Any], Any],
+    workers: int = DEFAULT_WORKERS,
+) -> list[Any]:
+    """
+    Runs run(connection, job) for every job on at most workers read-only connections.
+
+    Args:
+        db_path (pathlib.Path | str): Path to the SQLite database file, or a "file:" URI (e.g. a snapshot).
+        jobs (Iterable): Jobs to run; each one is passed to run unchanged.
+        run (Callable): Function executing one job on a borrowed connection.
+        workers (int): Maximum number of jobs running at the same time.
+
+    Returns:
+        list: The result of every job, in the order of jobs. An exception raised by a job is re-raised here.
+    """
+    jobs = list(jobs)
+    if workers < 1:
+        raise ValueError(f"workers must be at least 1, got {workers}")
+    workers = min(workers, len(jobs)) or 1
+    start = time.perf_counter()
+    with ConnectionPool(db_path, size=workers, read_only=True) as pool:
+
+        def run_job(job: Any) -> Any:
+            with pool.connection() as connection:
+                return run(connection, job)
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="query") as executor:
+            results = list(executor.map(run_job, jobs))
+    logger.info(f"Ran {len(jobs)} queries on {workers} connections in {time.perf_counter() - start:.3f}s")
+    return results
+
+
+async def run_concurrently_async(
+    db_path: pathlib.Path | str,
+    jobs: Iterable[Any],
+    run: Callable[[sqlite3.Connection, Any], Any],
+    workers: int = DEFAULT_WORKERS,
+) -> list[Any]:
+    """
+    Asyncio version of run_concurrently: awaits the jobs without blocking the event loop.
+    A semaphore keeps at most workers jobs (and connections) busy at once.
+    """
+    jobs = list(jobs)
+    if workers < 1:
+        raise ValueError(f"workers must be at least 1, got {workers}")
+    semaphore = asyncio.Semaphore(workers)
+    with ConnectionPool(db_path, size=max(1, min(workers, len(jobs))), read_only=True) as pool:
+
+        def run_job(job: Any) -> Any:
+            with pool.connection() as connection:
+                return run(connection, job)
+
+        async def limited(job: Any) -> Any:
+            async with semaphore:
+                return await asyncio.to_thread(run_job, job)
+
+        return await asyncio.gather(*(limited(job) for job in jobs))
@@ -0,0 +1,197 @@
+"""
+Full-Text Search Script
+File: utils_search.py
+
+This script searches book titles and author names through the FTS5 indexes created by
+sql_migrations/0005_create_search_index.sql.
+
+Features:
+- Turns free text typed by a user into a safe FTS5 MATCH expression: every word must match,
+  the last word matches as a prefix ("harry pot" finds "Harry Potter"), and quotes or operators
+  in the input are treated as text, never as query syntax.
+- Ranks matches with bm25 (ORDER BY rank, which FTS5 answers from the index with a LIMIT, so
+  latency stays in milliseconds on multi-million-row catalogs) and returns a highlighted snippet.
+- Weighs surname matches above first-name matches when searching authors (the rank configured
+  on authors_fts by the migration).
+- The indexes point at the implicit rowids of books and authors, whose keys are TEXT, and VACUUM
+  may renumber those rowids. vacuum_database therefore rebuilds the indexes after every VACUUM, and
+  check_search_index runs FTS5's integrity-check and rebuilds any index that fails it.
+- Lets full CSV loads suspend the per-row index triggers and rebuild each index once instead,
+  which is several times faster than indexing a million rows one trigger call at a time.
+"""
+
+# Imports from Python Standard Library
+import contextlib
+import re
+import sqlite3
+from collections import namedtuple
+from typing import Iterator
+
+# Imports from local modules
+from utils_logger import logger
+
+# Marks placed around matched words in snippets
+HIGHLIGHT_START: str = "["
+HIGHLIGHT_END: str = "]"
+
+# Maximum number of words in a snippet
+SNIPPET_WORDS: int = 12
+
+# Search index -> the table it indexes. Each index is kept in step by the triggers
+# <index>_insert, <index>_delete and <index>_update on its table.
+SEARCH_INDEXES: dict = {"books_fts": "books", "authors_fts": "authors"}
+
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# One search result: "book" or "author", the row's ID, its display text, a highlighted snippet,
+# and its bm25 score (lower is better)
+SearchHit = namedtuple("SearchHit", ["kind", "id", "label", "snippet", "score"])
+
+
+def build_match_query(text: str, prefix: bool = True) -> str | None:
+    """
+    Return an FTS5 MATCH expression that finds rows containing every word of text,
+    or None if text has no words. With prefix, the last word also matches longer words.
+    """
+    words = WORD_PATTERN.findall(text)
+    if not words:
+        return None
+    # Quoted strings are plain terms to FTS5, so words like AND, OR, NEAR are not operators.
+    terms = [f'"{word}"' for word in words]
+    if prefix:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search_books(connection: sqlite3.Connection, text: str, limit: int = 10, prefix: bool = True) -> list[SearchHit]:
+    """
+    Return the books whose title best matches text, best first.
+
+    Args:
+        connection (sqlite3.Connection): SQLite connection (read-only is enough).
+        text (str): Words to search for, as typed by a user.
+        limit (int): Maximum number of matches.
+        prefix (bool): Let the last word match as a prefix.
+    """
+    query = build_match_query(text, prefix)
+    if query is None:
+        return []
+    rows = connection.execute(
+        "SELECT b.book_id, b.title, "
+        f"snippet(books_fts, 0, ?, ?, '...', {SNIPPET_WORDS}), rank "
+        "FROM books_fts JOIN books AS b ON b.rowid = books_fts.rowid "
+        "WHERE books_fts MATCH ? ORDER BY rank LIMIT ?",
+        (HIGHLIGHT_START, HIGHLIGHT_END, query, limit),
+    ).fetchall()
+    return [SearchHit("book", book_id, title, snippet, score) for book_id, title, snippet, score in rows]
+
+
+def search_authors(connection: sqlite3.Connection, text: str, limit: int = 10, prefix: bool = True) -> list[SearchHit]:
+    """
+    Return the authors whose first name and surname best match text, best first.
+    Matches in the surname count more than matches in the first name.
+
+    Args:
+        connection (sqlite3.Connection): SQLite connection (read-only is enough).
+        text (str): Words to search for, as typed by a user.
+        limit (int): Maximum number of matches.
+        prefix (bool): Let the last word match as a prefix.
+    """
+    query = build_match_query(text, prefix)
+    if query is None:
+        return []
+    rows = connection.execute(
+        "SELECT a.author_id, a.first || ' ' || a.surname, "
+        "highlight(authors_fts, 0, ?1, ?2) || ' ' || highlight(authors_fts, 1, ?1, ?2), rank "
+        "FROM authors_fts JOIN authors AS a ON a.rowid = authors_fts.rowid "
+        "WHERE authors_fts MATCH ?3 ORDER BY rank LIMIT ?4",
+        (HIGHLIGHT_START, HIGHLIGHT_END, query, limit),
+    ).fetchall()
+    return [SearchHit("author", author_id, name, snippet, score) for author_id, name, snippet, score in rows]
+
+
+def search(connection: sqlite3.Connection, text: str, limit: int = 10, prefix: bool = True) -> dict[str, list[SearchHit]]:
+    """
+    Searches books and authors. bm25 scores from different indexes are not comparable,
+    so the matches are returned per kind: {"books": [...], "authors": [...]}.
+    """
+    try:
+        return {
+            "books": search_books(connection, text, limit, prefix),
+            "authors": search_authors(connection, text, limit, prefix),
+        }
+    except sqlite3.OperationalError as e:
+        logger.error(f"Error searching for {text!r}: {e}. Run db01_setup.py to create the search indexes.")
+        raise
+
+
+def rebuild_search_index(connection: sqlite3.Connection) -> None:
+    """Re-indexes every book and author from their tables."""
+    try:
+        with connection:
+            for index in SEARCH_INDEXES:
+                connection.execute(f"INSERT INTO {index} ({index}) VALUES ('rebuild')")
+        logger.info("Rebuilt the full-text search indexes.")
+    except sqlite3.Error as e:
+        logger.error(f"Error rebuilding the full-text search indexes: {e}")
+        raise
+
+
+def check_search_index(connection: sqlite3.Connection) -> list[str]:
+    """
+    Checks every search index against its table with FTS5's integrity-check and rebuilds the
+    ones that no longer match (e.g. after a VACUUM run by another tool renumbered the rowids).
+    Returns the names of the rebuilt indexes.
+    """
+    rebuilt = []
+    for index, table in SEARCH_INDEXES.items():
+        try:
+            # rank 1 compares the index with the content table, not only with itself.
+            connection.execute(f"INSERT INTO {index} ({index}, rank) VALUES ('integrity-check', 1)")
+        except sqlite3.DatabaseError as e:
+            if getattr(e, "sqlite_errorname", None) != "SQLITE_CORRUPT_VTAB":
+                logger.error(f"Error checking search index {index}: {e}")
+                raise
+            logger.warning(f"Search index {index} does not match {table}; rebuilding it.")
+            with connection:
+                connection.execute(f"INSERT INTO {index} ({index}) VALUES ('rebuild')")
+            rebuilt.append(index)
+    return rebuilt
+
+
+def vacuum_database(connection: sqlite3.Connection) -> None:
+    """
+    Compacts the database with VACUUM, then rebuilds the search indexes, since VACUUM may
+    renumber the rowids of books and authors that the indexes point to.
+    """
+    connection.commit()
+    try:
+        connection.execute("VACUUM")
+    except sqlite3.Error as e:
+        logger.error(f"Error running VACUUM: {e}")
+        raise
+    rebuild_search_index(connection)
+
+
+@contextlib.contextmanager
+def deferred_search_index(connection: sqlite3.Connection, tables: list[str]) -> Iterator[None]:
+    """
+    Drops the index triggers on tables for the duration of a with block, then re-creates them
+    and rebuilds the affected search indexes in one pass. Must run inside the caller's transaction,
+    so if the block fails, rolling back restores the triggers and the untouched index.
+    """
+    indexes = [index for index, table in SEARCH_INDEXES.items() if table in tables]
+    trigger_names = [f"{index}_{event}" for index in indexes for event in ("insert", "delete", "update")]
+    triggers = connection.execute(
+        f"SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name IN ({', '.join('?' for _ in trigger_names)})",
+        trigger_names,
+    ).fetchall() if trigger_names else []
+    indexed = {name.rsplit("_", 1)[0] for name, _ in triggers}
+    for name, _ in triggers:
+        connection.execute(f'DROP TRIGGER "{name}"')
+    yield
+    for _, sql in triggers:
+        connection.execute(sql)
+    for index in sorted(indexed):
+        connection.execute(f"INSERT INTO {index} ({index}) VALUES ('rebuild')")
+        logger.info(f"Rebuilt search index {index} after a bulk load.")
@@ -0,0 +1,151 @@
+"""
+Database Snapshot Script
+File: utils_snapshot.py
+
+This script copies a database into memory so reports can run on a frozen copy of it.
+
+Features:
+- Copies the whole database with the SQLite backup API (Connection.backup) in one step, which reads
+  it inside a single read transaction: the copy is consistent, and in WAL mode writers are not blocked.
+- Keeps the copy in a named in-memory database (the memdb VFS) rather than a private ":memory:"
+  connection, so a pool of read-only worker connections can share it.
+- Reports the snapshot's size, how long the copy took, its age, and whether the source database
+  has changed since the snapshot was taken.
+- Refuses databases larger than a memory bound, so callers can fall back to the file on disk.
+- Refuses partitioned catalogs (utils_partition.py) and connections with attached databases: the
+  backup copies only the main file, so their books would still be read from the files on disk.
+"""
+
+# Imports from Python Standard Library
+import pathlib
+import sqlite3
+import time
+import uuid
+
+# Imports from local modules
+from utils_db import DEFAULT_CONNECTION_PRAGMAS, PARTITION_TABLE, connect
+from utils_logger import logger
+from utils_result_cache import data_version
+
+# The memdb VFS limits an in-memory database to 1 GiB unless SQLITE_FCNTL_SIZE_LIMIT is raised,
+# which Python's sqlite3 module cannot do, so larger databases are not snapshotted.
+DEFAULT_SNAPSHOT_MAX_BYTES: int = 1024 * 1024 * 1024
+
+# An in-memory database cannot use WAL, so the copy keeps its journal in memory instead.
+SNAPSHOT_PRAGMAS: dict = {**DEFAULT_CONNECTION_PRAGMAS, "journal_mode": None, "synchronous": None}
+
+
+def database_size(connection: sqlite3.Connection) -> int:
+    """Return the size in bytes of a connection's main database (page_count * page_size)."""
+    page_count = connection.execute("PRAGMA page_count").fetchone()[0]
+    page_size = connection.execute("PRAGMA page_size").fetchone()[0]
+    return page_count * page_size
+
+
+class DatabaseSnapshot:
+    """
+    An in-memory copy of a database, readable from any number of connections until close() is called.
+
+    Args:
+        source (sqlite3.Connection): Connection to the database to copy. It stays open and is only
+            read again by changed_since() to find out if the database has changed. It must not have a
+            transaction open: its uncommitted changes would not be in the copy.
+        max_bytes (int): Largest database to copy; bigger ones raise ValueError, as do partitioned catalogs.
+        close_source (bool): Close source in close(), for a connection opened only for the snapshot.
+    """
+
+    def __init__(self, source: sqlite3.Connection, max_bytes: int = DEFAULT_SNAPSHOT_MAX_BYTES,
+                 close_source: bool = False) -> None:
+        if source.in_transaction:
+            # Committing on the caller's behalf would make half-done work permanent.
+            message = "Cannot snapshot a connection with an open transaction; commit or roll it back first"
+            logger.error(message)
+            raise RuntimeError(message)
+        attached = [row[1] for row in source.execute("PRAGMA database_list") if row[1] not in ("main", "temp")]
+        partitioned = source.execute(
+            "SELECT 1 FROM main.sqlite_master WHERE type = 'table' AND name = ?", (PARTITION_TABLE,)
+        ).fetchone()
+        if attached or partitioned:
+            raise ValueError(f"The database is partitioned or has attached databases ({', '.join(attached) or PARTITION_TABLE}), "
+                             "and a snapshot only copies the main file")
+        self.source = source
+        self.close_source = close_source
+        self.size_bytes = database_size(source)
+        if self.size_bytes > max_bytes:
+            raise ValueError(f"Database is {self.size_bytes / 2**20:.1f} MiB, more than the "
+                             f"{max_bytes / 2**20:.1f} MiB snapshot limit")
+
+        # A name starting with "/" makes memdb share the database between connections of this process.
+        self.uri = f"file:/snapshot-{uuid.uuid4().hex}?vfs=memdb"
+        # This connection keeps the in-memory database alive and is the one close() releases.
+        self.connection = connect(self.uri, pragmas=SNAPSHOT_PRAGMAS, check_same_thread=False)
+        start = time.perf_counter()
+        try:
+            source.backup(self.connection)
+            self._leave_wal_mode()
+        except sqlite3.Error as e:
+            self.connection.close()
+            logger.error(f"Error copying the database into a snapshot: {e}")
+            raise
+        self.copy_seconds = time.perf_counter() - start
+        self.taken_at = time.time()
+        self._source_version = data_version(source)
+        logger.bind(size_bytes=self.size_bytes, seconds=self.copy_seconds).info(
+            f"Took an in-memory snapshot of {self.size_bytes / 2**20:.1f} MiB in {self.copy_seconds:.3f}s"
+        )
+
+    def _leave_wal_mode(self) -> None:
+        """
+        Marks the copy as a rollback-journal database. The backup copies the source's header, and a
+        WAL-mode header cannot be opened on the memdb VFS, which has no shared memory for the WAL index.
+        In exclusive locking mode SQLite reads WAL without shared memory, so the copy can be switched there.
+        """
+        self.connection.execute("PRAGMA locking_mode = EXCLUSIVE")
+        self.connection.execute("PRAGMA journal_mode = MEMORY")
+        self.connection.execute("PRAGMA locking_mode = NORMAL")
+        # The exclusive lock is only released by the next access to the database.
+        self.connection.execute("SELECT count(*) FROM sqlite_master").fetchone()
+
+    @property
+    def age_seconds(self) -> float:
+        """Seconds since the snapshot was taken."""
+        return time.time() - self.taken_at
+
+    def changed_since(self) -> bool:
+        """Return True if the source database has been written to since the snapshot was taken."""
+        return data_version(self.source) != self._source_version
+
+    def connect(self, read_only: bool = True) -> sqlite3.Connection:
+        """Open another connection to the snapshot (read-only by default)."""
+        return connect(self.uri, read_only=read_only)
+
+    def describe(self) -> str:
+        """One line with the snapshot's size, copy time and age, and whether the source has moved on."""
+        state = "has changed" if self.changed_since() else "has not changed"
+        return (f"Snapshot: {self.size_bytes / 2**20:.1f} MiB copied in {self.copy_seconds:.3f}s, "
+                f"{self.age_seconds:.1f}s old; the database {state} since it was taken.")
+
+    def close(self) -> None:
+        """
+        Release the in-memory copy (once every other connection to it is closed as well), and the
+        source connection if the snapshot opened it.
+        """
+        self.connection.close()
+        if self.close_source:
+            self.source.close()
+
+    def __enter__(self) -> "DatabaseSnapshot":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def take_snapshot(db_path: pathlib.Path, max_bytes: int = DEFAULT_SNAPSHOT_MAX_BYTES) -> DatabaseSnapshot:
+    """Copy a database file into memory through a new read-only connection, which close() closes."""
+    source = connect(db_path, read_only=True)
+    try:
+        return DatabaseSnapshot(source, max_bytes=max_bytes, close_source=True)
+    except Exception:
+        source.close()
+        raise
@@ -0,0 +1,79 @@
+"""
+SQL Helper Script
+File: utils_sql.py
+
+This script provides small helpers shared by the scripts that run SQL files.
+
+Features:
+- Splits SQL scripts into complete statements at any semicolon sqlite3.complete_statement accepts,
+  so semicolons inside string literals and trigger bodies are handled correctly.
+- Looks up table columns.
+- Adds columns idempotently with ALTER TABLE ... ADD COLUMN, which never copies the table.
+"""
+
+# Imports from Python Standard Library
+import re
+import sqlite3
+
+# Matches "ALTER TABLE <table> ADD [COLUMN] <column> ..." so the runner can skip columns that already exist
+ADD_COLUMN_PATTERN = re.compile(
+    r'^\s*ALTER\s+TABLE\s+"?(\w+)"?\s+ADD\s+(?:COLUMN\s+)?"?(\w+)"?\s*(.*?);?\s*$',
+    re.IGNORECASE | re.DOTALL,
+)
+
+# Spaces and an optional "--" comment after a statement's semicolon, up to the end of its line
+TRAILING_COMMENT_PATTERN = re.compile(r"[ \t]*(?:--[^\n]*)?")
+
+# Semicolons, whitespace and comments: all an empty statement such as the ";" in "SELECT 1;;" has
+EMPTY_STATEMENT_PATTERN = re.compile(r"(?:\s|;|--[^\n]*|/\*.*?\*/)*", re.DOTALL)
+
+
+def strip_sql_comments(sql: str) -> str:
+    """Remove whole-line "--" comments and surrounding blank lines from a statement."""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    return "\n".join(lines).strip()
+
+
+def _is_empty_statement(sql: str) -> bool:
+    """Return True if sql holds nothing but semicolons, whitespace and comments."""
+    return EMPTY_STATEMENT_PATTERN.fullmatch(sql) is not None
+
+
+def split_sql_statements(script: str) -> list[str]:
+    """
+    Splits a SQL script into complete statements, keeping each statement's leading comments.
+    Every semicolon is a candidate end, wherever it is on its line, and a statement ends at one
+    only when sqlite3.complete_statement agrees it is complete, so semicolons inside string
+    literals, comments and trigger bodies do not split it. A comment after the semicolon on the
+    same line stays with the statement it follows. Empty statements (";;") are skipped.
+    """
+    statements = []
+    start = 0
+    for semicolon in re.finditer(";", script):
+        end = semicolon.end()
+        if end <= start or not sqlite3.complete_statement(script[start:end]):
+            continue
+        end += TRAILING_COMMENT_PATTERN.match(script, end).end() - end
+        if not _is_empty_statement(script[start:end]):
+            statements.append(script[start:end].strip())
+        start = end
+    if not _is_empty_statement(script[start:]):
+        # A final statement without a terminating semicolon
+        statements.append(script[start:].strip())
+    return statements
+
+
+def table_columns(connection: sqlite3.Connection, table: str) -> list[str]:
+    """Return the column names of a table, or an empty list if it does not exist."""
+    return [row[1] for row in connection.execute(f'PRAGMA table_info("{table}")')]
+
+
+def add_column_if_missing(connection: sqlite3.Connection, table: str, column: str, declaration: str) -> bool:
+    """
+    Adds a column to a table unless it is already there.
+    Returns True if the column was added.
+    """
+    if column in table_columns(connection, table):
+        return False
+    connection.execute(f'ALTER TABLE "{table}" ADD COLUMN "{column}" {declaration}')
+    return True
@@ -0,0 +1,127 @@
+"""
+SQL Statement Registry Script
+File: utils_sql_registry.py
+
+This script parses the .sql files in sql_queries/ once and keeps the parsed statements in memory.
+
+Features:
+- Splits files with sqlite3.complete_statement, so semicolons in string literals and triggers are safe.
+- Names every statement "<file stem>.<slug of its leading comment>" (or "-- name: <name>" when given),
+  e.g. query_filters.select_all_books_published_after_1950.
+- Re-parses a file only when its modification time or size changes and its SHA-256 hash differs.
+- Returns the same SQL string for a statement on every call, so sqlite3's per-connection
+  statement cache can reuse the prepared statement.
+"""
+
+# Imports from Python Standard Library
+import hashlib
+import pathlib
+import re
+import threading
+from collections import namedtuple
+
+# Imports from local modules
+from utils_sql import split_sql_statements, strip_sql_comments
+
+SQL_QUERIES_FOLDER: pathlib.Path = pathlib.Path(__file__).parent.resolve().joinpath("sql_queries")
+
+# A parsed statement: its registry name, the comment that described it, and the SQL to execute
+NamedStatement = namedtuple("NamedStatement", ["name", "description", "sql"])
+
+# path -> (mtime_ns, size, sha256, statements)
+_REGISTRY: dict = {}
+_REGISTRY_LOCK = threading.Lock()
+
+EXPLICIT_NAME_PATTERN = re.compile(r"^--\s*name:\s*(\w+)\s*$", re.IGNORECASE)
+
+
+def _slugify(text: str, max_length: int = 60) -> str:
+    """Turn a comment into a lower_snake_case name, cut at a word boundary."""
+    slug = re.sub(r"[^a-z0-9]+", "_", text.lower()).strip("_")
+    if len(slug) > max_length:
+        slug = slug[:max_length].rsplit("_", 1)[0]
+    return slug
+
+
+def _leading_comment(statement: str) -> list[str]:
+    """Return the block of comment lines directly above the SQL of a statement."""
+    block = []
+    for line in statement.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("--"):
+            block.append(stripped)
+        elif stripped:
+            break
+        else:
+            # A blank line ends the comment block that belongs to the statement.
+            block = []
+    return block
+
+
+def parse_sql_text(script: str, stem: str) -> list[NamedStatement]:
+    """Splits a SQL script into NamedStatements named after the file stem and leading comments."""
+    statements = []
+    used_names = set()
+    for number, statement in enumerate(split_sql_statements(script), start=1):
+        comment = _leading_comment(statement)
+        explicit = [match.group(1) for match in map(EXPLICIT_NAME_PATTERN.match, comment) if match]
+        description = " ".join(line.lstrip("-").strip() for line in comment if not EXPLICIT_NAME_PATTERN.match(line))
+        slug = explicit[0] if explicit else _slugify(comment[0].lstrip("-")) if comment else ""
+        name = f"{stem}.{slug or f'statement_{number}'}"
+        suffix = 2
+        while name in used_names:
+            name = f"{stem}.{slug or f'statement_{number}'}_{suffix}"
+            suffix += 1
+        used_names.add(name)
+        statements.append(NamedStatement(name, description, statement.rstrip().rstrip(";").rstrip()))
+    return statements
+
+
+def get_statements(file_path: pathlib.Path) -> list[NamedStatement]:
+    """
+    Returns the parsed statements of a SQL file, parsing it only when it has changed.
+
+    Args:
+        file_path (pathlib.Path): Path to the SQL file.
+    """
+    file_path = pathlib.Path(file_path).resolve()
+    stat = file_path.stat()
+    with _REGISTRY_LOCK:
+        cached = _REGISTRY.get(file_path)
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[3]
+
+        content = file_path.read_bytes()
+        digest = hashlib.sha256(content).hexdigest()
+        if cached and cached[2] == digest:
+            statements = cached[3]
+        else:
+            statements = parse_sql_text(content.decode("utf-8"), file_path.stem)
+        _REGISTRY[file_path] = (stat.st_mtime_ns, stat.st_size, digest, statements)
+        return statements
+
+
+def get_statement(name: str, folder: pathlib.Path = SQL_QUERIES_FOLDER) -> NamedStatement:
+    """
+    Looks up a statement by its registry name, e.g. "query_sorting.sort_books_alphabetically_by_title".
+
+    Raises:
+        KeyError: If no statement has that name.
+    """
+    stem = name.split(".", 1)[0]
+    file_path = pathlib.Path(folder).joinpath(f"{stem}.sql")
+    if file_path.is_file():
+        for statement in get_statements(file_path):
+            if statement.name == name:
+                return statement
+    raise KeyError(f"No SQL statement named {name!r} in {folder}")
+
+
+def list_statement_names(folder: pathlib.Path = SQL_QUERIES_FOLDER) -> list[str]:
+    """Return the names of every statement in the folder's SQL files."""
+    return [statement.name for path in sorted(pathlib.Path(folder).glob("*.sql")) for statement in get_statements(path)]
+
+
+def statement_summary(statement: NamedStatement, max_length: int = 70) -> str:
+    """Return the statement's SQL on one line, without comments, cut to max_length characters."""
+    return " ".join(strip_sql_comments(statement.sql).split())[:max_length]
@@ -0,0 +1,221 @@
+"""
+Incremental Sync Script
+File: utils_sync.py
+
+This script brings database tables up to date with their CSV files without rebuilding them.
+
+Features:
+- Skips a table entirely when its CSV file hash matches the last successful sync
+  and no row has been changed by anything else since.
+- Otherwise stages the CSV in a TEMP table and applies only the rows whose content differs
+  with INSERT ... ON CONFLICT upserts, then deletes rows that are no longer in the CSV.
+- Work done against the table is proportional to the number of changed rows.
+- Syncs all the tables in one transaction and runs one PRAGMA foreign_key_check before committing,
+  so a failure in any table (a ragged row, a dangling author_id) leaves every table unchanged.
+"""
+
+# Imports from Python Standard Library
+import contextlib
+import datetime
+import hashlib
+import pathlib
+import sqlite3
+
+# Imports from local modules
+from utils_author_stats import suspended_author_stats
+from utils_logger import logger
+from utils_loader import DEFAULT_CHUNK_SIZE, check_field_counts, check_foreign_keys, create_table_from_csv, iter_csv_chunks, read_csv_header
+from utils_sql import table_columns
+
+# Table that records the CSV hash each table was last synced from
+SYNC_STATE_TABLE: str = "_sync_state"
+
+STAGE_TABLE: str = "_sync_stage"
+
+
+def file_sha256(file_path: pathlib.Path) -> str:
+    """Return the SHA-256 hex digest of a file, read in 1 MiB blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _key_is_unique(connection: sqlite3.Connection, table: str, key: str) -> bool:
+    """Return True if the key column is the primary key or has its own unique index."""
+    primary_key = [row[1] for row in connection.execute(f'PRAGMA table_info("{table}")') if row[5] > 0]
+    if primary_key == [key]:
+        return True
+    for index in connection.execute(f'PRAGMA index_list("{table}")').fetchall():
+        if index[2]:
+            index_columns = [row[2] for row in connection.execute(f'PRAGMA index_info("{index[1]}")')]
+            if index_columns == [key]:
+                return True
+    return False
+
+
+def _install_sync_triggers(connection: sqlite3.Connection, table: str, columns: list[str]) -> bool:
+    """
+    Creates triggers that clear the table's sync state whenever a synced column is changed
+    outside of a sync. Returns False if the triggers were missing, which happens after the
+    table has been dropped and re-created, so any stored state must not be trusted.
+    """
+    trigger_names = [f"_sync_dirty_{table}_{event}" for event in ("insert", "update", "delete")]
+    existing = {
+        row[0]
+        for row in connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?", (table,)
+        )
+    }
+    if all(name in existing for name in trigger_names):
+        return True
+
+    columns_sql = ", ".join(f'"{column}"' for column in columns)
+    clear_state = f"DELETE FROM {SYNC_STATE_TABLE} WHERE table_name = '{table}';"
+    for name, event in zip(trigger_names, ("INSERT", f"UPDATE OF {columns_sql}", "DELETE")):
+        connection.execute(f'DROP TRIGGER IF EXISTS "{name}"')
+        connection.execute(f'CREATE TRIGGER "{name}" AFTER {event} ON "{table}" BEGIN {clear_state} END')
+    return False
+
+
+def _sync_table(
+    connection: sqlite3.Connection,
+    table: str,
+    csv_path: pathlib.Path,
+    key: str,
+    chunk_size: int,
+) -> tuple[int, int]:
+    """
+    Applies the differences between a CSV file and a table inside the caller's transaction.
+    A table that does not exist yet is created from the CSV header, and all its rows are inserted.
+    Returns (rows inserted or updated, rows deleted).
+    """
+    header = read_csv_header(csv_path)
+    if key not in header:
+        raise ValueError(f"Key column '{key}' is not in the header of {csv_path}")
+    digest = file_sha256(csv_path)
+
+    existing_columns = table_columns(connection, table)
+    if not existing_columns:
+        logger.info(f"Table {table} does not exist yet; creating it from the header of {csv_path}.")
+        sample = next(check_field_counts(iter_csv_chunks(csv_path, chunk_size), len(header), csv_path), [])
+        create_table_from_csv(connection, table, header, sample)
+    else:
+        missing_columns = [column for column in header if column not in existing_columns]
+        if missing_columns:
+            raise ValueError(f"Columns {missing_columns} from {csv_path} are not in table {table}; run a full load instead.")
+
+    state = connection.execute(
+        f"SELECT file_sha256 FROM {SYNC_STATE_TABLE} WHERE table_name = ?", (table,)
+    ).fetchone()
+    if _install_sync_triggers(connection, table, header) and state and state[0] == digest:
+        logger.info(f"{table} is up to date with {csv_path}; skipping sync.")
+        return 0, 0
+
+    if not _key_is_unique(connection, table, key):
+        connection.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS "_sync_{table}_{key}" ON "{table}" ("{key}")')
+
+    # Stage the CSV in a TEMP table that shares the target's column types.
+    columns_sql = ", ".join(f'"{column}"' for column in header)
+    connection.execute(f"DROP TABLE IF EXISTS temp.{STAGE_TABLE}")
+    connection.execute(f'CREATE TEMP TABLE {STAGE_TABLE} AS SELECT {columns_sql} FROM main."{table}" WHERE 0')
+    placeholders = ", ".join("?" for _ in header)
+    for chunk in check_field_counts(iter_csv_chunks(csv_path, chunk_size), len(header), csv_path):
+        connection.executemany(f"INSERT INTO temp.{STAGE_TABLE} ({columns_sql}) VALUES ({placeholders})", chunk)
+    connection.execute(f'CREATE INDEX temp.{STAGE_TABLE}_key ON {STAGE_TABLE} ("{key}")')
+
+    # The author rollups are recomputed once rather than by a trigger call per changed book.
+    with suspended_author_stats(connection) if table == "books" else contextlib.nullcontext():
+        # Upsert only the rows that are new or whose content differs.
+        changed_sql = " OR ".join(f's."{column}" IS NOT t."{column}"' for column in header if column != key)
+        update_sql = ", ".join(f'"{column}" = excluded."{column}"' for column in header if column != key)
+        select_sql = ", ".join(f's."{column}"' for column in header)
+        cursor = connection.execute(
+            f'INSERT INTO "{table}" ({columns_sql}) '
+            f'SELECT {select_sql} FROM temp.{STAGE_TABLE} AS s LEFT JOIN main."{table}" AS t ON t."{key}" = s."{key}" '
+            f'WHERE t."{key}" IS NULL' + (f" OR {changed_sql}" if changed_sql else "") + " "
+            f'ON CONFLICT ("{key}") DO ' + (f"UPDATE SET {update_sql}" if update_sql else "NOTHING")
+        )
+        upserted = cursor.rowcount
+
+        # Delete the rows that are no longer present in the CSV.
+        cursor = connection.execute(
+            f'DELETE FROM "{table}" WHERE "{key}" NOT IN '
+            f'(SELECT "{key}" FROM temp.{STAGE_TABLE} WHERE "{key}" IS NOT NULL)'
+        )
+        deleted = cursor.rowcount
+    connection.execute(f"DROP TABLE temp.{STAGE_TABLE}")
+
+    _install_sync_triggers(connection, table, header)
+    connection.execute(
+        f"INSERT OR REPLACE INTO {SYNC_STATE_TABLE} (table_name, file_sha256, synced_at) VALUES (?, ?, ?)",
+        (table, digest, datetime.datetime.now(datetime.timezone.utc).isoformat()),
+    )
+    logger.info(f"Synced {table} from {csv_path}: {upserted} rows inserted or updated, {deleted} rows deleted.")
+    return upserted, deleted
+
+
+def sync_csv(
+    connection: sqlite3.Connection,
+    table: str,
+    csv_path: pathlib.Path,
+    key: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> tuple[int, int]:
+    """
+    Applies the differences between a CSV file and a table as upserts and deletes.
+    If the table does not exist yet it is created from the CSV header and loaded in full.
+
+    Args:
+        connection (sqlite3.Connection): SQLite connection object.
+        table (str): Name of the table to sync.
+        csv_path (pathlib.Path): CSV file holding the desired contents of the table.
+        key (str): Column that identifies a row (e.g., book_id).
+        chunk_size (int): Number of CSV rows staged per executemany call.
+
+    Returns:
+        tuple: (rows inserted or updated, rows deleted).
+    """
+    return sync_csv_files(connection, [(table, csv_path, key)], chunk_size)[table]
+
+
+def sync_csv_files(
+    connection: sqlite3.Connection,
+    sources: list[tuple[str, pathlib.Path, str]],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> dict[str, tuple[int, int]]:
+    """
+    Syncs several tables from their CSV files in the given order, in one transaction.
+    Foreign keys are not enforced row by row; one PRAGMA foreign_key_check runs before the commit,
+    and if any row is left referencing a missing one (or anything else fails) nothing is changed.
+
+    Args:
+        connection (sqlite3.Connection): SQLite connection object.
+        sources (list): (table name, CSV path, key column) triples.
+        chunk_size (int): Number of CSV rows staged per executemany call.
+
+    Returns:
+        dict: (rows inserted or updated, rows deleted) per table.
+    """
+    # PRAGMA foreign_keys cannot be changed inside a transaction, so close any open one first.
+    connection.commit()
+    foreign_keys = connection.execute("PRAGMA foreign_keys").fetchone()[0]
+    connection.execute("PRAGMA foreign_keys = OFF")
+    try:
+        connection.execute("BEGIN")
+        connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {SYNC_STATE_TABLE} ("
+            "table_name TEXT PRIMARY KEY, file_sha256 TEXT NOT NULL, synced_at TEXT NOT NULL)"
+        )
+        results = {table: _sync_table(connection, table, csv_path, key, chunk_size) for table, csv_path, key in sources}
+        # Unchanged files leave nothing to check.
+        if any(upserted or deleted for upserted, deleted in results.values()):
+            check_foreign_keys(connection)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.execute(f"PRAGMA foreign_keys = {foreign_keys}")
+    return results